@@ -30,8 +30,10 @@ CREATE TABLE `alarm`  (
   `alarm_content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL COMMENT '详细内容',
   `status` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT '未处理' COMMENT '状态: 未处理/处理中/已结案',
   `threshold_value` decimal(10, 2) NULL DEFAULT NULL COMMENT '触发时的阈值',
+  `updated_seq` bigint NULL DEFAULT NULL COMMENT '变更序号（增量同步）',
   PRIMARY KEY (`alarm_id`) USING BTREE,
   INDEX `device_id`(`device_id` ASC) USING BTREE,
+  INDEX `ix_alarm_updated_seq`(`updated_seq` ASC) USING BTREE,
   CONSTRAINT `alarm_ibfk_1` FOREIGN KEY (`device_id`) REFERENCES `device` (`device_id`) ON DELETE CASCADE ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '告警信息表' ROW_FORMAT = Dynamic;
 
@@ -52,6 +54,25 @@ CREATE TABLE `calibration_record`  (
   CONSTRAINT `calibration_record_ibfk_2` FOREIGN KEY (`calibrator_id`) REFERENCES `users` (`user_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '设备校准记录表' ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for circuit_energy_interval
+-- ----------------------------
+DROP TABLE IF EXISTS `circuit_energy_interval`;
+CREATE TABLE `circuit_energy_interval`  (
+  `substation_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `circuit_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `grain` varchar(4) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '汇总粒度: 15m/1h/1d',
+  `bucket_start` datetime NOT NULL COMMENT '时间桶起点',
+  `forward_energy` decimal(15, 3) NOT NULL DEFAULT 0.000 COMMENT '正向有功用量，单位：kWh',
+  `reverse_energy` decimal(15, 3) NOT NULL DEFAULT 0.000 COMMENT '反向有功用量，单位：kWh',
+  `covered_seconds` int NOT NULL DEFAULT 0 COMMENT '有读数覆盖的秒数',
+  `reset_count` int NOT NULL DEFAULT 0 COMMENT '表计复位次数',
+  `rollover_count` int NOT NULL DEFAULT 0 COMMENT '表计翻转次数',
+  `gap_count` int NOT NULL DEFAULT 0 COMMENT '超长间隔（不插值）次数',
+  PRIMARY KEY (`substation_id`, `circuit_id`, `grain`, `bucket_start`) USING BTREE,
+  INDEX `idx_energy_interval_grain_bucket`(`grain` ASC, `bucket_start` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for circuit_monitoring_data
 -- ----------------------------
@@ -71,12 +92,46 @@ CREATE TABLE `circuit_monitoring_data`  (
   `switch_status` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
   `cable_temp` decimal(5, 2) NULL DEFAULT NULL COMMENT '单位：℃',
   `capacitor_temp` decimal(5, 2) NULL DEFAULT NULL COMMENT '单位：℃',
-  PRIMARY KEY (`circuit_data_id`) USING BTREE,
+  PRIMARY KEY (`circuit_data_id`, `collection_time`) USING BTREE,
   UNIQUE INDEX `uk_circuit_time`(`substation_id` ASC, `circuit_id` ASC, `collection_time` ASC) USING BTREE,
-  CONSTRAINT `circuit_monitoring_data_ibfk_1` FOREIGN KEY (`substation_id`) REFERENCES `substation` (`substation_id`) ON DELETE RESTRICT ON UPDATE RESTRICT,
+  INDEX `idx_circuit_substation_time`(`substation_id` ASC, `collection_time` ASC) USING BTREE,
   CONSTRAINT `circuit_monitoring_data_chk_1` CHECK ((`power_factor` < 1) and (`power_factor` > -(1))),
   CONSTRAINT `circuit_monitoring_data_chk_2` CHECK (`switch_status` in (_utf8mb4'分闸',_utf8mb4'合闸'))
-) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic
+PARTITION BY RANGE (TO_DAYS(`collection_time`))
+(PARTITION `pmax` VALUES LESS THAN (MAXVALUE));
+
+-- ----------------------------
+-- Table structure for circuit_monitoring_rollup
+-- ----------------------------
+DROP TABLE IF EXISTS `circuit_monitoring_rollup`;
+CREATE TABLE `circuit_monitoring_rollup`  (
+  `substation_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `circuit_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `grain` varchar(4) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '汇总粒度: 1m/15m/1h/1d',
+  `bucket_start` datetime NOT NULL COMMENT '时间桶起点',
+  `sample_count` int NOT NULL COMMENT '原始采样条数',
+  `avg_voltage` decimal(10, 2) NULL DEFAULT NULL,
+  `min_voltage` decimal(10, 2) NULL DEFAULT NULL,
+  `max_voltage` decimal(10, 2) NULL DEFAULT NULL,
+  `avg_current` decimal(10, 2) NULL DEFAULT NULL,
+  `min_current` decimal(10, 2) NULL DEFAULT NULL,
+  `max_current` decimal(10, 2) NULL DEFAULT NULL,
+  `avg_active_power` decimal(10, 2) NULL DEFAULT NULL,
+  `min_active_power` decimal(10, 2) NULL DEFAULT NULL,
+  `max_active_power` decimal(10, 2) NULL DEFAULT NULL,
+  `avg_reactive_power` decimal(10, 2) NULL DEFAULT NULL,
+  `min_reactive_power` decimal(10, 2) NULL DEFAULT NULL,
+  `max_reactive_power` decimal(10, 2) NULL DEFAULT NULL,
+  `avg_cable_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `min_cable_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `max_cable_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `avg_capacitor_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `min_capacitor_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `max_capacitor_temp` decimal(5, 2) NULL DEFAULT NULL,
+  PRIMARY KEY (`substation_id`, `circuit_id`, `grain`, `bucket_start`) USING BTREE,
+  INDEX `idx_circuit_rollup_grain_bucket`(`grain` ASC, `bucket_start` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- ----------------------------
 -- Table structure for dashboard_config
@@ -160,10 +215,11 @@ CREATE TABLE `energy_monitoring_data`  (
   `data_quality` varchar(4) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '数据质量',
   `plant_area_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '冗余厂区ID',
   `verification_status` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL COMMENT '核实状态',
-  PRIMARY KEY (`data_id`) USING BTREE,
-  INDEX `equipment_id`(`equipment_id` ASC) USING BTREE,
-  CONSTRAINT `energy_monitoring_data_ibfk_1` FOREIGN KEY (`equipment_id`) REFERENCES `energy_metering_equipment` (`equipment_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
-) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+  PRIMARY KEY (`data_id`, `collection_time`) USING BTREE,
+  INDEX `equipment_id`(`equipment_id` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic
+PARTITION BY RANGE (TO_DAYS(`collection_time`))
+(PARTITION `pmax` VALUES LESS THAN (MAXVALUE));
 
 -- ----------------------------
 -- Table structure for historical_trend_data
@@ -183,6 +239,17 @@ CREATE TABLE `historical_trend_data`  (
   CONSTRAINT `chk_statistical_cycle` CHECK (`statistical_cycle` in (_utf8mb4'日',_utf8mb4'周',_utf8mb4'月'))
 ) ENGINE = InnoDB AUTO_INCREMENT = 3 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '历史趋势数据表' ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for id_worker_lease
+-- ----------------------------
+DROP TABLE IF EXISTS `id_worker_lease`;
+CREATE TABLE `id_worker_lease`  (
+  `worker_id` int NOT NULL COMMENT '节点号 0-1023',
+  `owner` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '主机名:进程号:随机串',
+  `heartbeat_at` datetime NOT NULL COMMENT '最后续约时间',
+  PRIMARY KEY (`worker_id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = 'ID生成器节点号租约表' ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for maintenance_order
 -- ----------------------------
@@ -220,7 +287,8 @@ CREATE TABLE `peak_valley_energy_data`  (
   `total_energy` decimal(15, 2) NOT NULL,
   `peak_valley_price` decimal(10, 4) NULL DEFAULT NULL,
   `energy_cost` decimal(15, 2) NOT NULL,
-  PRIMARY KEY (`record_id`) USING BTREE
+  PRIMARY KEY (`record_id`) USING BTREE,
+  UNIQUE INDEX `uk_peak_valley_date_area_type`(`statistics_date` ASC, `plant_area_id` ASC, `energy_type` ASC) USING BTREE
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- ----------------------------
@@ -275,10 +343,33 @@ CREATE TABLE `pv_forecast`  (
   `deviation_rate` decimal(5, 2) NULL DEFAULT NULL,
   `model_version` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
   PRIMARY KEY (`forecast_id`) USING BTREE,
-  INDEX `device_id`(`device_id` ASC) USING BTREE,
+  INDEX `idx_device_forecast_date`(`device_id` ASC, `forecast_date` ASC) USING BTREE,
+  INDEX `idx_deviation_rate_date`(`deviation_rate` ASC, `forecast_date` ASC) USING BTREE,
   INDEX `actual_data_id`(`actual_data_id` ASC) USING BTREE,
-  CONSTRAINT `pv_forecast_ibfk_1` FOREIGN KEY (`device_id`) REFERENCES `pv_device` (`device_id`) ON DELETE CASCADE ON UPDATE RESTRICT,
-  CONSTRAINT `pv_forecast_ibfk_2` FOREIGN KEY (`actual_data_id`) REFERENCES `pv_generation` (`data_id`) ON DELETE SET NULL ON UPDATE RESTRICT
+  CONSTRAINT `pv_forecast_ibfk_1` FOREIGN KEY (`device_id`) REFERENCES `pv_device` (`device_id`) ON DELETE CASCADE ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for pv_forecast_accuracy
+-- ----------------------------
+DROP TABLE IF EXISTS `pv_forecast_accuracy`;
+CREATE TABLE `pv_forecast_accuracy`  (
+  `window_end` date NOT NULL COMMENT '窗口截止日期（含）',
+  `window_days` int NOT NULL COMMENT '滚动窗口天数',
+  `model_version` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `scope` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '统计范围: all/device/location',
+  `scope_id` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '设备编号/安装位置，全部时为空串',
+  `horizon` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '预测提前量分段，all 为不分段',
+  `sample_count` int NOT NULL DEFAULT 0,
+  `mape` decimal(8, 2) NULL DEFAULT NULL COMMENT '平均绝对百分比误差（%），实际发电量为0的样本不计入',
+  `rmse` decimal(12, 3) NULL DEFAULT NULL COMMENT '均方根误差，单位：kWh',
+  `mae` decimal(12, 3) NULL DEFAULT NULL COMMENT '平均绝对误差，单位：kWh',
+  `bias` decimal(12, 3) NULL DEFAULT NULL COMMENT '平均偏差（预测-实际），正值表示偏高，单位：kWh',
+  `p50_ape` decimal(8, 2) NULL DEFAULT NULL COMMENT '绝对百分比误差中位数（%）',
+  `p90_ape` decimal(8, 2) NULL DEFAULT NULL COMMENT '绝对百分比误差90分位（%）',
+  `p95_ape` decimal(8, 2) NULL DEFAULT NULL COMMENT '绝对百分比误差95分位（%）',
+  `computed_at` datetime NULL DEFAULT NULL,
+  PRIMARY KEY (`window_end`, `window_days`, `model_version`, `scope`, `scope_id`, `horizon`) USING BTREE
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- ----------------------------
@@ -296,10 +387,14 @@ CREATE TABLE `pv_generation`  (
   `inverter_efficiency` decimal(5, 2) NULL DEFAULT NULL,
   `string_voltage` decimal(8, 2) NULL DEFAULT NULL,
   `string_current` decimal(8, 2) NULL DEFAULT NULL,
-  PRIMARY KEY (`data_id`) USING BTREE,
-  INDEX `device_id`(`device_id` ASC) USING BTREE,
-  CONSTRAINT `pv_generation_ibfk_1` FOREIGN KEY (`device_id`) REFERENCES `pv_device` (`device_id`) ON DELETE CASCADE ON UPDATE RESTRICT
-) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+  `updated_seq` bigint NULL DEFAULT NULL COMMENT '变更序号（增量同步）',
+  PRIMARY KEY (`data_id`, `collect_time`) USING BTREE,
+  INDEX `idx_device_collect_time`(`device_id` ASC, `collect_time` ASC) USING BTREE,
+  INDEX `idx_inverter_efficiency`(`inverter_efficiency` ASC, `device_id` ASC) USING BTREE,
+  INDEX `idx_pv_generation_updated_seq`(`updated_seq` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic
+PARTITION BY RANGE (TO_DAYS(`collect_time`))
+(PARTITION `pmax` VALUES LESS THAN (MAXVALUE));
 
 -- ----------------------------
 -- Table structure for realtime_summary_data
@@ -356,6 +451,47 @@ CREATE TABLE `substation`  (
   CONSTRAINT `substation_ibfk_2` FOREIGN KEY (`responsible_user_id`) REFERENCES `users` (`user_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for substation_daily_summary
+-- ----------------------------
+DROP TABLE IF EXISTS `substation_daily_summary`;
+CREATE TABLE `substation_daily_summary`  (
+  `summary_date` date NOT NULL,
+  `scope` varchar(12) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '统计范围: substation/plant_area/all',
+  `scope_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '配电房编号/厂区编号，全部时为空串',
+  `plant_area_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
+  `substation_count` int NOT NULL DEFAULT 0,
+  `operating_substations` int NOT NULL DEFAULT 0 COMMENT '当日有监测数据的配电房数',
+  `maintenance_substations` int NOT NULL DEFAULT 0 COMMENT '当日有运维工单的配电房数',
+  `energy_consumption` decimal(15, 2) NULL DEFAULT NULL COMMENT '正向有功电能增量，单位：kWh',
+  `peak_load` decimal(12, 2) NULL DEFAULT NULL COMMENT '15分钟平均有功功率最大值，单位：kW',
+  `peak_time` datetime NULL DEFAULT NULL COMMENT '峰值负荷所在15分钟时段起点',
+  `avg_power_factor` decimal(4, 3) NULL DEFAULT NULL,
+  `power_factor_samples` int NOT NULL DEFAULT 0 COMMENT '功率因数采样数，用于加权合并',
+  `abnormal_events` int NOT NULL DEFAULT 0 COMMENT '当日告警数',
+  `computed_at` datetime NULL DEFAULT NULL,
+  PRIMARY KEY (`summary_date`, `scope`, `scope_id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '配电房日报表' ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for substation_status_snapshot
+-- ----------------------------
+DROP TABLE IF EXISTS `substation_status_snapshot`;
+CREATE TABLE `substation_status_snapshot`  (
+  `substation_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `online_circuit_count` int NULL DEFAULT 0 COMMENT '近5分钟在线回路数',
+  `avg_voltage` decimal(10, 2) NULL DEFAULT NULL COMMENT '近5分钟平均电压，单位：kV',
+  `total_active_power` decimal(12, 2) NULL DEFAULT NULL COMMENT '近5分钟总有功功率，单位：kW',
+  `abnormal_transformer_count` int NULL DEFAULT 0 COMMENT '近5分钟异常变压器数',
+  `avg_load_rate` decimal(5, 2) NULL DEFAULT NULL COMMENT '近5分钟平均负载率，单位：%',
+  `running_status` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT '正常',
+  `last_data_time` datetime NULL DEFAULT NULL COMMENT '最后回路数据时间',
+  `circuit_updated_at` datetime NULL DEFAULT NULL COMMENT '回路指标计算时间',
+  `transformer_updated_at` datetime NULL DEFAULT NULL COMMENT '变压器指标计算时间',
+  PRIMARY KEY (`substation_id`) USING BTREE,
+  CONSTRAINT `substation_status_snapshot_ibfk_1` FOREIGN KEY (`substation_id`) REFERENCES `substation` (`substation_id`) ON DELETE CASCADE ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for system_notifications
 -- ----------------------------
@@ -370,6 +506,51 @@ CREATE TABLE `system_notifications`  (
   PRIMARY KEY (`id`) USING BTREE
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for telemetry_dirty_range
+-- ----------------------------
+DROP TABLE IF EXISTS `telemetry_dirty_range`;
+CREATE TABLE `telemetry_dirty_range`  (
+  `range_id` bigint NOT NULL AUTO_INCREMENT,
+  `consumer` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '汇总名（与水位表 source_table 一致）',
+  `min_time` datetime NOT NULL COMMENT '受影响的最早采集时间',
+  `max_time` datetime NOT NULL COMMENT '受影响的最晚采集时间',
+  `created_at` datetime NULL DEFAULT NULL,
+  PRIMARY KEY (`range_id`) USING BTREE,
+  INDEX `idx_consumer_id`(`consumer` ASC, `range_id` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for telemetry_rollup_state
+-- ----------------------------
+DROP TABLE IF EXISTS `telemetry_rollup_state`;
+CREATE TABLE `telemetry_rollup_state`  (
+  `source_table` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `last_data_id` bigint NOT NULL DEFAULT 0 COMMENT '已处理到的最大脏时间窗ID',
+  `updated_at` datetime NULL DEFAULT NULL,
+  PRIMARY KEY (`source_table`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for tou_tariff_period
+-- ----------------------------
+DROP TABLE IF EXISTS `tou_tariff_period`;
+CREATE TABLE `tou_tariff_period`  (
+  `tariff_id` int NOT NULL AUTO_INCREMENT,
+  `energy_type` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '能源类型',
+  `period_type` varchar(4) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '时段类型: 尖峰/高峰/平段/低谷',
+  `start_month` int NOT NULL DEFAULT 1 COMMENT '适用起始月',
+  `end_month` int NOT NULL DEFAULT 12 COMMENT '适用结束月',
+  `start_time` time NOT NULL COMMENT '时段开始（含）',
+  `end_time` time NOT NULL COMMENT '时段结束（不含），小于开始时间表示跨零点',
+  `unit_price` decimal(10, 4) NOT NULL COMMENT '单价',
+  `effective_from` date NOT NULL COMMENT '生效日期',
+  `effective_to` date NULL DEFAULT NULL COMMENT '失效日期（含），为空表示长期有效',
+  PRIMARY KEY (`tariff_id`) USING BTREE,
+  INDEX `idx_tariff_type_effective`(`energy_type` ASC, `effective_from` ASC) USING BTREE,
+  CONSTRAINT `chk_tariff_period_type` CHECK (`period_type` in (_utf8mb4'尖峰',_utf8mb4'高峰',_utf8mb4'平段',_utf8mb4'低谷'))
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '分时电价时段表' ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for transformer_monitoring_data
 -- ----------------------------
@@ -385,12 +566,40 @@ CREATE TABLE `transformer_monitoring_data`  (
   `ambient_temp` decimal(5, 2) NULL DEFAULT NULL COMMENT '单位：℃',
   `ambient_humidity` decimal(5, 2) NULL DEFAULT NULL COMMENT '单位：%',
   `running_status` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
-  PRIMARY KEY (`transformer_data_id`) USING BTREE,
+  PRIMARY KEY (`transformer_data_id`, `collection_time`) USING BTREE,
   UNIQUE INDEX `uk_transformer_time`(`substation_id` ASC, `transformer_id` ASC, `collection_time` ASC) USING BTREE,
-  CONSTRAINT `transformer_monitoring_data_ibfk_1` FOREIGN KEY (`substation_id`) REFERENCES `substation` (`substation_id`) ON DELETE RESTRICT ON UPDATE RESTRICT,
+  INDEX `idx_transformer_substation_time`(`substation_id` ASC, `collection_time` ASC) USING BTREE,
   CONSTRAINT `transformer_monitoring_data_chk_1` CHECK (`load_rate` >= 0),
   CONSTRAINT `transformer_monitoring_data_chk_2` CHECK (`running_status` in (_utf8mb4'正常',_utf8mb4'异常'))
-) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic
+PARTITION BY RANGE (TO_DAYS(`collection_time`))
+(PARTITION `pmax` VALUES LESS THAN (MAXVALUE));
+
+-- ----------------------------
+-- Table structure for transformer_monitoring_rollup
+-- ----------------------------
+DROP TABLE IF EXISTS `transformer_monitoring_rollup`;
+CREATE TABLE `transformer_monitoring_rollup`  (
+  `substation_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `transformer_id` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `grain` varchar(4) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '汇总粒度: 1m/15m/1h/1d',
+  `bucket_start` datetime NOT NULL COMMENT '时间桶起点',
+  `sample_count` int NOT NULL COMMENT '原始采样条数',
+  `avg_load_rate` decimal(5, 2) NULL DEFAULT NULL,
+  `min_load_rate` decimal(5, 2) NULL DEFAULT NULL,
+  `max_load_rate` decimal(5, 2) NULL DEFAULT NULL,
+  `avg_winding_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `min_winding_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `max_winding_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `avg_core_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `min_core_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `max_core_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `avg_ambient_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `min_ambient_temp` decimal(5, 2) NULL DEFAULT NULL,
+  `max_ambient_temp` decimal(5, 2) NULL DEFAULT NULL,
+  PRIMARY KEY (`substation_id`, `transformer_id`, `grain`, `bucket_start`) USING BTREE,
+  INDEX `idx_transformer_rollup_grain_bucket`(`grain` ASC, `bucket_start` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- ----------------------------
 -- Table structure for user_roles
@@ -580,75 +789,7 @@ delimiter ;
 -- Triggers structure for table circuit_monitoring_data
 -- ----------------------------
 DROP TRIGGER IF EXISTS `tr_circuit_abnormal_alert`;
-delimiter ;;
-CREATE TRIGGER `tr_circuit_abnormal_alert` AFTER INSERT ON `circuit_monitoring_data` FOR EACH ROW BEGIN
-    DECLARE v_voltage_level VARCHAR(10);
-    
-    -- 获取电压等级
-    SELECT voltage_level INTO v_voltage_level 
-    FROM substation 
-    WHERE substation_id = NEW.substation_id;
-    
-    -- 1. 数据不完整告警
-    IF NEW.voltage IS NULL OR NEW.current IS NULL THEN
-        INSERT INTO alert_info (
-            alert_no, alert_type, related_device_no, 
-            occur_time, alert_level, alert_content, 
-            process_status
-        ) VALUES (
-            CONCAT('CD', DATE_FORMAT(NOW(), '%Y%m%d%H%i%s')),
-            '数据异常',
-            CONCAT('回路_', NEW.substation_id, '_', NEW.circuit_id),
-            NEW.collection_time,
-            '低',
-            CONCAT('回路', NEW.circuit_id, '监测数据不完整'),
-            '未处理'
-        );
-    
-    -- 2. 35KV电压超37KV告警
-    ELSEIF v_voltage_level = '35KV' AND NEW.voltage > 37.0 THEN
-        INSERT INTO alert_info (
-            alert_no, alert_type, related_device_no, 
-            occur_time, alert_level, alert_content, 
-            process_status, alert_threshold
-        ) VALUES (
-            CONCAT('CV', DATE_FORMAT(NOW(), '%Y%m%d%H%i%s')),
-            '电压越限',
-            CONCAT('回路_', NEW.substation_id, '_', NEW.circuit_id),
-            NEW.collection_time,
-            '中',
-            CONCAT('35KV回路', NEW.circuit_id, '电压超限: ', 
-                   ROUND(NEW.voltage, 2), 'KV > 37KV'),
-            '未处理',
-            '37.0 KV'
-        );
-    
-    -- 3. 电流超限告警
-    ELSEIF (v_voltage_level = '35KV' AND NEW.current > 2000) OR
-           (v_voltage_level = '0.4KV' AND NEW.current > 3000) THEN
-        INSERT INTO alert_info (
-            alert_no, alert_type, related_device_no, 
-            occur_time, alert_level, alert_content, 
-            process_status, alert_threshold
-        ) VALUES (
-            CONCAT('CC', DATE_FORMAT(NOW(), '%Y%m%d%H%i%s')),
-            '电流越限',
-            CONCAT('回路_', NEW.substation_id, '_', NEW.circuit_id),
-            NEW.collection_time,
-            '中',
-            CONCAT('回路', NEW.circuit_id, '电流超限: ', 
-                   ROUND(NEW.current, 2), 'A'),
-            '未处理',
-            CASE 
-                WHEN v_voltage_level = '35KV' THEN '2000A'
-                WHEN v_voltage_level = '0.4KV' THEN '3000A'
-            END
-        );
-    END IF;
-
-END
-;;
-delimiter ;
+-- 告警判定已移至应用层规则引擎 (src/utils/alarm_rules.py)
 
 -- ----------------------------
 -- Triggers structure for table energy_monitoring_data
@@ -686,116 +827,13 @@ delimiter ;
 -- Triggers structure for table pv_forecast
 -- ----------------------------
 DROP TRIGGER IF EXISTS `trigger_pv_forecast_deviation`;
-delimiter ;;
-CREATE TRIGGER `trigger_pv_forecast_deviation` AFTER INSERT ON `pv_forecast` FOR EACH ROW BEGIN
-    DECLARE v_alarm_id VARCHAR(20);
-    DECLARE v_alarm_content VARCHAR(500);
-    
-    -- 检查偏差率是否超过15%
-    IF NEW.deviation_rate > 15.00 THEN
-        -- 生成告警ID
-        SET v_alarm_id = CONCAT('ALARM', DATE_FORMAT(NOW(), '%Y%m%d%H%i%s'), LPAD(FLOOR(RAND()*1000), 3, '0'));
-        
-        -- 构建告警内容
-        SET v_alarm_content = CONCAT(
-            '光伏预测偏差率超过15%：预测编号', 
-            NEW.forecast_id, 
-            '，设备编号', 
-            NEW.device_id, 
-            '，预测日期', 
-            DATE_FORMAT(NEW.forecast_date, '%Y-%m-%d'), 
-            '，时间槽', 
-            NEW.time_slot, 
-            '，预测发电量', 
-            NEW.forecast_generation, 
-            'kWh，实际发电量', 
-            IFNULL(NEW.actual_generation, 'NULL'), 
-            'kWh，偏差率', 
-            NEW.deviation_rate, 
-            '%，模型版本', 
-            NEW.model_version, 
-            '。请检查预测模型并进行优化。'
-        );
-        
-        -- 插入告警信息
-        INSERT INTO alarm_info (
-            alarm_id,
-            alarm_type,
-            related_device_id,
-            alarm_time,
-            alarm_level,
-            alarm_content,
-            status,
-            trigger_threshold
-        ) VALUES (
-            v_alarm_id,
-            '预测模型优化提醒',
-            NEW.device_id,
-            NOW(),
-            '中',  -- 告警等级设为中等
-            v_alarm_content,
-            '未处理',
-            15.00
-        );
-        
-    END IF;
-END
-;;
-delimiter ;
+-- 告警判定已移至应用层规则引擎 (src/utils/alarm_rules.py)
 
 -- ----------------------------
 -- Triggers structure for table pv_forecast
 -- ----------------------------
 DROP TRIGGER IF EXISTS `trigger_pv_forecast_update_deviation`;
-delimiter ;;
-CREATE TRIGGER `trigger_pv_forecast_update_deviation` AFTER UPDATE ON `pv_forecast` FOR EACH ROW BEGIN
-    DECLARE v_alarm_id VARCHAR(20);
-    DECLARE v_alarm_content VARCHAR(500);
-    
-    -- 检查偏差率是否从<=15%变为>15%
-    IF (OLD.deviation_rate <= 15.00 OR OLD.deviation_rate IS NULL) 
-       AND NEW.deviation_rate > 15.00 THEN
-        
-        -- 生成告警ID
-        SET v_alarm_id = CONCAT('ALARM', DATE_FORMAT(NOW(), '%Y%m%d%H%i%s'), LPAD(FLOOR(RAND()*1000), 3, '0'));
-        
-        -- 构建告警内容
-        SET v_alarm_content = CONCAT(
-            '光伏预测偏差率更新后超过15%：预测编号', 
-            NEW.forecast_id, 
-            '，设备编号', 
-            NEW.device_id, 
-            '，原偏差率', 
-            IFNULL(OLD.deviation_rate, 'NULL'), 
-            '%，新偏差率', 
-            NEW.deviation_rate, 
-            '%，超出阈值。请检查预测模型并进行优化。'
-        );
-        
-        -- 插入告警信息
-        INSERT INTO alarm_info (
-            alarm_id,
-            alarm_type,
-            related_device_id,
-            alarm_time,
-            alarm_level,
-            alarm_content,
-            status,
-            trigger_threshold
-        ) VALUES (
-            v_alarm_id,
-            '预测模型优化提醒',
-            NEW.device_id,
-            NOW(),
-            '中',
-            v_alarm_content,
-            '未处理',
-            15.00
-        );
-    END IF;
-END
-;;
-delimiter ;
+-- 告警判定已移至应用层规则引擎 (src/utils/alarm_rules.py)
 
 -- ----------------------------
 -- Triggers structure for table realtime_summary_data
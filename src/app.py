@@ -13,7 +13,15 @@ def init_database():
     from models.plant_area import PlantArea
     from models.alarm_models import Device, Alarm, MaintenanceOrder
     from models.dashboard_models import DashboardConfig, RealtimeSummaryData, HistoricalTrendData
-    from models.energy_models import EnergyMeteringEquipment, EnergyMonitoringData, PeakValleyEnergyData
+    from models.energy_models import EnergyMeteringEquipment, EnergyMonitoringData, PeakValleyEnergyData, TouTariffPeriod
+    from models.substation_status import SubstationStatusSnapshot
+    from models.telemetry_rollup import (
+        CircuitMonitoringRollup, TransformerMonitoringRollup, CircuitEnergyInterval, TelemetryRollupState,
+        TelemetryDirtyRange
+    )
+    from models.id_worker import IdWorkerLease
+    from models.daily_summary import SubstationDailySummary
+    from models.pv_forecast import PvForecastAccuracy
     
     try:
         # 创建表
@@ -23,6 +31,12 @@ def init_database():
         # 初始化角色
         init_roles()
         
+        # 预建监测表的月分区（过期分区清理由 python -m utils.partition_manager maintain 定时执行）
+        init_partitions()
+        
+        # 已有库补建变更流使用的 updated_seq 列
+        init_change_feeds()
+        
     except Exception as e:
         print(f"✗ 数据库初始化失败: {str(e)}")
 
@@ -48,6 +62,20 @@ def init_roles():
             session.commit()
             print(f"✓ 添加了 {len(roles)} 个角色")
 
+def init_partitions():
+    """为已分区的监测表预建未来月份的分区"""
+    from utils.partition_manager import PartitionManager, PARTITIONED_TABLES
+    
+    manager = PartitionManager()
+    for table in PARTITIONED_TABLES:
+        manager.ensure_partitions(table)
+
+def init_change_feeds():
+    """为字符串主键的表补建并回填变更序号列"""
+    from dao.ChangeFeedDao import ChangeFeedDao
+    
+    ChangeFeedDao().ensure_seq_columns()
+
 def create_app():
     """创建Flask应用"""
     app = Flask(__name__, static_folder='frontend', static_url_path='/')
@@ -55,6 +83,33 @@ def create_app():
     app.config['SECRET_KEY'] = '智慧能源管理系统密钥-2025'
     app.config['JSON_AS_ASCII'] = False
     
+    # 请求级会话：一个请求内的DAO调用共用一个会话，响应前统一提交
+    base.db_manager.init_app(app)
+    
+    # SQL执行统计与慢查询日志（GET /api/metrics/db）
+    from utils.query_metrics import query_metrics
+    query_metrics.init_app(app, base.db_manager.engine)
+    
+    # 监测数据写缓冲（GET /api/metrics/ingest），进程退出前写完剩余数据
+    from utils.ingest_buffer import ingest_buffer
+    ingest_buffer.init_app(app)
+    
+    # 大屏SSE推送状态（GET /api/metrics/push）
+    from utils.push_hub import dashboard_push
+    dashboard_push.init_app(app)
+    
+    # 告警实时推送状态（GET /api/metrics/alarm-feed）
+    from utils.alarm_feed import alarm_feed
+    alarm_feed.init_app(app)
+    
+    # 接口限流计数（GET /api/metrics/rate-limit）
+    from utils.rate_limiter import rate_limiter
+    rate_limiter.init_app(app)
+    
+    # 已验证token缓存命中率（GET /api/metrics/token-cache）
+    from utils.token_cache import token_cache
+    token_cache.init_app(app)
+    
     @app.route('/')
     def index():
         return app.send_static_file('index.html')
@@ -80,12 +135,16 @@ def create_app():
         from routes.alarm_routes import alarm_bp
         from routes.dashboard_routes import dashboard_bp
         from routes.energy_routes import energy_bp
+        from routes.pv_routes import pv_bp
+        from routes.change_routes import change_bp
         
         app.register_blueprint(auth_bp)
         app.register_blueprint(substation_bp)
         app.register_blueprint(alarm_bp)
         app.register_blueprint(dashboard_bp)
         app.register_blueprint(energy_bp)
+        app.register_blueprint(pv_bp)
+        app.register_blueprint(change_bp)
         
         print("✓ 所有路由注册成功")
     except Exception as e:
@@ -1,8 +1,11 @@
 from base import db_manager
 from datetime import datetime
-from sqlalchemy import and_, or_, desc, asc, func
+from sqlalchemy import and_, or_, desc, asc, func, text
 from models.alarm_models import Alarm, MaintenanceOrder, Device
 from models.plant_area import PlantArea
+from models.substation import Substation
+from utils.id_generator import next_id
+from utils.alarm_feed import alarm_feed
 
 
 class AlarmMaintenanceDao:
@@ -21,10 +24,12 @@ class AlarmMaintenanceDao:
         [新增] 录入告警信息 (模拟设备自动上报)
         对应任务书: "新增: 录入能耗监测数据/添加设备" 类似的写入操作
         """
-        with db_manager.get_session() as session:
-            try:
+        alarm_id = alarm_data.get('alarm_id') or next_id()
+        # 提交由会话/请求统一进行；出错时 get_session 回滚并标记请求失败
+        try:
+            with db_manager.get_session() as session:
                 new_alarm = Alarm(
-                    alarm_id=alarm_data['alarm_id'],
+                    alarm_id=alarm_id,
                     device_id=alarm_data['device_id'],
                     alarm_type=alarm_data['alarm_type'],
                     occur_time=alarm_data['occur_time'],
@@ -34,24 +39,74 @@ class AlarmMaintenanceDao:
                     threshold_value=alarm_data['threshold_value']
                 )
                 session.add(new_alarm)
-                session.commit()
-                print(f"[成功] 新增告警: {alarm_data['alarm_id']}")
-                return True
-            except Exception as e:
-                session.rollback()
-                print(f"[失败] 新增告警数据库错误: {e}")
-                return False
+                self._publish_after_commit([alarm_id], 'created')
+        except Exception as e:
+            print(f"[失败] 新增告警数据库错误: {e}")
+            return False
+        print(f"[成功] 新增告警: {alarm_id}")
+        return alarm_id
+
+    def insert_alarms_batch(self, alarm_list):
+        """
+        [新增] 批量录入告警 (规则引擎按批生成)
+        一次查出已登记的设备，跳过未登记设备的告警后用一条多行 INSERT 写入，返回写入条数
+        """
+        for alarm in alarm_list:
+            alarm['alarm_id'] = alarm.get('alarm_id') or next_id()
+        device_ids = {alarm['device_id'] for alarm in alarm_list}
+        with db_manager.get_session() as session:
+            registered = {
+                row[0] for row in session.query(Device.device_id).filter(Device.device_id.in_(device_ids)).all()
+            }
+            rows = [alarm for alarm in alarm_list if alarm['device_id'] in registered]
+            if rows:
+                session.execute(Alarm.__table__.insert(), rows)
+        if rows:
+            self._publish_after_commit([alarm['alarm_id'] for alarm in rows], 'created')
+        skipped = len(alarm_list) - len(rows)
+        if skipped:
+            print(f"[失败] {skipped} 条告警的设备未在设备台账登记，已跳过")
+        if rows:
+            print(f"[成功] 批量新增告警 {len(rows)} 条")
+        return len(rows)
+
+    def register_substation_devices(self, substation_ids):
+        """
+        [新增] 回路告警以所属配电房为设备：为尚未登记的配电房在设备台账中补登
+        (设备编号即配电房编号，大类为配电)，返回新登记的数量
+        """
+        substation_ids = {substation_id for substation_id in substation_ids if substation_id}
+        if not substation_ids:
+            return 0
+        with db_manager.get_session() as session:
+            registered = {
+                row[0] for row in session.query(Device.device_id).filter(Device.device_id.in_(substation_ids)).all()
+            }
+            missing = session.query(
+                Substation.substation_id, Substation.substation_name, Substation.plant_area_id
+            ).filter(Substation.substation_id.in_(substation_ids - registered)).all()
+            if missing:
+                session.execute(text(
+                    "INSERT IGNORE INTO device (device_id, plant_area_id, device_name, device_category, device_type) "
+                    "VALUES (:device_id, :plant_area_id, :device_name, '配电', '配电房')"
+                ), [
+                    {'device_id': row[0], 'plant_area_id': row[2], 'device_name': row[1]} for row in missing
+                ])
+        if missing:
+            print(f"[成功] 设备台账补登配电房 {len(missing)} 个")
+        return len(missing)
 
     def create_maintenance_order(self, order_data):
         """
         [新增 + 修改] 生成运维工单 (事务操作)
         说明: 插入工单的同时，必须将关联告警的状态改为 '处理中'
         """
-        with db_manager.get_session() as session:
-            try:
+        order_id = order_data.get('order_id') or next_id()
+        try:
+            with db_manager.get_session() as session:
                 # 1. 创建工单记录
                 new_order = MaintenanceOrder(
-                    order_id=order_data['order_id'],
+                    order_id=order_id,
                     alarm_id=order_data['alarm_id'],
                     maintainer_id=order_data['maintainer_id'],
                     dispatch_time=datetime.now()
@@ -62,14 +117,12 @@ class AlarmMaintenanceDao:
                 alarm = session.query(Alarm).filter_by(alarm_id=order_data['alarm_id']).first()
                 if alarm:
                     alarm.status = '处理中'
-
-                session.commit()
-                print(f"[成功] 工单 {order_data['order_id']} 已派发，告警状态已更新")
-                return True
-            except Exception as e:
-                session.rollback()
-                print(f"[失败] 派单事务回滚: {e}")
-                return False
+                    self._publish_after_commit([order_data['alarm_id']], 'updated')
+        except Exception as e:
+            print(f"[失败] 派单事务回滚: {e}")
+            return False
+        print(f"[成功] 工单 {order_id} 已派发，告警状态已更新")
+        return order_id
 
     # =========================================================================
     # 2. 查询 (Read)
@@ -114,21 +167,23 @@ class AlarmMaintenanceDao:
                 print(f"[失败] 查询所有告警错误: {e}")
                 return []
 
-    def query_pending_alarms_detailed(self):
+    def query_pending_alarms_detailed(self, levels=None, plant_area_ids=None):
         """
         [查询] 获取详细的未处理告警列表 (多表连接查询)
         关联表: alarm -> device -> plant_area
         对应任务书: "覆盖不同业务场景...连接3个及以上关系" [cite: 231]
+        levels / plant_area_ids: 可选的告警等级、厂区编号过滤（告警推送快照使用）
         """
         with db_manager.get_session() as session:
             try:
-                results = session.query(
+                query = session.query(
                     Alarm.alarm_id,
                     Alarm.occur_time,
                     Alarm.alarm_level,
                     Alarm.alarm_content,
                     Device.device_name,
                     Device.device_type,
+                    Device.plant_area_id,
                     func.IFNULL(PlantArea.plant_area_name, '未知区域').label('area_name')
                 ).join(
                     Device, Alarm.device_id == Device.device_id
@@ -136,7 +191,12 @@ class AlarmMaintenanceDao:
                     PlantArea, Device.plant_area_id == PlantArea.plant_area_id
                 ).filter(
                     Alarm.status == '未处理'
-                ).order_by(
+                )
+                if levels:
+                    query = query.filter(Alarm.alarm_level.in_(levels))
+                if plant_area_ids:
+                    query = query.filter(Device.plant_area_id.in_(plant_area_ids))
+                results = query.order_by(
                     desc(Alarm.alarm_level),
                     asc(Alarm.occur_time)
                 ).all()
@@ -149,6 +209,7 @@ class AlarmMaintenanceDao:
                     'alarm_content': result.alarm_content,
                     'device_name': result.device_name,
                     'device_type': result.device_type,
+                    'plant_area_id': result.plant_area_id,
                     'area_name': result.area_name
                 } for result in results]
             except Exception as e:
@@ -196,20 +257,19 @@ class AlarmMaintenanceDao:
         """
         [修改] 处理告警，直接将告警状态改为已处理
         """
-        with db_manager.get_session() as session:
-            try:
+        try:
+            with db_manager.get_session() as session:
                 # 更新告警状态
                 alarm = session.query(Alarm).filter_by(alarm_id=alarm_id).first()
-                if alarm:
-                    alarm.status = '已处理'
-                    session.commit()
-                    print(f"[成功] 告警 {alarm_id} 处理完成")
-                    return True
-                return False
-            except Exception as e:
-                session.rollback()
-                print(f"[失败] 处理告警出错: {e}")
-                return False
+                if not alarm:
+                    return False
+                alarm.status = '已处理'
+                self._publish_after_commit([alarm_id], 'updated')
+        except Exception as e:
+            print(f"[失败] 处理告警出错: {e}")
+            return False
+        print(f"[成功] 告警 {alarm_id} 处理完成")
+        return True
 
     def complete_order(self, order_id, result_text, attachment_path):
         """
@@ -217,8 +277,8 @@ class AlarmMaintenanceDao:
         对应任务书: "修改: 更新告警处理状态" [cite: 236]
         说明: 更新工单结果 + 更新告警状态为 '已结案'
         """
-        with db_manager.get_session() as session:
-            try:
+        try:
+            with db_manager.get_session() as session:
                 # 1. 更新工单详情
                 order = session.query(MaintenanceOrder).filter_by(order_id=order_id).first()
                 if not order:
@@ -232,14 +292,12 @@ class AlarmMaintenanceDao:
                 alarm = session.query(Alarm).filter_by(alarm_id=order.alarm_id).first()
                 if alarm:
                     alarm.status = '已结案'
-
-                session.commit()
-                print(f"[成功] 工单 {order_id} 处理完成，闭环结束")
-                return True
-            except Exception as e:
-                session.rollback()
-                print(f"[失败] 完结工单出错: {e}")
-                return False
+                    self._publish_after_commit([alarm.alarm_id], 'updated')
+        except Exception as e:
+            print(f"[失败] 完结工单出错: {e}")
+            return False
+        print(f"[成功] 工单 {order_id} 处理完成，闭环结束")
+        return True
 
     # =========================================================================
     # 4. 删除 (Delete)
@@ -253,19 +311,61 @@ class AlarmMaintenanceDao:
         # 假设规则：删除 1 年前且已结案的告警
         one_year_ago = datetime.now().replace(year=datetime.now().year - 1)
         
-        with db_manager.get_session() as session:
-            try:
+        try:
+            with db_manager.get_session() as session:
                 rows_deleted = session.query(Alarm).filter(
                     and_(
                         Alarm.status == '已结案',
                         Alarm.occur_time < one_year_ago
                     )
                 ).delete()
-                
-                session.commit()
-                print(f"[成功] 已清理过期告警数据 {rows_deleted} 条")
-                return True
-            except Exception as e:
-                session.rollback()
-                print(f"[失败] 删除数据出错: {e}")
-                return False
\ No newline at end of file
+        except Exception as e:
+            print(f"[失败] 删除数据出错: {e}")
+            return False
+        print(f"[成功] 已清理过期告警数据 {rows_deleted} 条")
+        return True
+
+    # =========================================================================
+    # 5. 实时推送 (Feed)
+    # =========================================================================
+
+    def _publish_after_commit(self, alarm_ids, change):
+        """告警新增/状态流转提交后，按编号查出最新状态（含厂区）发布到告警推送；请求内回滚则不发布"""
+        db_manager.after_commit(lambda: alarm_feed.publish(change, self._query_alarms_for_feed(alarm_ids)))
+
+    def _query_alarms_for_feed(self, alarm_ids):
+        with db_manager.get_session() as session:
+            results = session.query(
+                Alarm.alarm_id,
+                Alarm.device_id,
+                Alarm.alarm_type,
+                Alarm.occur_time,
+                Alarm.alarm_level,
+                Alarm.alarm_content,
+                Alarm.status,
+                Device.device_name,
+                Device.device_type,
+                Device.plant_area_id,
+                func.IFNULL(PlantArea.plant_area_name, '未知区域').label('area_name')
+            ).join(
+                Device, Alarm.device_id == Device.device_id
+            ).outerjoin(
+                PlantArea, Device.plant_area_id == PlantArea.plant_area_id
+            ).filter(
+                Alarm.alarm_id.in_(alarm_ids)
+            ).order_by(
+                asc(Alarm.occur_time)
+            ).all()
+            return [{
+                'alarm_id': result.alarm_id,
+                'device_id': result.device_id,
+                'alarm_type': result.alarm_type,
+                'occur_time': result.occur_time,
+                'alarm_level': result.alarm_level,
+                'alarm_content': result.alarm_content,
+                'status': result.status,
+                'device_name': result.device_name,
+                'device_type': result.device_type,
+                'plant_area_id': result.plant_area_id,
+                'area_name': result.area_name
+            } for result in results]
@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select, text
+
+from base import db_manager
+from models.alarm_models import Alarm
+from models.circuit_monitoring import CircuitMonitoringData
+from models.energy_models import EnergyMonitoringData
+from models.pv_generation import PvGeneration
+from models.transformer_monitoring import TransformerMonitoringData
+from utils.id_generator import seq_floor
+from utils.pagination import encode_change_token, decode_change_token
+
+# 各表的变更流配置：单调序号列；字符串主键的表用 updated_seq（插入和修改时由列默认值生成），
+# 监测表直接用自增主键（只追加，原地修改的行不会再次出现在变更流中）
+CHANGE_FEEDS = {
+    'circuit_monitoring_data': {'model': CircuitMonitoringData, 'seq_column': 'circuit_data_id'},
+    'transformer_monitoring_data': {'model': TransformerMonitoringData, 'seq_column': 'transformer_data_id'},
+    'energy_monitoring_data': {'model': EnergyMonitoringData, 'seq_column': 'data_id'},
+    'pv_generation': {
+        'model': PvGeneration, 'seq_column': 'updated_seq',
+        'key_column': 'data_id', 'seq_index': 'idx_pv_generation_updated_seq'
+    },
+    'alarm': {
+        'model': Alarm, 'seq_column': 'updated_seq',
+        'key_column': 'alarm_id', 'seq_index': 'ix_alarm_updated_seq'
+    },
+}
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+
+# 可见性边界：序号在写入时分配、提交时才可见，较小序号的事务晚提交会被已推进的令牌跳过。
+# updated_seq 只返回 SETTLE_SECONDS 之前生成的序号；自增主键只返回 SETTLE_SECONDS 之前已观察到的最大ID以内的行。
+# 前提是写事务（含请求级事务和后台批量写入）在 SETTLE_SECONDS 内提交，更长的事务写入的行可能被跳过；
+# 代价是变更最多延迟 SETTLE_SECONDS 才出现在变更流中
+SETTLE_SECONDS = float(os.environ.get('CHANGE_FEED_SETTLE_SECONDS', 60))
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+class _IdHorizon:
+    """
+    自增主键表的可见上界：记录每次查询时看到的最大ID及时间（进程内），
+    某时刻看到最大ID为 m，说明 m 及更小的ID在那时都已分配，其事务在 SETTLE_SECONDS 后都已提交或回滚，
+    所以只返回 SETTLE_SECONDS 之前看到的最大ID以内的行；进程启动后 SETTLE_SECONDS 内没有可用上界
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = {}   # 表名 -> deque[(monotonic时间, 最大ID)]，ID递增
+
+    def bound(self, table, max_id):
+        """记录本次看到的最大ID，返回当前可见上界；还没有足够早的记录时返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.setdefault(table, deque())
+            if not seen or (max_id or 0) > seen[-1][1]:
+                seen.append((now, max_id or 0))
+            settled = None
+            while seen and seen[0][0] <= now - SETTLE_SECONDS:
+                settled = seen.popleft()
+            if settled is not None:
+                # 保留最新的已确认记录，作为之后的下限
+                seen.appendleft(settled)
+                return settled[1]
+            return None
+
+
+_id_horizon = _IdHorizon()
+
+
+class ChangeFeedDao:
+    """
+    增量变更流：按单调序号返回令牌之后的一页变更行及下一页令牌，
+    下游（BI、历史库）保存令牌后每次只拉取增量；删除不会出现在变更流中
+    """
+
+    def changes_since(self, table, token=None, limit=DEFAULT_PAGE_SIZE):
+        """返回 token 之后按序号升序的最多 limit 行；没有新变更时 next_token 与传入令牌指向同一序号"""
+        config = self._config(table)
+        since = decode_change_token(token, table)
+        limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+        source = config['model'].__table__
+        seq = source.c[config['seq_column']]
+
+        query = select(source).where(seq > since)
+        with db_manager.get_session() as session:
+            upper = self._visible_upper(session, table, config)
+            if upper is None:
+                rows = []
+            else:
+                rows = session.execute(query.where(seq < upper).order_by(seq).limit(limit + 1)).mappings().all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        last_seq = rows[-1][config['seq_column']] if rows else since
+        return {
+            'table': table,
+            'data': [self._row_to_dict(row) for row in rows],
+            'next_token': encode_change_token(table, last_seq),
+            'has_more': has_more
+        }
+
+    def latest_token(self, table):
+        """
+        当前已可见的最大序号对应的令牌：先全量导出再从此处增量同步的下游使用
+        自增主键表在进程启动后 SETTLE_SECONDS 内还没有可见上界，返回 None
+        """
+        config = self._config(table)
+        seq = config['model'].__table__.c[config['seq_column']]
+        with db_manager.get_session() as session:
+            upper = self._visible_upper(session, table, config)
+            if upper is None:
+                return None
+            last_seq = session.execute(select(func.max(seq)).where(seq < upper)).scalar()
+        return encode_change_token(table, last_seq or 0)
+
+    def _visible_upper(self, session, table, config):
+        """可见性边界（不含）：只返回序号小于它的行，None 表示暂时没有可返回的行"""
+        if 'key_column' in config:
+            return seq_floor(datetime.now() - timedelta(seconds=SETTLE_SECONDS))
+        seq = config['model'].__table__.c[config['seq_column']]
+        bound = _id_horizon.bound(table, session.execute(select(func.max(seq))).scalar())
+        return None if bound is None else bound + 1
+
+    def ensure_seq_columns(self, batch_size=BACKFILL_BATCH_SIZE):
+        """为已有库补建 updated_seq 列和索引，并按批回填历史行（雪花主键直接转成序号，其他主键记为1）"""
+        for table, config in CHANGE_FEEDS.items():
+            key_column = config.get('key_column')
+            if not key_column:
+                continue
+            with db_manager.engine.begin() as conn:
+                exists = conn.execute(text(
+                    "SELECT COUNT(*) FROM information_schema.COLUMNS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = 'updated_seq'"
+                ), {'table': table}).scalar()
+                if not exists:
+                    conn.execute(text(
+                        f"ALTER TABLE `{table}` ADD COLUMN `updated_seq` bigint NULL DEFAULT NULL "
+                        f"COMMENT '变更序号（增量同步）', ADD INDEX `{config['seq_index']}`(`updated_seq`)"
+                    ))
+                    print(f"[成功] {table} 已添加 updated_seq 列")
+
+            backfilled = 0
+            while True:
+                with db_manager.engine.begin() as conn:
+                    updated = conn.execute(text(
+                        f"UPDATE `{table}` SET updated_seq = "
+                        f"IF(`{key_column}` REGEXP '^[0-9]{{19}}$', CAST(`{key_column}` AS UNSIGNED), 1) "
+                        f"WHERE updated_seq IS NULL LIMIT :batch_size"
+                    ), {'batch_size': batch_size}).rowcount
+                backfilled += updated
+                if updated < batch_size:
+                    break
+            if backfilled:
+                print(f"[成功] {table} 回填变更序号 {backfilled} 行")
+
+    def _config(self, table):
+        config = CHANGE_FEEDS.get(table)
+        if config is None:
+            raise ValueError(f"变更流仅支持: {', '.join(CHANGE_FEEDS)}")
+        return config
+
+    def _row_to_dict(self, row):
+        result = {}
+        for name, value in row.items():
+            if isinstance(value, Decimal):
+                value = float(value)
+            elif isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            result[name] = value
+        return result
@@ -1,7 +1,18 @@
 # dao/circuit_monitoring_dao.py
 from models.circuit_monitoring import CircuitMonitoringData
+from models.substation import Substation
+from models.plant_area import PlantArea
 from base import db_manager
+from dao.SubstationStatusDao import SubstationStatusDao
+from dao.TelemetryRollupDao import mark_dirty, mark_dirty_range
+from utils.pagination import apply_keyset, build_page
+from utils.alarm_rules import alarm_rules
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+# 写入监测数据后增量刷新配电房状态快照
+status_dao = SubstationStatusDao()
 
 class CircuitMonitoringDao:
     def selectAll(self):
@@ -88,22 +99,130 @@ class CircuitMonitoringDao:
             
             return [self._record_to_dict(record) for record in records]
     
+    def selectPage(self, after=None, limit=100, substation_id=None, circuit_id=None, start_time=None, end_time=None):
+        """游标分页查询，after 为上一页最后一行的 (collection_time, circuit_data_id)"""
+        with db_manager.get_session() as session:
+            query = session.query(CircuitMonitoringData)
+            if substation_id:
+                query = query.filter(CircuitMonitoringData.substation_id == substation_id)
+            if circuit_id:
+                query = query.filter(CircuitMonitoringData.circuit_id == circuit_id)
+            if start_time and end_time:
+                query = query.filter(CircuitMonitoringData.collection_time.between(start_time, end_time))
+            records = apply_keyset(
+                query, CircuitMonitoringData.collection_time, CircuitMonitoringData.circuit_data_id, after, limit
+            ).all()
+            records, next_cursor = build_page(records, limit, 'collection_time', 'circuit_data_id')
+            return {
+                'data': [self._record_to_dict(record) for record in records],
+                'next_cursor': next_cursor
+            }
+    
+    def iterExport(self, substation_id=None, circuit_id=None, start_time=None, end_time=None, batch_size=1000):
+        """流式导出：服务端游标分批读取，逐行产出字典（不构造ORM对象）"""
+        with db_manager.get_stream_session() as session:
+            query = session.query(*CircuitMonitoringData.__table__.columns)
+            if substation_id:
+                query = query.filter(CircuitMonitoringData.substation_id == substation_id)
+            if circuit_id:
+                query = query.filter(CircuitMonitoringData.circuit_id == circuit_id)
+            if start_time and end_time:
+                query = query.filter(CircuitMonitoringData.collection_time.between(start_time, end_time))
+            for record in query.order_by(CircuitMonitoringData.collection_time).yield_per(batch_size):
+                yield self._record_to_dict(record)
+    
+    def selectColumns(self, start_time=None, end_time=None, substation_id=None, after_id=None, limit=None):
+        """
+        按列读取监测数据（附带配电房电压等级），返回 {列名: 值列表}，供向量化计算使用
+        指定 after_id 时只读自增ID更大的数据并按ID升序，用于增量扫描
+        """
+        columns = (
+            CircuitMonitoringData.circuit_data_id, CircuitMonitoringData.substation_id,
+            Substation.substation_name, PlantArea.plant_area_name, Substation.voltage_level,
+            CircuitMonitoringData.circuit_id, CircuitMonitoringData.collection_time,
+            CircuitMonitoringData.voltage, CircuitMonitoringData.current,
+            CircuitMonitoringData.active_power, CircuitMonitoringData.reactive_power,
+            CircuitMonitoringData.power_factor, CircuitMonitoringData.switch_status
+        )
+        with db_manager.get_session() as session:
+            query = session.query(*columns).join(
+                Substation, CircuitMonitoringData.substation_id == Substation.substation_id
+            ).join(
+                PlantArea, Substation.plant_area_id == PlantArea.plant_area_id
+            )
+            if substation_id:
+                query = query.filter(CircuitMonitoringData.substation_id == substation_id)
+            if start_time and end_time:
+                query = query.filter(CircuitMonitoringData.collection_time.between(start_time, end_time))
+            if after_id is not None:
+                query = query.filter(CircuitMonitoringData.circuit_data_id > after_id).order_by(
+                    CircuitMonitoringData.circuit_data_id
+                )
+            else:
+                query = query.order_by(CircuitMonitoringData.collection_time.desc())
+            if limit:
+                query = query.limit(limit)
+            rows = query.all()
+        names = [column.key for column in columns]
+        values = list(zip(*rows)) if rows else [()] * len(names)
+        return {name: list(value) for name, value in zip(names, values)}
+    
     def insert(self, data):
         """插入监测数据"""
         with db_manager.get_session() as session:
             record = CircuitMonitoringData(**data)
             session.add(record)
+            mark_dirty(session, 'circuit_monitoring_data', [data.get('collection_time')])
+        status_dao.refreshCircuitStatus([data.get('substation_id')])
+        alarm_rules.check_circuit_rows([data])
     
     def batchInsert(self, data_list):
         """批量插入监测数据"""
         with db_manager.get_session() as session:
             records = [CircuitMonitoringData(**data) for data in data_list]
             session.add_all(records)
-            session.commit()
+            session.flush()
+            mark_dirty(session, 'circuit_monitoring_data', [data.get('collection_time') for data in data_list])
             # 批量刷新获取ID
             for record in records:
                 session.refresh(record)
-            return [record.circuit_data_id for record in records]
+            record_ids = [record.circuit_data_id for record in records]
+        status_dao.refreshCircuitStatus([data.get('substation_id') for data in data_list])
+        alarm_rules.check_circuit_rows(data_list)
+        return record_ids
+    
+    def bulkUpsert(self, data_list, chunk_size=2000, after_write=True):
+        """
+        批量写入监测数据（Core层多行 INSERT ... ON DUPLICATE KEY UPDATE）
+        按 uk_circuit_time（变电站+回路+采集时间）去重，重复采样只覆盖本次提供的测量值
+        不回查ID，返回MySQL报告的受影响行数（新增计1，覆盖计2）
+        after_write=False 时只在一个事务内写数据，由调用方在数据写入后调用一次 afterWrite
+        """
+        table = CircuitMonitoringData.__table__
+        columns = [column.name for column in table.columns if column.name != 'circuit_data_id']
+        key_columns = ('substation_id', 'circuit_id', 'collection_time')
+        affected = 0
+        with db_manager.get_session() as session:
+            for start in range(0, len(data_list), chunk_size):
+                # 多行VALUES要求每行字段一致：按提供的字段分组，未提供的字段不写入也不覆盖
+                groups = {}
+                for data in data_list[start:start + chunk_size]:
+                    present = tuple(name for name in columns if name in data)
+                    groups.setdefault(present, []).append({name: data[name] for name in present})
+                for present, rows in groups.items():
+                    stmt = mysql_insert(table).values(rows)
+                    updates = {name: stmt.inserted[name] for name in present if name not in key_columns}
+                    stmt = stmt.on_duplicate_key_update(updates) if updates else stmt.prefix_with('IGNORE')
+                    affected += session.execute(stmt).rowcount
+            mark_dirty(session, 'circuit_monitoring_data', [data.get('collection_time') for data in data_list])
+        if after_write:
+            self.afterWrite(data_list)
+        return affected
+    
+    def afterWrite(self, data_list):
+        """数据写入后刷新配电房状态并检测告警（每批已写入的数据只调用一次，重复调用会重复生成告警）"""
+        status_dao.refreshCircuitStatus([data.get('substation_id') for data in data_list])
+        alarm_rules.check_circuit_rows(data_list)
     
     def update(self, circuit_data_id, new_data):
         with db_manager.get_session() as session:
@@ -115,9 +234,11 @@ class CircuitMonitoringDao:
                 print(f"监测数据ID {circuit_data_id} 不存在")
                 return None
             
+            old_time = record.collection_time
             for key, value in new_data.items():
                 if hasattr(record, key):
                     setattr(record, key, value)
+            mark_dirty(session, 'circuit_monitoring_data', [old_time, record.collection_time])
     
     def deleteById(self, circuit_data_id):
         with db_manager.get_session() as session:
@@ -127,15 +248,20 @@ class CircuitMonitoringDao:
             
             if record:
                 session.delete(record)
+                mark_dirty(session, 'circuit_monitoring_data', [record.collection_time])
                 return True
             return False
     
     def deleteBySubstation(self, substation_id):
         """删除某个变电站的所有监测数据"""
         with db_manager.get_session() as session:
+            time_range = session.query(
+                func.min(CircuitMonitoringData.collection_time), func.max(CircuitMonitoringData.collection_time)
+            ).filter(CircuitMonitoringData.substation_id == substation_id).first()
             count = session.query(CircuitMonitoringData).filter(
                 CircuitMonitoringData.substation_id == substation_id
             ).delete()
+            mark_dirty_range(session, 'circuit_monitoring_data', *time_range)
             return count  # 返回删除的行数
     
     def _record_to_dict(self, record):
@@ -0,0 +1,214 @@
+# dao/daily_summary_dao.py
+from models.daily_summary import SubstationDailySummary
+from models.substation import Substation
+from base import db_manager
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+# 每个配电房当天的采样数和功率因数
+_SAMPLE_SQL = text("""
+    SELECT substation_id,
+           COUNT(*) AS sample_count,
+           AVG(power_factor) AS avg_power_factor,
+           COUNT(power_factor) AS power_factor_samples
+    FROM circuit_monitoring_data
+    WHERE collection_time >= :day_start AND collection_time < :day_end
+    GROUP BY substation_id
+""")
+
+# 每个配电房当天的正向有功用量（读日粒度的电能区间用量，已处理表计复位和翻转）
+_ENERGY_SQL = text("""
+    SELECT substation_id, SUM(forward_energy)
+    FROM circuit_energy_interval
+    WHERE grain = '1d' AND bucket_start = :day_start
+    GROUP BY substation_id
+""")
+
+# 每个配电房每15分钟的总有功功率（各回路15分钟平均功率之和）
+_LOAD_SQL = text("""
+    SELECT substation_id, bucket_start, SUM(avg_active_power)
+    FROM circuit_monitoring_rollup
+    WHERE grain = '15m' AND bucket_start >= :day_start AND bucket_start < :day_end
+    GROUP BY substation_id, bucket_start
+""")
+
+# 当天的告警数，按设备和设备台账中的所属厂区分组
+# 回路告警的设备即所属配电房（设备编号为配电房编号），其他设备只能归到厂区
+_ALARM_SQL = text("""
+    SELECT a.device_id, d.plant_area_id, COUNT(*)
+    FROM alarm a
+    LEFT JOIN device d ON d.device_id = a.device_id
+    WHERE a.occur_time >= :day_start AND a.occur_time < :day_end
+    GROUP BY a.device_id, d.plant_area_id
+""")
+
+# 当天处于派单中（已派单且当天之前未完成）的告警设备，只有以配电房为设备的告警计入配电房
+_MAINTENANCE_SQL = text("""
+    SELECT DISTINCT a.device_id
+    FROM maintenance_order m
+    JOIN alarm a ON a.alarm_id = m.alarm_id
+    WHERE m.dispatch_time < :day_end AND (m.finish_time IS NULL OR m.finish_time >= :day_start)
+""")
+
+
+class DailySummaryDao:
+    """
+    配电房日报：按配电房、厂区和全部三个范围统计电能、15分钟峰值负荷、平均功率因数和告警数
+    历史日期首次查询时计算并保存，之后按主键直接读取；当天数据未完整，每次实时计算不保存
+    告警数：全部范围统计当天所有告警，厂区范围按设备台账的所属厂区统计，
+    配电房范围只统计以配电房为设备的告警（回路告警）
+    峰值负荷和电能读15分钟汇总和区间用量，由写入路径刷新，这里不刷新
+    """
+
+    def selectDailySummary(self, summary_date):
+        """查询某天的日报"""
+        if summary_date < date.today():
+            rows = self._select_stored(summary_date)
+            if not rows:
+                rows = self.refreshDailySummary(summary_date)
+        else:
+            rows = self._compute(summary_date)
+        return self._format(summary_date, rows)
+
+    def refreshDailySummary(self, summary_date):
+        """重新计算并保存某个历史日期的日报（补录数据后使用），返回保存的行"""
+        if summary_date >= date.today():
+            raise ValueError("只能保存已结束日期的日报")
+        rows = self._compute(summary_date)
+        table = SubstationDailySummary.__table__
+        stmt = mysql_insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update({
+            column.name: stmt.inserted[column.name]
+            for column in table.columns if column.name not in ('summary_date', 'scope', 'scope_id')
+        })
+        with db_manager.get_session() as session:
+            session.execute(stmt)
+        print(f"[成功] 已保存 {summary_date} 配电房日报 {len(rows)} 行")
+        return rows
+
+    def _select_stored(self, summary_date):
+        with db_manager.get_session() as session:
+            records = session.query(SubstationDailySummary).filter(
+                SubstationDailySummary.summary_date == summary_date
+            ).all()
+            return [
+                {column.name: getattr(record, column.name) for column in SubstationDailySummary.__table__.columns}
+                for record in records
+            ]
+
+    def _compute(self, summary_date):
+        """从监测数据、15分钟汇总和告警表计算当天所有统计行"""
+        day_start = datetime.combine(summary_date, datetime.min.time())
+        params = {
+            'day_start': day_start,
+            'day_end': day_start + timedelta(days=1)
+        }
+        with db_manager.get_session() as session:
+            stations = session.query(Substation.substation_id, Substation.plant_area_id).all()
+            samples = {row[0]: row for row in session.execute(_SAMPLE_SQL, params).all()}
+            energy = dict(session.execute(_ENERGY_SQL, params).all())
+            loads = {}
+            for substation_id, bucket_start, load in session.execute(_LOAD_SQL, params).all():
+                loads.setdefault(substation_id, {})[bucket_start] = float(load or 0)
+            alarm_rows = session.execute(_ALARM_SQL, params).all()
+            maintenance = set(session.execute(_MAINTENANCE_SQL, params).scalars().all())
+
+        now = datetime.now()
+        groups = {('all', ''): []}
+        for substation_id, plant_area_id in stations:
+            groups[('substation', substation_id)] = [substation_id]
+            groups.setdefault(('plant_area', plant_area_id), []).append(substation_id)
+            groups[('all', '')].append(substation_id)
+        area_of = dict(stations)
+        alarms = {}
+        area_alarms = {}
+        for device_id, plant_area_id, count in alarm_rows:
+            alarms[device_id] = alarms.get(device_id, 0) + count
+            area_alarms[plant_area_id] = area_alarms.get(plant_area_id, 0) + count
+
+        rows = []
+        for (scope, scope_id), members in groups.items():
+            row = self._aggregate(members, samples, energy, loads, alarms, maintenance)
+            if scope == 'all':
+                row['abnormal_events'] = sum(alarms.values())
+            elif scope == 'plant_area':
+                row['abnormal_events'] = area_alarms.get(scope_id, 0)
+            row.update({
+                'summary_date': summary_date,
+                'scope': scope,
+                'scope_id': scope_id,
+                'plant_area_id': area_of.get(scope_id) if scope == 'substation' else (scope_id if scope == 'plant_area' else None),
+                'computed_at': now
+            })
+            rows.append(row)
+        return rows
+
+    def _aggregate(self, members, samples, energy, loads, alarms, maintenance):
+        """合并一组配电房：电能和配电房告警数相加，功率因数按采样数加权，峰值负荷取各时段总负荷的最大值"""
+        total_energy = 0.0
+        power_factor_sum = 0.0
+        power_factor_samples = 0
+        bucket_loads = {}
+        operating = 0
+        for substation_id in members:
+            total_energy += float(energy.get(substation_id) or 0)
+            reading = samples.get(substation_id)
+            if reading is not None:
+                operating += 1
+                if reading.power_factor_samples:
+                    power_factor_sum += float(reading.avg_power_factor) * reading.power_factor_samples
+                    power_factor_samples += reading.power_factor_samples
+            for bucket_start, load in loads.get(substation_id, {}).items():
+                bucket_loads[bucket_start] = bucket_loads.get(bucket_start, 0.0) + load
+        peak_time = max(bucket_loads, key=bucket_loads.get) if bucket_loads else None
+        return {
+            'substation_count': len(members),
+            'operating_substations': operating,
+            'maintenance_substations': len(maintenance.intersection(members)),
+            'energy_consumption': round(total_energy, 2),
+            'peak_load': round(bucket_loads[peak_time], 2) if peak_time else None,
+            'peak_time': peak_time,
+            'avg_power_factor': round(power_factor_sum / power_factor_samples, 3) if power_factor_samples else None,
+            'power_factor_samples': power_factor_samples,
+            'abnormal_events': sum(alarms.get(substation_id, 0) for substation_id in members)
+        }
+
+    def _format(self, summary_date, rows):
+        """组装接口返回：全部范围的字段放在顶层（兼容原日报字段），厂区和配电房明细放在列表中"""
+        def to_dict(row):
+            return {
+                'substation_count': row['substation_count'],
+                'operating_substations': row['operating_substations'],
+                'maintenance_substations': row['maintenance_substations'],
+                'energy_consumption': float(row['energy_consumption']) if row['energy_consumption'] is not None else None,
+                'peak_load': float(row['peak_load']) if row['peak_load'] is not None else None,
+                'peak_time': row['peak_time'].isoformat() if row['peak_time'] else None,
+                'avg_power_factor': float(row['avg_power_factor']) if row['avg_power_factor'] is not None else None,
+                'abnormal_events': row['abnormal_events']
+            }
+
+        total = next((row for row in rows if row['scope'] == 'all'), None)
+        overall = to_dict(total) if total else {}
+        result = {
+            'date': summary_date.isoformat(),
+            'total_substations': overall.get('substation_count', 0),
+            'operating_substations': overall.get('operating_substations', 0),
+            'maintenance_substations': overall.get('maintenance_substations', 0),
+            'total_energy_consumption': overall.get('energy_consumption'),
+            'peak_load': overall.get('peak_load'),
+            'peak_time': overall.get('peak_time'),
+            'abnormal_events': overall.get('abnormal_events', 0),
+            'avg_power_factor': overall.get('avg_power_factor'),
+            'computed_at': total['computed_at'].isoformat() if total and total['computed_at'] else None,
+            'plant_areas': [],
+            'substations': []
+        }
+        for row in sorted(rows, key=lambda item: item['scope_id']):
+            if row['scope'] == 'plant_area':
+                result['plant_areas'].append(dict(to_dict(row), plant_area_id=row['scope_id']))
+            elif row['scope'] == 'substation':
+                result['substations'].append(dict(
+                    to_dict(row), substation_id=row['scope_id'], plant_area_id=row['plant_area_id']
+                ))
+        return result
@@ -3,6 +3,16 @@ from sqlalchemy import desc, asc, and_, or_, func
 from datetime import datetime, date, timedelta
 from models.dashboard_models import DashboardConfig, RealtimeSummaryData, HistoricalTrendData
 from base import db_manager
+from utils.cache import TTLCache
+
+# 最新汇总数据缓存：大屏各模块轮询共用一份，TTL取大屏配置中最短的刷新频率
+summary_cache = TTLCache()
+# 刷新频率配置单独缓存，不计入最新汇总缓存的命中统计
+refresh_config_cache = TTLCache()
+LATEST_SUMMARY_KEY = 'latest_summary'
+SUMMARY_TTL_KEY = 'summary_ttl'
+DEFAULT_SUMMARY_TTL = 5      # 未配置大屏时的缓存秒数
+SUMMARY_TTL_REFRESH = 60     # 刷新频率配置本身的缓存秒数
 
 
 class DashboardConfigDAO:
@@ -13,7 +23,8 @@ class DashboardConfigDAO:
         with db_manager.get_session() as session:
             config = DashboardConfig(**config_data)
             session.add(config)
-            session.commit()
+            session.flush()
+            db_manager.after_commit(lambda: refresh_config_cache.invalidate(SUMMARY_TTL_KEY))
             return config
 
     def get_config_by_id(self, config_id: int) -> Optional[DashboardConfig]:
@@ -46,7 +57,7 @@ class DashboardConfigDAO:
             if config:
                 for key, value in update_data.items():
                     setattr(config, key, value)
-                session.commit()
+                db_manager.after_commit(lambda: refresh_config_cache.invalidate(SUMMARY_TTL_KEY))
             return config
 
     def delete_config(self, config_id: int) -> bool:
@@ -57,7 +68,7 @@ class DashboardConfigDAO:
             ).first()
             if config:
                 session.delete(config)
-                session.commit()
+                db_manager.after_commit(lambda: refresh_config_cache.invalidate(SUMMARY_TTL_KEY))
                 return True
             return False
 
@@ -66,6 +77,19 @@ class DashboardConfigDAO:
         with db_manager.get_session() as session:
             return session.query(DashboardConfig).all()
 
+    def get_refresh_frequencies(self) -> Dict[str, int]:
+        """获取每个展示模块最短的刷新频率(秒)"""
+        with db_manager.get_session() as session:
+            rows = session.query(
+                DashboardConfig.display_module, func.min(DashboardConfig.refresh_frequency)
+            ).group_by(DashboardConfig.display_module).all()
+            return {module: frequency for module, frequency in rows}
+
+    def get_min_refresh_frequency(self) -> Optional[int]:
+        """获取所有大屏配置中最短的刷新频率(秒)"""
+        with db_manager.get_session() as session:
+            return session.query(func.min(DashboardConfig.refresh_frequency)).scalar()
+
 
 class RealtimeSummaryDAO:
     """实时汇总数据访问对象"""
@@ -75,7 +99,8 @@ class RealtimeSummaryDAO:
         with db_manager.get_session() as session:
             summary = RealtimeSummaryData(**summary_data)
             session.add(summary)
-            session.commit()
+            session.flush()
+            db_manager.after_commit(lambda: summary_cache.invalidate(LATEST_SUMMARY_KEY))
             return summary
 
     def get_summary_by_id(self, summary_id: int) -> Optional[RealtimeSummaryData]:
@@ -86,11 +111,31 @@ class RealtimeSummaryDAO:
             ).first()
 
     def get_latest_summary(self) -> Optional[RealtimeSummaryData]:
-        """获取最新的实时汇总数据"""
+        """获取最新的实时汇总数据（走进程内缓存，并发未命中只查询一次数据库）"""
+        return summary_cache.get_or_load(LATEST_SUMMARY_KEY, self._load_latest_summary, self._summary_ttl())
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取最新汇总缓存的命中统计"""
+        stats = summary_cache.stats()
+        stats['ttl_seconds'] = self._summary_ttl()
+        return stats
+
+    def _load_latest_summary(self) -> Optional[RealtimeSummaryData]:
         with db_manager.get_session() as session:
-            return session.query(RealtimeSummaryData).order_by(
+            summary = session.query(RealtimeSummaryData).order_by(
                 desc(RealtimeSummaryData.statistics_time)
             ).first()
+            if summary:
+                # 脱离会话，避免请求提交时被过期，缓存的对象可跨请求/线程只读使用
+                session.expunge(summary)
+            return summary
+
+    def _summary_ttl(self) -> int:
+        return refresh_config_cache.get_or_load(
+            SUMMARY_TTL_KEY,
+            lambda: DashboardConfigDAO().get_min_refresh_frequency() or DEFAULT_SUMMARY_TTL,
+            SUMMARY_TTL_REFRESH
+        )
 
     def get_summary_by_time_range(self, start_time: datetime, end_time: datetime) -> List[RealtimeSummaryData]:
         """根据时间范围查询实时汇总数据"""
@@ -117,7 +162,7 @@ class RealtimeSummaryDAO:
             if summary:
                 for key, value in update_data.items():
                     setattr(summary, key, value)
-                session.commit()
+                db_manager.after_commit(lambda: summary_cache.invalidate(LATEST_SUMMARY_KEY))
             return summary
 
     def delete_summary(self, summary_id: int) -> bool:
@@ -128,7 +173,7 @@ class RealtimeSummaryDAO:
             ).first()
             if summary:
                 session.delete(summary)
-                session.commit()
+                db_manager.after_commit(lambda: summary_cache.invalidate(LATEST_SUMMARY_KEY))
                 return True
             return False
 
@@ -168,7 +213,7 @@ class HistoricalTrendDAO:
         with db_manager.get_session() as session:
             trend = HistoricalTrendData(**trend_data)
             session.add(trend)
-            session.commit()
+            session.flush()
             return trend
 
     def get_trend_by_id(self, trend_id: int) -> Optional[HistoricalTrendData]:
@@ -232,7 +277,6 @@ class HistoricalTrendDAO:
             if trend:
                 for key, value in update_data.items():
                     setattr(trend, key, value)
-                session.commit()
             return trend
 
     def delete_trend(self, trend_id: int) -> bool:
@@ -243,7 +287,6 @@ class HistoricalTrendDAO:
             ).first()
             if trend:
                 session.delete(trend)
-                session.commit()
                 return True
             return False
 
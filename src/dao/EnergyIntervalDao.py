@@ -0,0 +1,320 @@
+# dao/energy_interval_dao.py
+from models.telemetry_rollup import CircuitEnergyInterval, ENERGY_GRAINS
+from dao.TelemetryRollupDao import GRAIN_SECONDS, GRAIN_BUCKET_SQL, floor_to_grain, lock_state, take_dirty
+from base import db_manager
+from datetime import timedelta
+from sqlalchemy import text, and_, or_, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+import numpy as np
+
+# 在汇总水位表和待重算时间窗中的汇总名（与回路汇总分开消费）
+WATERMARK_KEY = 'circuit_energy_interval'
+
+# 相邻读数间隔不超过该值时按时间比例把增量分摊到经过的各个桶；
+# 超过时视为数据缺口，不做插值，整段增量计入数据恢复时所在的桶并记一次缺口
+MAX_INTERPOLATE_GAP = timedelta(hours=1)
+
+# 向前查找窗口外最后一条读数的范围，超过该范围的首条读数只作为基准
+COUNTER_LOOKBACK = timedelta(days=7)
+
+# 电能表寄存器量程（kWh）：读数从接近量程回到接近0视为翻转，其余回退视为复位（复位后从0开始计）
+COUNTER_MODULUS = 1000000.0
+ROLLOVER_MARGIN = 0.1
+# 单个区间的增量超过该值视为换表（新表起始读数未知），记为复位，该区间不计用量
+MAX_INTERVAL_DELTA = COUNTER_MODULUS * ROLLOVER_MARGIN
+
+BASE_GRAIN = ENERGY_GRAINS[0]
+
+_READINGS_SQL = text("""
+    SELECT substation_id, circuit_id, collection_time, forward_active_energy, reverse_active_energy
+    FROM circuit_monitoring_data
+    WHERE collection_time >= :lower AND collection_time < :upper
+    UNION ALL
+    SELECT c.substation_id, c.circuit_id, c.collection_time, c.forward_active_energy, c.reverse_active_energy
+    FROM circuit_monitoring_data c
+    JOIN (
+        SELECT substation_id, circuit_id, MAX(collection_time) AS collection_time
+        FROM circuit_monitoring_data
+        WHERE collection_time >= :horizon AND collection_time < :lower
+        GROUP BY substation_id, circuit_id
+    ) anchor USING (substation_id, circuit_id, collection_time)
+""")
+
+
+def to_seconds(values):
+    """datetime 序列转成 int64 秒数（按本地时间的墙上时钟计算，桶边界与 floor_to_grain 一致）"""
+    return np.array(values, dtype='datetime64[s]').astype(np.int64)
+
+
+def counter_deltas(group_index, seconds, readings, modulus=COUNTER_MODULUS):
+    """
+    累计读数差分成区间用量，输入须已按 (分组, 时间) 排序，缺失读数为 NaN
+    读数回退：接近量程处回绕为翻转（补上量程），否则为复位（当前读数即复位后的用量）
+    返回 (分组, 区间起点秒, 区间终点秒, 用量, 是否复位, 是否翻转)
+    """
+    valid = ~np.isnan(readings)
+    group_index, seconds, readings = group_index[valid], seconds[valid], readings[valid]
+    # 只在同一回路内相邻且时间递增的两条读数之间求差
+    paired = (group_index[1:] == group_index[:-1]) & (seconds[1:] > seconds[:-1])
+    previous, current = readings[:-1][paired], readings[1:][paired]
+    delta = current - previous
+
+    backward = delta < 0
+    rollover = backward & (previous >= modulus * (1 - ROLLOVER_MARGIN)) & (current < modulus * ROLLOVER_MARGIN)
+    reset = backward & ~rollover
+    replaced = delta > MAX_INTERVAL_DELTA
+    delta = np.where(rollover, delta + modulus, delta)
+    delta = np.where(reset, current, delta)
+    delta = np.where(replaced, 0.0, delta)
+    reset |= replaced
+    return group_index[1:][paired], seconds[:-1][paired], seconds[1:][paired], delta, reset, rollover
+
+
+def spread_to_buckets(start, end, bucket_seconds, max_gap_seconds):
+    """
+    把区间 [start, end) 按时间比例拆到经过的各个桶，超长间隔整段计入 end 所在的桶
+    返回 (区间下标, 桶起点秒, 权重, 覆盖秒数, 是否缺口)，各区间的权重之和为1
+    """
+    gap = end - start > max_gap_seconds
+    start = np.where(gap, end - 1, start)
+    first = start // bucket_seconds
+    pieces = (end - 1) // bucket_seconds - first + 1
+
+    index = np.repeat(np.arange(len(start)), pieces)
+    offset = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    bucket = (first[index] + offset) * bucket_seconds
+    lower = np.maximum(bucket, start[index])
+    upper = np.minimum(bucket + bucket_seconds, end[index])
+    weight = (upper - lower) / (end - start)[index]
+    covered = np.where(gap[index], 0, upper - lower)
+    return index, bucket, weight, covered, gap[index]
+
+
+class EnergyIntervalDao:
+    """
+    回路电能区间用量：把累计电能表读数（正向/反向有功）按回路和时间排序后向量化差分，
+    处理表计复位、翻转和数据缺口，按15分钟桶写入 circuit_energy_interval，再合并出小时和日粒度；
+    时段用电量查询只需对预先差分好的桶求和
+    """
+
+    def refresh(self, batch_size=1000):
+        """重算回路数据写入时登记的待重算时间窗，直到处理完，返回已处理的最大登记ID"""
+        with db_manager.get_session() as session:
+            state = lock_state(session, WATERMARK_KEY)
+            while True:
+                range_id, windows = take_dirty(session, WATERMARK_KEY, batch_size)
+                if range_id is None:
+                    return state.last_data_id
+                for min_time, max_time in windows:
+                    # 读数变化会改变前后相邻区间的用量，重算范围向两侧各扩展一个最大插值间隔
+                    self._rebuild_window(session, min_time - MAX_INTERPOLATE_GAP, max_time + MAX_INTERPOLATE_GAP)
+                state.last_data_id = max(state.last_data_id, range_id)
+
+    def rebuild(self, start_time, end_time):
+        """按时间范围全量重算区间用量（用于历史补录或修正读数后）"""
+        with db_manager.get_session() as session:
+            self._rebuild_window(session, start_time, end_time)
+
+    def selectIntervals(self, substation_id, start_time, end_time, circuit_id=None, grain=BASE_GRAIN):
+        """查询回路区间用量序列"""
+        with db_manager.get_session() as session:
+            query = session.query(CircuitEnergyInterval).filter(
+                CircuitEnergyInterval.substation_id == substation_id,
+                CircuitEnergyInterval.grain == grain,
+                CircuitEnergyInterval.bucket_start >= floor_to_grain(start_time, grain),
+                CircuitEnergyInterval.bucket_start < end_time
+            )
+            if circuit_id:
+                query = query.filter(CircuitEnergyInterval.circuit_id == circuit_id)
+            records = query.order_by(CircuitEnergyInterval.circuit_id, CircuitEnergyInterval.bucket_start).all()
+            return {
+                'grain': grain,
+                'data': [self._record_to_dict(record) for record in records]
+            }
+
+    def selectEnergy(self, start_time, end_time, substation_id=None, circuit_id=None):
+        """
+        统计 [start_time, end_time) 各回路的用电量（边界按15分钟取整）
+        时间范围拆成整天、整小时和剩余的15分钟段，分别读对应粒度的桶求和
+        """
+        segments = self._decompose(floor_to_grain(start_time, BASE_GRAIN), self._ceil(end_time, BASE_GRAIN))
+        if not segments:
+            return []
+        model = CircuitEnergyInterval
+        with db_manager.get_session() as session:
+            query = session.query(
+                model.substation_id, model.circuit_id,
+                func.sum(model.forward_energy), func.sum(model.reverse_energy),
+                func.sum(model.covered_seconds), func.sum(model.reset_count),
+                func.sum(model.rollover_count), func.sum(model.gap_count)
+            ).filter(or_(*[
+                and_(model.grain == grain, model.bucket_start >= lower, model.bucket_start < upper)
+                for grain, lower, upper in segments
+            ]))
+            if substation_id:
+                query = query.filter(model.substation_id == substation_id)
+            if circuit_id:
+                query = query.filter(model.circuit_id == circuit_id)
+            rows = query.group_by(model.substation_id, model.circuit_id).order_by(
+                model.substation_id, model.circuit_id
+            ).all()
+        return [
+            {
+                'substation_id': row[0],
+                'circuit_id': row[1],
+                'forward_energy': float(row[2] or 0),
+                'reverse_energy': float(row[3] or 0),
+                'covered_seconds': int(row[4] or 0),
+                'reset_count': int(row[5] or 0),
+                'rollover_count': int(row[6] or 0),
+                'gap_count': int(row[7] or 0)
+            }
+            for row in rows
+        ]
+
+    def _rebuild_window(self, session, start_time, end_time):
+        """
+        重算 [start_time, end_time] 覆盖的15分钟桶，再逐级合并出小时桶和日桶
+        每一级先删除范围内的旧桶再写入，读数被删除或修正后不再残留旧用量
+        """
+        bucket_seconds = GRAIN_SECONDS[BASE_GRAIN]
+        lower = floor_to_grain(start_time, BASE_GRAIN)
+        upper = floor_to_grain(end_time, BASE_GRAIN) + timedelta(seconds=bucket_seconds)
+        # 与这些桶有交集的区间，两端读数都落在向外扩展一个最大插值间隔的范围内
+        rows = session.execute(_READINGS_SQL, {
+            'lower': lower - MAX_INTERPOLATE_GAP,
+            'upper': upper + MAX_INTERPOLATE_GAP,
+            'horizon': lower - MAX_INTERPOLATE_GAP - COUNTER_LOOKBACK
+        }).all()
+        self._clear(session, BASE_GRAIN, lower, upper)
+        self._upsert(session, self._compute_buckets(rows, lower, upper))
+
+        finer = BASE_GRAIN
+        for grain in ENERGY_GRAINS[1:]:
+            params = {
+                'grain': grain,
+                'finer': finer,
+                'lower': floor_to_grain(lower, grain),
+                'upper': floor_to_grain(upper - timedelta(seconds=1), grain) + timedelta(seconds=GRAIN_SECONDS[grain])
+            }
+            self._clear(session, grain, params['lower'], params['upper'])
+            session.execute(text(self._merge_sql(grain)), params)
+            finer = grain
+
+    def _compute_buckets(self, rows, lower, upper):
+        """读数差分并拆桶，只返回 [lower, upper) 内的15分钟桶"""
+        if not rows:
+            return []
+        substation_ids, circuit_ids, times, forward, reverse = zip(*rows)
+        keys = [f"{substation_id}\x00{circuit_id}" for substation_id, circuit_id in zip(substation_ids, circuit_ids)]
+        group_keys, group_index = np.unique(keys, return_inverse=True)
+        seconds = to_seconds(times)
+        order = np.lexsort((seconds, group_index))
+        group_index, seconds = group_index[order], seconds[order]
+
+        bucket_seconds = GRAIN_SECONDS[BASE_GRAIN]
+        first_bucket = to_seconds([lower])[0]
+        bucket_count = int((to_seconds([upper])[0] - first_bucket) // bucket_seconds)
+        size = len(group_keys) * bucket_count
+        totals = {}
+        for readings, column in zip((forward, reverse), ('forward_energy', 'reverse_energy')):
+            values = np.array([np.nan if value is None else float(value) for value in readings])[order]
+            group, start, end, delta, reset, rollover = counter_deltas(group_index, seconds, values)
+            index, bucket, weight, covered, gap = spread_to_buckets(
+                start, end, bucket_seconds, MAX_INTERPOLATE_GAP.total_seconds()
+            )
+            slot = (bucket - first_bucket) // bucket_seconds
+            inside = (slot >= 0) & (slot < bucket_count)
+            cell = (group[index] * bucket_count + slot)[inside]
+            index, weight, covered, gap = index[inside], weight[inside], covered[inside], gap[inside]
+            # 复位/翻转/缺口事件只计入区间结束时所在的桶
+            ends = (end[index] - 1) // bucket_seconds * bucket_seconds == bucket[inside]
+
+            totals[column] = np.bincount(cell, weights=delta[index] * weight, minlength=size)
+            totals[f'{column}_covered'] = np.bincount(cell, weights=covered, minlength=size)
+            totals[f'{column}_reset'] = np.bincount(cell, weights=reset[index] & ends, minlength=size)
+            totals[f'{column}_rollover'] = np.bincount(cell, weights=rollover[index] & ends, minlength=size)
+            totals[f'{column}_gap'] = np.bincount(cell, weights=gap & ends, minlength=size)
+            totals[f'{column}_pieces'] = np.bincount(cell, minlength=size)
+
+        pieces = totals['forward_energy_pieces'] + totals['reverse_energy_pieces']
+        buckets = []
+        for cell in np.flatnonzero(pieces):
+            group, slot = divmod(int(cell), bucket_count)
+            substation_id, circuit_id = group_keys[group].split('\x00')
+            buckets.append({
+                'substation_id': substation_id,
+                'circuit_id': circuit_id,
+                'grain': BASE_GRAIN,
+                'bucket_start': lower + timedelta(seconds=slot * bucket_seconds),
+                'forward_energy': round(float(totals['forward_energy'][cell]), 3),
+                'reverse_energy': round(float(totals['reverse_energy'][cell]), 3),
+                # 正向读数缺失时用反向读数的覆盖时长
+                'covered_seconds': int(max(totals['forward_energy_covered'][cell], totals['reverse_energy_covered'][cell])),
+                'reset_count': int(totals['forward_energy_reset'][cell] + totals['reverse_energy_reset'][cell]),
+                'rollover_count': int(totals['forward_energy_rollover'][cell] + totals['reverse_energy_rollover'][cell]),
+                'gap_count': int(max(totals['forward_energy_gap'][cell], totals['reverse_energy_gap'][cell]))
+            })
+        return buckets
+
+    def _clear(self, session, grain, lower, upper):
+        """删除某粒度 [lower, upper) 内所有回路的桶"""
+        session.execute(text(
+            "DELETE FROM circuit_energy_interval WHERE grain = :grain AND bucket_start >= :lower AND bucket_start < :upper"
+        ), {'grain': grain, 'lower': lower, 'upper': upper})
+
+    def _upsert(self, session, buckets):
+        if not buckets:
+            return
+        table = CircuitEnergyInterval.__table__
+        stmt = mysql_insert(table).values(buckets)
+        stmt = stmt.on_duplicate_key_update({
+            name: stmt.inserted[name] for name in buckets[0]
+            if name not in ('substation_id', 'circuit_id', 'grain', 'bucket_start')
+        })
+        session.execute(stmt)
+
+    def _merge_sql(self, grain):
+        """较粗粒度由上一级桶直接相加"""
+        columns = ('forward_energy', 'reverse_energy', 'covered_seconds', 'reset_count', 'rollover_count', 'gap_count')
+        update = ', '.join(f'{column} = VALUES({column})' for column in columns)
+        return (
+            f"INSERT INTO circuit_energy_interval (grain, bucket_start, substation_id, circuit_id, {', '.join(columns)}) "
+            f"SELECT :grain, {GRAIN_BUCKET_SQL[grain].format(col='bucket_start')} AS bucket, "
+            f"substation_id, circuit_id, {', '.join(f'SUM({column})' for column in columns)} "
+            f"FROM circuit_energy_interval "
+            f"WHERE grain = :finer AND bucket_start >= :lower AND bucket_start < :upper "
+            f"GROUP BY bucket, substation_id, circuit_id"
+            f" ON DUPLICATE KEY UPDATE {update}"
+        )
+
+    def _decompose(self, start_time, end_time, grains=tuple(reversed(ENERGY_GRAINS))):
+        """把时间范围拆成尽量粗的对齐段，返回 [(粒度, 起点, 终点)]"""
+        if start_time >= end_time:
+            return []
+        grain, finer = grains[0], grains[1:]
+        if not finer:
+            return [(grain, start_time, end_time)]
+        lower, upper = self._ceil(start_time, grain), floor_to_grain(end_time, grain)
+        if lower >= upper:
+            return self._decompose(start_time, end_time, finer)
+        return self._decompose(start_time, lower, finer) + [(grain, lower, upper)] + self._decompose(upper, end_time, finer)
+
+    def _ceil(self, value, grain):
+        floored = floor_to_grain(value, grain)
+        return floored if floored == value else floored + timedelta(seconds=GRAIN_SECONDS[grain])
+
+    def _record_to_dict(self, record):
+        """将区间用量记录转换为字典（内部辅助方法）"""
+        return {
+            'substation_id': record.substation_id,
+            'circuit_id': record.circuit_id,
+            'grain': record.grain,
+            'bucket_start': record.bucket_start.isoformat() if record.bucket_start else None,
+            'forward_energy': float(record.forward_energy) if record.forward_energy is not None else None,
+            'reverse_energy': float(record.reverse_energy) if record.reverse_energy is not None else None,
+            'covered_seconds': record.covered_seconds,
+            'reset_count': record.reset_count,
+            'rollover_count': record.rollover_count,
+            'gap_count': record.gap_count
+        }
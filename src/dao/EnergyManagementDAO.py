@@ -2,6 +2,8 @@ from sqlalchemy import and_, desc
 from models.energy_models import EnergyMeteringEquipment, EnergyMonitoringData, PeakValleyEnergyData
 from datetime import datetime
 from base import db_manager
+from dao.TelemetryRollupDao import mark_dirty
+from utils.pagination import apply_keyset, build_page
 
 
 class EnergyManagementDAO:
@@ -28,15 +30,35 @@ class EnergyManagementDAO:
                 verification_status=data_dict.get('verification_status', '已核实')
             )
             session.add(new_data)
-            session.commit()
+            session.flush()  # 获取自增ID，提交由会话/请求统一进行
+            mark_dirty(session, 'energy_monitoring_data', [data_dict['collection_time']])
             return new_data.data_id
 
+    def add_monitoring_data_batch(self, data_list):
+        """
+        批量录入能耗监测数据（Core层executemany，一次提交），返回写入行数
+        :param data_list: 字典列表，字段同 add_monitoring_data
+        """
+        rows = [{
+            'equipment_id': data_dict['equipment_id'],
+            'collection_time': data_dict['collection_time'],
+            'energy_consumption': data_dict['energy_consumption'],
+            'unit': data_dict['unit'],
+            'data_quality': data_dict['data_quality'],
+            'plant_area_id': data_dict['plant_area_id'],
+            'verification_status': data_dict.get('verification_status', '已核实')
+        } for data_dict in data_list]
+        with db_manager.get_session() as session:
+            session.execute(EnergyMonitoringData.__table__.insert(), rows)
+            mark_dirty(session, 'energy_monitoring_data', [row['collection_time'] for row in rows])
+        return len(rows)
+
     def add_device(self, device_dict):
         """新增能耗设备信息"""
         with db_manager.get_session() as session:
             device = EnergyMeteringEquipment(**device_dict)
             session.add(device)
-            session.commit()
+            session.flush()
             return device.equipment_id
 
     # ---------------------------------------------------------    
@@ -83,6 +105,58 @@ class EnergyManagementDAO:
             results = session.query(EnergyMonitoringData).order_by(desc(EnergyMonitoringData.collection_time)).limit(limit).all()
             return results
 
+    def get_monitoring_data_page(self, after=None, limit=100, equipment_id=None, plant_area_id=None,
+                                 start_time=None, end_time=None):
+        """
+        游标分页查询能耗监测数据
+        :param after: 上一页最后一行的 (collection_time, data_id)
+        :return: {'data': 本页记录, 'next_cursor': 下一页游标}
+        """
+        with db_manager.get_session() as session:
+            query = session.query(EnergyMonitoringData)
+            if equipment_id:
+                query = query.filter(EnergyMonitoringData.equipment_id == equipment_id)
+            if plant_area_id:
+                query = query.filter(EnergyMonitoringData.plant_area_id == plant_area_id)
+            if start_time and end_time:
+                query = query.filter(
+                    EnergyMonitoringData.collection_time >= start_time,
+                    EnergyMonitoringData.collection_time <= end_time
+                )
+            results = apply_keyset(
+                query, EnergyMonitoringData.collection_time, EnergyMonitoringData.data_id, after, limit
+            ).all()
+            results, next_cursor = build_page(results, limit, 'collection_time', 'data_id')
+            return {'data': results, 'next_cursor': next_cursor}
+
+    def iter_monitoring_data(self, equipment_id=None, plant_area_id=None, start_time=None, end_time=None,
+                             batch_size=1000):
+        """
+        流式导出能耗监测数据：服务端游标分批读取，逐行产出字典
+        """
+        with db_manager.get_stream_session() as session:
+            query = session.query(*EnergyMonitoringData.__table__.columns)
+            if equipment_id:
+                query = query.filter(EnergyMonitoringData.equipment_id == equipment_id)
+            if plant_area_id:
+                query = query.filter(EnergyMonitoringData.plant_area_id == plant_area_id)
+            if start_time and end_time:
+                query = query.filter(
+                    EnergyMonitoringData.collection_time >= start_time,
+                    EnergyMonitoringData.collection_time <= end_time
+                )
+            for d in query.order_by(EnergyMonitoringData.collection_time).yield_per(batch_size):
+                yield {
+                    "data_id": d.data_id,
+                    "equipment_id": d.equipment_id,
+                    "collection_time": d.collection_time.isoformat() if d.collection_time else None,
+                    "energy_consumption": float(d.energy_consumption) if d.energy_consumption is not None else None,
+                    "unit": d.unit,
+                    "data_quality": d.data_quality,
+                    "plant_area_id": d.plant_area_id,
+                    "verification_status": d.verification_status
+                }
+
     # ---------------------------------------------------------    
     # 任务书 3.3 要求功能：修改 (Update)
     # ---------------------------------------------------------    
@@ -94,7 +168,6 @@ class EnergyManagementDAO:
             record = session.query(EnergyMonitoringData).filter_by(data_id=data_id).first()
             if record:
                 record.verification_status = '已核实'
-                session.commit()
                 return True
             return False
 
@@ -0,0 +1,216 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func
+
+from base import db_manager
+from dao.PvForecastDao import parse_time_slot
+from models.pv_device import PvDevice
+from models.pv_forecast import PvForecast, PvForecastAccuracy, ACCURACY_SCOPES
+from utils.alarm_rules import to_float_array
+from utils.id_generator import id_timestamp
+
+# 滚动窗口天数
+ACCURACY_WINDOWS = (7, 30, 90, 365)
+
+# 预测提前量分段（小时上限）：提前量 = 时间槽起点 - 预测生成时间（由预测编号解出）
+# 无法解出生成时间或预测晚于时间槽起点（事后补录）的记为 unknown
+HORIZON_BUCKETS = (('0-6h', 6), ('6-24h', 24), ('1-2d', 48), ('2d+', np.inf))
+HORIZON_LABELS = ('all',) + tuple(label for label, _ in HORIZON_BUCKETS) + ('unknown',)
+
+PERCENTILES = (50, 90, 95)
+INSERT_CHUNK_SIZE = 1000
+
+
+def horizon_codes(forecast_ids, slot_starts):
+    """计算每条预测的提前量分段编号（HORIZON_LABELS 的下标）"""
+    issued = np.array(
+        [id_timestamp(forecast_id) or np.datetime64('NaT') for forecast_id in forecast_ids], dtype='datetime64[s]'
+    )
+    hours = (slot_starts - issued) / np.timedelta64(1, 'h')
+    bounds = np.array([limit for _, limit in HORIZON_BUCKETS])
+    codes = np.searchsorted(bounds, hours, side='left') + 1
+    return np.where(np.isnan(hours) | (hours < 0), len(HORIZON_LABELS) - 1, codes)
+
+
+def grouped_percentiles(group, values, group_count, percentiles=PERCENTILES):
+    """分组分位数（线性插值），返回 (len(percentiles), group_count) 数组，空分组为 NaN"""
+    order = np.lexsort((values, group))
+    ordered = values[order]
+    counts = np.bincount(group, minlength=group_count)
+    starts = np.cumsum(counts) - counts
+    result = np.full((len(percentiles), group_count), np.nan)
+    present = counts > 0
+    for row, percentile in enumerate(percentiles):
+        position = starts[present] + percentile / 100 * (counts[present] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        result[row, present] = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+    return result
+
+
+def grouped_metrics(group, forecast, actual, group_count):
+    """分组计算 MAPE、RMSE、MAE、偏差和绝对百分比误差分位数"""
+    error = forecast - actual
+    counts = np.bincount(group, minlength=group_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {
+            'sample_count': counts,
+            'bias': np.bincount(group, weights=error, minlength=group_count) / counts,
+            'mae': np.bincount(group, weights=np.abs(error), minlength=group_count) / counts,
+            'rmse': np.sqrt(np.bincount(group, weights=error ** 2, minlength=group_count) / counts)
+        }
+        # 百分比误差只统计实际发电量大于0的样本（夜间时间槽不计入）
+        positive = actual > 0
+        ape = np.abs(error[positive]) / actual[positive] * 100
+        metrics['mape'] = (
+            np.bincount(group[positive], weights=ape, minlength=group_count)
+            / np.bincount(group[positive], minlength=group_count)
+        )
+    for percentile, values in zip(PERCENTILES, grouped_percentiles(group[positive], ape, group_count)):
+        metrics[f'p{percentile}_ape'] = values
+    return metrics
+
+
+class ForecastAccuracyDao:
+    """
+    光伏预测精度引擎：按列读取已对账的预测（有实际发电量），用NumPy分组计算各模型版本
+    在全部/单台设备/安装位置范围、各预测提前量分段上的误差指标，按滚动窗口写入 pv_forecast_accuracy；
+    模型对比直接读指标表
+    """
+
+    def compute(self, window_end=None, windows=ACCURACY_WINDOWS):
+        """计算截止 window_end（默认昨天）的各滚动窗口指标并覆盖保存，返回写入行数"""
+        window_end = window_end or date.today() - timedelta(days=1)
+        with db_manager.get_session() as session:
+            rows = session.query(
+                PvForecast.forecast_id, PvForecast.model_version, PvForecast.device_id, PvDevice.location,
+                PvForecast.forecast_date, PvForecast.time_slot,
+                PvForecast.forecast_generation, PvForecast.actual_generation
+            ).outerjoin(
+                PvDevice, PvForecast.device_id == PvDevice.device_id
+            ).filter(
+                PvForecast.forecast_date > window_end - timedelta(days=max(windows)),
+                PvForecast.forecast_date <= window_end,
+                PvForecast.actual_generation.isnot(None)
+            ).all()
+
+        records = []
+        if rows:
+            forecast_ids, models, devices, locations, dates, slots, forecast, actual = zip(*rows)
+            forecast, actual = to_float_array(forecast), to_float_array(actual)
+            days = np.array(dates, dtype='datetime64[D]')
+            slot_minutes = np.array([(parse_time_slot(slot) or (0, 0))[0] for slot in slots], dtype=np.int64)
+            slot_starts = days.astype('datetime64[s]') + slot_minutes * np.timedelta64(60, 's')
+            horizons = horizon_codes(forecast_ids, slot_starts)
+
+            model_names, model_index = np.unique(models, return_inverse=True)
+            device_names, device_index = np.unique(devices, return_inverse=True)
+            location_names, location_index = np.unique([location or '' for location in locations], return_inverse=True)
+            # 范围编码：0 为全部，其后依次是各设备、各安装位置
+            scope_ids = [('all', '')] + [('device', name) for name in device_names] \
+                + [('location', name) for name in location_names]
+            scope_codes = (
+                np.zeros(len(rows), dtype=np.int64),
+                1 + device_index,
+                1 + len(device_names) + location_index
+            )
+
+            now = datetime.now()
+            for window_days in windows:
+                in_window = days > np.datetime64(window_end - timedelta(days=window_days), 'D')
+                if not in_window.any():
+                    continue
+                # 每条样本分别计入 3 个范围 x (不分段 + 所属提前量分段)
+                keys = np.concatenate([
+                    (model_index[in_window] * len(scope_ids) + scope_code[in_window]) * len(HORIZON_LABELS) + horizon
+                    for scope_code in scope_codes
+                    for horizon in (np.zeros(in_window.sum(), dtype=np.int64), horizons[in_window])
+                ])
+                repeat = len(scope_codes) * 2
+                group_keys, group = np.unique(keys, return_inverse=True)
+                metrics = grouped_metrics(
+                    group, np.tile(forecast[in_window], repeat), np.tile(actual[in_window], repeat), len(group_keys)
+                )
+                for i, key in enumerate(group_keys):
+                    model, remainder = divmod(int(key), len(scope_ids) * len(HORIZON_LABELS))
+                    scope_code, horizon = divmod(remainder, len(HORIZON_LABELS))
+                    scope, scope_id = scope_ids[scope_code]
+                    record = {
+                        'window_end': window_end,
+                        'window_days': window_days,
+                        'model_version': model_names[model],
+                        'scope': scope,
+                        'scope_id': scope_id,
+                        'horizon': HORIZON_LABELS[horizon],
+                        'sample_count': int(metrics['sample_count'][i]),
+                        'computed_at': now
+                    }
+                    for name in ('mape', 'rmse', 'mae', 'bias') + tuple(f'p{p}_ape' for p in PERCENTILES):
+                        value = metrics[name][i]
+                        record[name] = None if np.isnan(value) else round(float(value), 3)
+                    records.append(record)
+
+        table = PvForecastAccuracy.__table__
+        with db_manager.get_session() as session:
+            session.query(PvForecastAccuracy).filter(
+                PvForecastAccuracy.window_end == window_end,
+                PvForecastAccuracy.window_days.in_(windows)
+            ).delete(synchronize_session=False)
+            for offset in range(0, len(records), INSERT_CHUNK_SIZE):
+                session.execute(table.insert(), records[offset:offset + INSERT_CHUNK_SIZE])
+        print(f"[成功] 预测精度指标 {window_end}: {len(rows)} 条样本，写入 {len(records)} 行")
+        return len(records)
+
+    def compare(self, window_days=30, scope='all', scope_id=None, horizon='all', window_end=None):
+        """
+        模型对比：读取指定窗口、范围和提前量分段下各模型版本的指标，按 MAPE 升序
+        window_end 缺省时取最近一次计算的截止日期
+        """
+        if scope not in ACCURACY_SCOPES:
+            raise ValueError(f"统计范围仅支持: {', '.join(ACCURACY_SCOPES)}")
+        if horizon not in HORIZON_LABELS:
+            raise ValueError(f"提前量分段仅支持: {', '.join(HORIZON_LABELS)}")
+        with db_manager.get_session() as session:
+            if window_end is None:
+                window_end = session.query(func.max(PvForecastAccuracy.window_end)).filter(
+                    PvForecastAccuracy.window_days == window_days
+                ).scalar()
+                if window_end is None:
+                    return {'window_end': None, 'window_days': window_days, 'data': []}
+            query = session.query(PvForecastAccuracy).filter(
+                PvForecastAccuracy.window_end == window_end,
+                PvForecastAccuracy.window_days == window_days,
+                PvForecastAccuracy.scope == scope,
+                PvForecastAccuracy.horizon == horizon
+            )
+            if scope_id is not None:
+                query = query.filter(PvForecastAccuracy.scope_id == scope_id)
+            records = query.order_by(
+                PvForecastAccuracy.mape.is_(None), PvForecastAccuracy.mape, PvForecastAccuracy.scope_id
+            ).all()
+            return {
+                'window_end': window_end.isoformat(),
+                'window_days': window_days,
+                'data': [self._accuracy_to_dict(record) for record in records]
+            }
+
+    def _accuracy_to_dict(self, record):
+        def number(value):
+            return float(value) if value is not None else None
+
+        return {
+            'model_version': record.model_version,
+            'scope': record.scope,
+            'scope_id': record.scope_id,
+            'horizon': record.horizon,
+            'sample_count': record.sample_count,
+            'mape': number(record.mape),
+            'rmse': number(record.rmse),
+            'mae': number(record.mae),
+            'bias': number(record.bias),
+            'p50_ape': number(record.p50_ape),
+            'p90_ape': number(record.p90_ape),
+            'p95_ape': number(record.p95_ape),
+            'computed_at': record.computed_at.isoformat() if record.computed_at else None
+        }
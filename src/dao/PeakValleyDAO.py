@@ -0,0 +1,254 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from base import db_manager
+from models.energy_models import (
+    EnergyMeteringEquipment, EnergyMonitoringData, PeakValleyEnergyData, TouTariffPeriod
+)
+from dao.TelemetryRollupDao import lock_state, take_dirty
+
+# 时段类型按优先级排列，时段重叠时优先级高的覆盖低的（如夏季尖峰覆盖高峰）；下标即时段编号
+PERIOD_TYPES = ('低谷', '平段', '高峰', '尖峰')
+PERIOD_COLUMNS = ('valley_energy', 'flat_energy', 'peak_energy', 'high_peak_energy')
+DEFAULT_PERIOD = PERIOD_TYPES.index('平段')
+MINUTES_PER_DAY = 1440
+
+# 在汇总水位表和待重算时间窗中的汇总名
+WATERMARK_KEY = 'peak_valley_energy_data'
+
+
+def _minute_of_day(value):
+    return value.hour * 60 + value.minute
+
+
+def _in_season(month, start_month, end_month):
+    """月份是否在季节内；结束月小于开始月表示跨年（如 12-2 月为冬季）"""
+    if start_month <= end_month:
+        return start_month <= month <= end_month
+    return month >= start_month or month <= end_month
+
+
+def build_tariff_grid(tariffs, start_date, days):
+    """
+    把分时电价时段展开成 (天, 分钟) 的时段编号和单价二维数组
+    没有电价覆盖的分钟按平段计、单价为 NaN（不计费）
+    """
+    periods = np.full((days, MINUTES_PER_DAY), DEFAULT_PERIOD, dtype=np.int8)
+    prices = np.full((days, MINUTES_PER_DAY), np.nan)
+    ordered = sorted(tariffs, key=lambda tariff: PERIOD_TYPES.index(tariff.period_type))
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        for tariff in ordered:
+            if tariff.effective_from > day or (tariff.effective_to and tariff.effective_to < day):
+                continue
+            if not _in_season(day.month, tariff.start_month, tariff.end_month):
+                continue
+            start, end = _minute_of_day(tariff.start_time), _minute_of_day(tariff.end_time)
+            # 结束时间不大于开始时间表示跨零点（00:00-00:00 为全天）
+            spans = [(start, end)] if end > start else [(start, MINUTES_PER_DAY), (0, end)]
+            for lower, upper in spans:
+                periods[offset, lower:upper] = PERIOD_TYPES.index(tariff.period_type)
+                prices[offset, lower:upper] = float(tariff.unit_price)
+    return periods, prices
+
+
+def split_by_tariff(times, consumption, group_index, group_count, start_date, days, grids):
+    """
+    向量化拆分峰谷平电量和电费
+    每条读数代表截至采集时间的区间用量，按 (采集时间 - 1秒) 所在的日期和分钟归属时段
+    grids: 每个分组的 (时段数组, 单价数组)；返回 (电量[分组, 天, 时段], 电费[分组, 天], 读数条数[分组, 天], 无电价读数条数)
+    """
+    shifted = np.array(times, dtype='datetime64[s]') - np.timedelta64(1, 's')
+    day_start = shifted.astype('datetime64[D]')
+    day_index = (day_start - np.datetime64(start_date, 'D')).astype(np.int64)
+    minute = ((shifted - day_start) // np.timedelta64(1, 'm')).astype(np.int64)
+
+    period = np.empty(len(times), dtype=np.int64)
+    price = np.empty(len(times))
+    for group in range(group_count):
+        mask = group_index == group
+        periods, prices = grids[group]
+        period[mask] = periods[day_index[mask], minute[mask]]
+        price[mask] = prices[day_index[mask], minute[mask]]
+
+    cells = group_index * days + day_index
+    energy = np.bincount(
+        cells * len(PERIOD_TYPES) + period, weights=consumption, minlength=group_count * days * len(PERIOD_TYPES)
+    ).reshape(group_count, days, len(PERIOD_TYPES))
+    unpriced = np.isnan(price)
+    cost = np.bincount(
+        cells, weights=np.where(unpriced, 0.0, consumption * price), minlength=group_count * days
+    ).reshape(group_count, days)
+    counts = np.bincount(cells, minlength=group_count * days).reshape(group_count, days)
+    return energy, cost, counts, int(unpriced.sum())
+
+
+class PeakValleyDAO:
+    """
+    峰谷平电量与电费计算：按分时电价日历把能耗监测数据拆分到尖峰/高峰/平段/低谷，
+    按厂区+能源类型+日期写入 peak_valley_energy_data（同一天重复计算时覆盖）
+    """
+
+    def compute(self, start_date, end_date, plant_area_ids=None):
+        """
+        计算 [start_date, end_date] 每天的峰谷平数据（可限定厂区），返回写入行数
+        范围内已有的结果先删除再写入，读数被删除后不会残留旧的用量和电费
+        """
+        days = (end_date - start_date).days + 1
+        lower = datetime.combine(start_date, datetime.min.time())
+        upper = lower + timedelta(days=days)
+        with db_manager.get_session() as session:
+            query = session.query(
+                EnergyMonitoringData.plant_area_id, EnergyMeteringEquipment.energy_type,
+                EnergyMonitoringData.collection_time, EnergyMonitoringData.energy_consumption
+            ).join(
+                EnergyMeteringEquipment, EnergyMonitoringData.equipment_id == EnergyMeteringEquipment.equipment_id
+            ).filter(
+                EnergyMonitoringData.collection_time > lower,
+                EnergyMonitoringData.collection_time <= upper
+            )
+            if plant_area_ids:
+                query = query.filter(EnergyMonitoringData.plant_area_id.in_(plant_area_ids))
+            readings = query.all()
+            tariffs = session.query(
+                TouTariffPeriod.energy_type, TouTariffPeriod.period_type,
+                TouTariffPeriod.start_month, TouTariffPeriod.end_month,
+                TouTariffPeriod.start_time, TouTariffPeriod.end_time, TouTariffPeriod.unit_price,
+                TouTariffPeriod.effective_from, TouTariffPeriod.effective_to
+            ).filter(
+                TouTariffPeriod.effective_from <= end_date,
+                or_(TouTariffPeriod.effective_to.is_(None), TouTariffPeriod.effective_to >= start_date)
+            ).all()
+        if not readings:
+            self._replace(start_date, end_date, plant_area_ids, [])
+            return 0
+
+        plant_areas, energy_types, times, consumption = zip(*readings)
+        keys = [f"{plant_area_id}\x00{energy_type}" for plant_area_id, energy_type in zip(plant_areas, energy_types)]
+        group_keys, group_index = np.unique(keys, return_inverse=True)
+        group_keys = [key.split('\x00') for key in group_keys]
+
+        grid_cache = {}
+        grids = []
+        for _, energy_type in group_keys:
+            if energy_type not in grid_cache:
+                grid_cache[energy_type] = build_tariff_grid(
+                    [tariff for tariff in tariffs if tariff.energy_type == energy_type], start_date, days
+                )
+            grids.append(grid_cache[energy_type])
+
+        energy, cost, counts, unpriced = split_by_tariff(
+            times, np.array([float(value) for value in consumption]), group_index,
+            len(group_keys), start_date, days, grids
+        )
+        if unpriced:
+            print(f"[失败] {unpriced} 条能耗数据所在时段未配置分时电价，未计入电费")
+
+        rows = []
+        for group, (plant_area_id, energy_type) in enumerate(group_keys):
+            for offset in np.flatnonzero(counts[group]):
+                total = float(energy[group, offset].sum())
+                row = {
+                    'plant_area_id': plant_area_id,
+                    'energy_type': energy_type,
+                    'statistics_date': start_date + timedelta(days=int(offset)),
+                    'total_energy': round(total, 2),
+                    'energy_cost': round(float(cost[group, offset]), 2),
+                    # 综合单价 = 电费 / 总量
+                    'peak_valley_price': round(float(cost[group, offset]) / total, 4) if total else None
+                }
+                for index, column in enumerate(PERIOD_COLUMNS):
+                    row[column] = round(float(energy[group, offset, index]), 2)
+                rows.append(row)
+        self._replace(start_date, end_date, plant_area_ids, rows)
+        return len(rows)
+
+    def compute_month(self, year, month, plant_area_ids=None):
+        """计算整月的峰谷平数据"""
+        start_date = date(year, month, 1)
+        end_date = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+        return self.compute(start_date, end_date, plant_area_ids)
+
+    def refresh(self, batch_size=1000):
+        """
+        增量重算：取出能耗数据写入（含迟到补录、修改）时登记的待重算时间窗，重算涉及的日期
+        返回 {'last_data_id': 已处理的最大登记ID, 'days': 重算的天数}
+        """
+        recomputed = 0
+        with db_manager.get_session() as session:
+            state = lock_state(session, WATERMARK_KEY)
+            while True:
+                range_id, windows = take_dirty(session, WATERMARK_KEY, batch_size)
+                if range_id is None:
+                    return {'last_data_id': state.last_data_id, 'days': recomputed}
+                # 读数归属 (采集时间 - 1秒) 所在的日期，与 split_by_tariff 一致
+                days = set()
+                for min_time, max_time in windows:
+                    first = (min_time - timedelta(seconds=1)).date()
+                    last = (max_time - timedelta(seconds=1)).date()
+                    days.update(first + timedelta(days=offset) for offset in range((last - first).days + 1))
+                for statistics_date in sorted(days):
+                    self.compute(statistics_date, statistics_date)
+                recomputed += len(days)
+                state.last_data_id = max(state.last_data_id, range_id)
+
+    def get_tariffs(self, energy_type=None):
+        """查询分时电价时段"""
+        with db_manager.get_session() as session:
+            query = session.query(TouTariffPeriod)
+            if energy_type:
+                query = query.filter(TouTariffPeriod.energy_type == energy_type)
+            tariffs = query.order_by(
+                TouTariffPeriod.energy_type, TouTariffPeriod.effective_from, TouTariffPeriod.start_time
+            ).all()
+            return [self._tariff_to_dict(tariff) for tariff in tariffs]
+
+    def add_tariff(self, tariff_dict):
+        """新增分时电价时段，返回时段编号"""
+        if tariff_dict.get('period_type') not in PERIOD_TYPES:
+            raise ValueError(f"时段类型仅支持: {', '.join(PERIOD_TYPES)}")
+        # 未提供时按全年（1-12月）
+        for field in ('start_month', 'end_month'):
+            month = tariff_dict.get(field)
+            if month is None:
+                continue
+            if not isinstance(month, int) or isinstance(month, bool) or not 1 <= month <= 12:
+                raise ValueError(f"{field} 须为1-12的月份（结束月小于开始月表示跨年）")
+        with db_manager.get_session() as session:
+            tariff = TouTariffPeriod(**tariff_dict)
+            session.add(tariff)
+            session.flush()
+            return tariff.tariff_id
+
+    def _replace(self, start_date, end_date, plant_area_ids, rows):
+        """在一个事务内删除范围内（限定厂区时只删这些厂区）的旧结果并写入新结果"""
+        table = PeakValleyEnergyData.__table__
+        cleanup = table.delete().where(table.c.statistics_date.between(start_date, end_date))
+        if plant_area_ids:
+            cleanup = cleanup.where(table.c.plant_area_id.in_(plant_area_ids))
+        with db_manager.get_session() as session:
+            session.execute(cleanup)
+            if rows:
+                stmt = mysql_insert(table).values(rows)
+                stmt = stmt.on_duplicate_key_update({
+                    name: stmt.inserted[name] for name in rows[0]
+                    if name not in ('plant_area_id', 'energy_type', 'statistics_date')
+                })
+                session.execute(stmt)
+
+    def _tariff_to_dict(self, tariff):
+        return {
+            'tariff_id': tariff.tariff_id,
+            'energy_type': tariff.energy_type,
+            'period_type': tariff.period_type,
+            'start_month': tariff.start_month,
+            'end_month': tariff.end_month,
+            'start_time': tariff.start_time.strftime('%H:%M') if tariff.start_time else None,
+            'end_time': tariff.end_time.strftime('%H:%M') if tariff.end_time else None,
+            'unit_price': float(tariff.unit_price) if tariff.unit_price is not None else None,
+            'effective_from': tariff.effective_from.isoformat() if tariff.effective_from else None,
+            'effective_to': tariff.effective_to.isoformat() if tariff.effective_to else None
+        }
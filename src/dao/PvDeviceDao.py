@@ -1,5 +1,7 @@
 from models.pv_device import PvDevice
+from models.pv_generation import PvGeneration
 from base import db_manager
+from sqlalchemy import func
 
 
 class PvDeviceDao:
@@ -65,6 +67,8 @@ class PvDeviceDao:
         with db_manager.get_session() as session:
             device = session.query(PvDevice).filter(PvDevice.device_id == device_id).first()
             if device:
+                # pv_generation 为分区表没有外键，级联删除在这里完成
+                session.query(PvGeneration).filter(PvGeneration.device_id == device_id).delete(synchronize_session=False)
                 session.delete(device)
                 return True
             return False
@@ -73,6 +77,12 @@ class PvDeviceDao:
         with db_manager.get_session() as session:
             return session.query(PvDevice).filter(PvDevice.status == status).count()
 
+    def count_group_by_status(self):
+        """一次查询各状态的设备数"""
+        with db_manager.get_session() as session:
+            rows = session.query(PvDevice.status, func.count()).group_by(PvDevice.status).all()
+            return {status: count for status, count in rows}
+
     def _device_to_dict(self, device):
         return {
             'device_id': device.device_id,
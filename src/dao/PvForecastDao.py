@@ -1,5 +1,43 @@
 from models.pv_forecast import PvForecast
+from models.pv_generation import PvGeneration
 from base import db_manager
+from sqlalchemy import func, case, update
+from utils.alarm_rules import alarm_rules, to_float_array
+from utils.id_generator import next_id
+from datetime import datetime, timedelta
+import numpy as np
+
+# 偏差率字段为 DECIMAL(5,2)，超出部分按上限写入
+MAX_DEVIATION_RATE = 999.99
+# 批量回写时每条 UPDATE ... CASE 语句包含的预测条数
+RECONCILE_CHUNK_SIZE = 1000
+
+
+def parse_time_slot(time_slot):
+    """'08:00-09:00' -> (起始分钟, 结束分钟)；结束不大于开始表示跨零点（如 23:00-00:00）"""
+    try:
+        start, end = time_slot.split('-')
+        start_hour, start_minute = start.strip().split(':')
+        end_hour, end_minute = end.strip().split(':')
+    except (AttributeError, ValueError):
+        return None
+    start = int(start_hour) * 60 + int(start_minute)
+    end = int(end_hour) * 60 + int(end_minute)
+    return start, end if end > start else end + 1440
+
+
+def match_generation(slot_device, slot_start, slot_end, device, seconds, generation):
+    """
+    向量化匹配：每个预测时间槽 (slot_start, slot_end] 内同一设备的发电量求和
+    发电数据须已按 (设备, 采集时间) 排序；返回 (实际发电量, 匹配条数, 最后一条发电数据下标)
+    """
+    # 设备编号放在高位拼成单调递增的键，一次二分即可定位每个时间槽的数据范围
+    span = int(max(seconds.max(initial=0), slot_end.max(initial=0))) + 1
+    keys = device * span + seconds
+    lower = np.searchsorted(keys, slot_device * span + slot_start, side='right')
+    upper = np.searchsorted(keys, slot_device * span + slot_end, side='right')
+    cumulative = np.concatenate(([0.0], np.cumsum(generation)))
+    return cumulative[upper] - cumulative[lower], upper - lower, upper - 1
 
 
 class PvForecastDao:
@@ -23,6 +61,22 @@ class PvForecastDao:
             forecasts = session.query(PvForecast).filter(PvForecast.forecast_date == forecast_date).all()
             return [self._forecast_to_dict(forecast) for forecast in forecasts]
 
+    def select_by_device_and_date(self, device_id, forecast_date):
+        with db_manager.get_session() as session:
+            forecasts = session.query(PvForecast).filter(
+                PvForecast.device_id == device_id,
+                PvForecast.forecast_date == forecast_date
+            ).order_by(PvForecast.time_slot).all()
+            return [self._forecast_to_dict(forecast) for forecast in forecasts]
+
+    def select_by_device_and_date_range(self, device_id, start_date, end_date):
+        with db_manager.get_session() as session:
+            forecasts = session.query(PvForecast).filter(
+                PvForecast.device_id == device_id,
+                PvForecast.forecast_date.between(start_date, end_date)
+            ).order_by(PvForecast.forecast_date, PvForecast.time_slot).all()
+            return [self._forecast_to_dict(forecast) for forecast in forecasts]
+
     def select_high_deviation(self, threshold=15.0):
         with db_manager.get_session() as session:
             forecasts = session.query(PvForecast).filter(
@@ -30,23 +84,61 @@ class PvForecastDao:
             ).all()
             return [self._forecast_to_dict(forecast) for forecast in forecasts]
 
+    def aggregate_high_deviation(self, threshold=15.0, top_n=20, optimize_threshold=20.0,
+                                 start_date=None, end_date=None):
+        """
+        偏差率超过阈值的预测汇总（走 idx_deviation_rate_date 索引）
+        返回条数、最大/平均偏差、需优化条数，以及偏差最大的 top_n 条预测
+        """
+        conditions = [PvForecast.deviation_rate > threshold]
+        if start_date and end_date:
+            conditions.append(PvForecast.forecast_date.between(start_date, end_date))
+        with db_manager.get_session() as session:
+            count, max_deviation, avg_deviation, needs_optimization = session.query(
+                func.count(),
+                func.max(PvForecast.deviation_rate),
+                func.avg(PvForecast.deviation_rate),
+                func.sum(case((PvForecast.deviation_rate > optimize_threshold, 1), else_=0))
+            ).filter(*conditions).one()
+            top = session.query(PvForecast).filter(*conditions).order_by(
+                PvForecast.deviation_rate.desc(), PvForecast.forecast_date.desc()
+            ).limit(top_n).all()
+            return {
+                'high_deviation_count': count,
+                'data': [self._forecast_to_dict(forecast) for forecast in top],
+                'summary': {
+                    'max_deviation': float(max_deviation) if max_deviation is not None else 0,
+                    'avg_deviation': round(float(avg_deviation), 2) if avg_deviation is not None else 0,
+                    'needs_optimization': int(needs_optimization or 0)
+                }
+            }
+
     def insert(self, forecast_data):
+        forecast_data['forecast_id'] = forecast_data.get('forecast_id') or next_id()
         with db_manager.get_session() as session:
+            self._check_actual_data_id(session, forecast_data.get('actual_data_id'))
             forecast = PvForecast(**forecast_data)
             session.add(forecast)
-            return forecast.forecast_id
+            forecast_id = forecast.forecast_id
+        alarm_rules.check_forecast_rows([forecast_data])
+        return forecast_id
 
     def update(self, forecast_id, new_data):
         with db_manager.get_session() as session:
             forecast = session.query(PvForecast).filter(PvForecast.forecast_id == forecast_id).first()
             if not forecast:
                 return None
+            previous_rate = forecast.deviation_rate
+            if 'actual_data_id' in new_data:
+                self._check_actual_data_id(session, new_data['actual_data_id'])
 
             for key, value in new_data.items():
                 if hasattr(forecast, key):
                     setattr(forecast, key, value)
 
-            return self._forecast_to_dict(forecast)
+            result = self._forecast_to_dict(forecast)
+        alarm_rules.check_forecast_rows([result], previous_rates=[previous_rate])
+        return result
 
     def update_deviation_rate(self, forecast_id, actual_generation):
         with db_manager.get_session() as session:
@@ -58,16 +150,126 @@ class PvForecastDao:
             forecast_generation = float(forecast.forecast_generation) if forecast.forecast_generation else 0
             actual_gen = float(actual_generation) if actual_generation else 0
 
-            if forecast_generation > 0:
-                deviation = abs(actual_gen - forecast_generation) / forecast_generation * 100
-                forecast.deviation_rate = deviation
-                forecast.actual_generation = actual_generation
+            if forecast_generation <= 0:
+                return None
+            previous_rate = forecast.deviation_rate
+            deviation = abs(actual_gen - forecast_generation) / forecast_generation * 100
+            forecast.deviation_rate = deviation
+            forecast.actual_generation = actual_generation
+            row = self._forecast_to_dict(forecast)
+
+        alarm_rules.check_forecast_rows([row], previous_rates=[previous_rate])
+        return {
+            'forecast_id': row['forecast_id'],
+            'deviation_rate': float(deviation)
+        }
+
+    def reconcile_actuals(self, start_date, end_date, device_ids=None):
+        """
+        批量对账：把日期范围内的预测按设备和时间槽与发电数据匹配，
+        计算实际发电量、偏差率并关联最后一条发电数据，用 UPDATE ... CASE 分批回写
+        发电数据按采集时间归属其结束的时间槽（采集时间在 (槽起点, 槽终点] 内）
+        返回 {'forecasts': 预测条数, 'matched': 匹配到发电数据的条数, 'updated': 回写条数, 'invalid_slots': 时间槽格式错误条数}
+        """
+        with db_manager.get_session() as session:
+            query = session.query(
+                PvForecast.forecast_id, PvForecast.device_id, PvForecast.forecast_date, PvForecast.time_slot,
+                PvForecast.forecast_generation, PvForecast.actual_data_id, PvForecast.actual_generation,
+                PvForecast.deviation_rate
+            ).filter(PvForecast.forecast_date.between(start_date, end_date))
+            if device_ids:
+                query = query.filter(PvForecast.device_id.in_(device_ids))
+            forecasts = query.all()
+            if not forecasts:
+                return {'forecasts': 0, 'matched': 0, 'updated': 0, 'invalid_slots': 0}
+
+            lower = datetime.combine(start_date, datetime.min.time())
+            # 跨零点的时间槽会用到次日凌晨的数据
+            upper = datetime.combine(end_date, datetime.min.time()) + timedelta(days=2)
+            generations = session.query(
+                PvGeneration.data_id, PvGeneration.device_id, PvGeneration.collect_time, PvGeneration.generation
+            ).filter(
+                PvGeneration.device_id.in_({forecast.device_id for forecast in forecasts}),
+                PvGeneration.collect_time > lower,
+                PvGeneration.collect_time <= upper
+            ).all()
 
-                return {
-                    'forecast_id': forecast.forecast_id,
-                    'deviation_rate': float(deviation)
+        slots = [parse_time_slot(forecast.time_slot) for forecast in forecasts]
+        valid = np.array([slot is not None for slot in slots])
+        day_seconds = np.array(
+            [forecast.forecast_date for forecast in forecasts], dtype='datetime64[D]'
+        ).astype('datetime64[s]').astype(np.int64)
+        slot_minutes = np.array([slot or (0, 0) for slot in slots], dtype=np.int64).reshape(-1, 2)
+        slot_start = day_seconds + slot_minutes[:, 0] * 60
+        slot_end = day_seconds + slot_minutes[:, 1] * 60
+
+        if generations:
+            data_ids, generation_devices, times, amounts = zip(*generations)
+        else:
+            data_ids, generation_devices, times, amounts = (), (), (), ()
+        devices, device_index = np.unique(
+            [forecast.device_id for forecast in forecasts] + list(generation_devices), return_inverse=True
+        )
+        slot_device = device_index[:len(forecasts)]
+        device = device_index[len(forecasts):]
+        seconds = np.array(times, dtype='datetime64[s]').astype(np.int64)
+        order = np.lexsort((seconds, device))
+        actual, matched, last = match_generation(
+            slot_device, slot_start, slot_end, device[order], seconds[order], to_float_array(amounts)[order]
+        )
+        matched = (matched > 0) & valid
+
+        forecast_generation = to_float_array([forecast.forecast_generation for forecast in forecasts])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deviation = np.abs(actual - forecast_generation) / forecast_generation * 100
+        deviation = np.where(forecast_generation > 0, np.minimum(deviation, MAX_DEVIATION_RATE), np.nan)
+        actual = np.round(actual, 2)
+        deviation = np.round(deviation, 2)
+        actual_data_ids = [data_ids[order[index]] if count else None for index, count in zip(last, matched)]
+
+        # 只回写结果有变化的预测
+        previous_actual = to_float_array([forecast.actual_generation for forecast in forecasts])
+        previous_rate = to_float_array([forecast.deviation_rate for forecast in forecasts])
+        same_rate = (previous_rate == deviation) | (np.isnan(previous_rate) & np.isnan(deviation))
+        relinked = np.array([
+            forecast.actual_data_id != data_id for forecast, data_id in zip(forecasts, actual_data_ids)
+        ])
+        rows = []
+        for i in np.flatnonzero(matched & ((previous_actual != actual) | ~same_rate | relinked)):
+            forecast = forecasts[i]
+            rows.append({
+                'forecast_id': forecast.forecast_id,
+                'device_id': forecast.device_id,
+                'actual_data_id': actual_data_ids[i],
+                'actual_generation': float(actual[i]),
+                'deviation_rate': None if np.isnan(deviation[i]) else float(deviation[i]),
+                'previous_rate': forecast.deviation_rate
+            })
+        self._bulk_update_actuals(rows)
+        alarm_rules.check_forecast_rows(rows, previous_rates=[row['previous_rate'] for row in rows])
+        print(f"[成功] 预测对账 {start_date}~{end_date}: {len(forecasts)} 条预测，匹配 {int(matched.sum())} 条，回写 {len(rows)} 条")
+        return {
+            'forecasts': len(forecasts),
+            'matched': int(matched.sum()),
+            'updated': len(rows),
+            'invalid_slots': int((~valid).sum())
+        }
+
+    def _bulk_update_actuals(self, rows):
+        """按预测编号分批执行 UPDATE pv_forecast SET 列 = CASE forecast_id WHEN ... END WHERE forecast_id IN (...)"""
+        table = PvForecast.__table__
+        with db_manager.get_session() as session:
+            for offset in range(0, len(rows), RECONCILE_CHUNK_SIZE):
+                chunk = rows[offset:offset + RECONCILE_CHUNK_SIZE]
+                values = {
+                    column: case(
+                        {row['forecast_id']: row[column] for row in chunk}, value=table.c.forecast_id
+                    )
+                    for column in ('actual_data_id', 'actual_generation', 'deviation_rate')
                 }
-            return None
+                session.execute(update(table).where(
+                    table.c.forecast_id.in_([row['forecast_id'] for row in chunk])
+                ).values(values))
 
     def delete(self, forecast_id):
         with db_manager.get_session() as session:
@@ -77,6 +279,14 @@ class PvForecastDao:
                 return True
             return False
 
+    def _check_actual_data_id(self, session, actual_data_id):
+        """actual_data_id 是对 pv_generation 的逻辑引用（发电表按月分区不能建外键），写入前校验存在"""
+        if actual_data_id is None:
+            return
+        exists = session.query(PvGeneration.data_id).filter(PvGeneration.data_id == actual_data_id).first()
+        if not exists:
+            raise ValueError(f"发电数据 {actual_data_id} 不存在")
+
     def _forecast_to_dict(self, forecast):
         return {
             'forecast_id': forecast.forecast_id,
@@ -1,5 +1,9 @@
 from models.pv_generation import PvGeneration
+from models.pv_forecast import PvForecast
 from base import db_manager
+from sqlalchemy import func, distinct
+from utils.id_generator import next_id
+from utils.pagination import apply_keyset, build_page
 
 
 class PvGenerationDao:
@@ -25,6 +29,35 @@ class PvGenerationDao:
             ).all()
             return [self._record_to_dict(record) for record in records]
 
+    def select_page(self, after=None, limit=100, device_id=None, start_time=None, end_time=None,
+                    max_efficiency=None):
+        """游标分页查询，after 为上一页最后一行的 (collect_time, data_id)"""
+        with db_manager.get_session() as session:
+            query = session.query(PvGeneration)
+            if device_id:
+                query = query.filter(PvGeneration.device_id == device_id)
+            if start_time and end_time:
+                query = query.filter(PvGeneration.collect_time.between(start_time, end_time))
+            if max_efficiency is not None:
+                query = query.filter(PvGeneration.inverter_efficiency < max_efficiency)
+            records = apply_keyset(query, PvGeneration.collect_time, PvGeneration.data_id, after, limit).all()
+            records, next_cursor = build_page(records, limit, 'collect_time', 'data_id')
+            return {
+                'data': [self._record_to_dict(record) for record in records],
+                'next_cursor': next_cursor
+            }
+
+    def iter_export(self, device_id=None, start_time=None, end_time=None, batch_size=1000):
+        """流式导出：服务端游标分批读取，逐行产出字典（不构造ORM对象）"""
+        with db_manager.get_stream_session() as session:
+            query = session.query(*PvGeneration.__table__.columns)
+            if device_id:
+                query = query.filter(PvGeneration.device_id == device_id)
+            if start_time and end_time:
+                query = query.filter(PvGeneration.collect_time.between(start_time, end_time))
+            for record in query.order_by(PvGeneration.collect_time).yield_per(batch_size):
+                yield self._record_to_dict(record)
+
     def select_abnormal_efficiency(self, threshold=85.0):
         with db_manager.get_session() as session:
             records = session.query(PvGeneration).filter(
@@ -32,18 +65,81 @@ class PvGenerationDao:
             ).all()
             return [self._record_to_dict(record) for record in records]
 
+    def aggregate_abnormal_efficiency(self, threshold=85.0, top_n=10):
+        """
+        逆变器效率低于阈值的数据按设备聚合（走 idx_inverter_efficiency 覆盖索引）
+        返回总条数、涉及设备数，以及异常次数最多的 top_n 台设备
+        """
+        low = PvGeneration.inverter_efficiency < threshold
+        with db_manager.get_session() as session:
+            total_records, affected_devices = session.query(
+                func.count(), func.count(distinct(PvGeneration.device_id))
+            ).filter(low).one()
+            abnormal_count = func.count().label('abnormal_count')
+            rows = session.query(
+                PvGeneration.device_id,
+                abnormal_count,
+                func.min(PvGeneration.inverter_efficiency),
+                func.avg(PvGeneration.inverter_efficiency),
+                func.max(PvGeneration.collect_time)
+            ).filter(low).group_by(PvGeneration.device_id).order_by(
+                abnormal_count.desc(), PvGeneration.device_id
+            ).limit(top_n).all()
+            return {
+                'total_abnormal_records': total_records,
+                'affected_devices': affected_devices,
+                'device_details': [{
+                    'device_id': device_id,
+                    'abnormal_count': count,
+                    'min_efficiency': float(min_efficiency) if min_efficiency is not None else None,
+                    'avg_efficiency': round(float(avg_efficiency), 2) if avg_efficiency is not None else None,
+                    'latest_abnormal_time': latest.isoformat() if latest else None
+                } for device_id, count, min_efficiency, avg_efficiency, latest in rows]
+            }
+
+    def sum_generation(self, start_time, end_time):
+        """时间范围内的发电量、上网电量和自用电量合计（走分区裁剪）"""
+        with db_manager.get_session() as session:
+            generation, feed_in, self_use, records = session.query(
+                func.sum(PvGeneration.generation), func.sum(PvGeneration.feed_in),
+                func.sum(PvGeneration.self_use), func.count()
+            ).filter(
+                PvGeneration.collect_time >= start_time,
+                PvGeneration.collect_time < end_time
+            ).one()
+            return {
+                'generation': float(generation or 0),
+                'feed_in': float(feed_in or 0),
+                'self_use': float(self_use or 0),
+                'records': records
+            }
+
     def insert(self, data):
+        data['data_id'] = data.get('data_id') or next_id()
         with db_manager.get_session() as session:
             record = PvGeneration(**data)
             session.add(record)
             return record.data_id
 
     def batch_insert(self, data_list):
+        for data in data_list:
+            data['data_id'] = data.get('data_id') or next_id()
         with db_manager.get_session() as session:
             records = [PvGeneration(**data) for data in data_list]
             session.add_all(records)
             return [record.data_id for record in records]
 
+    def bulk_insert(self, data_list):
+        """批量写入发电数据（Core层executemany，不构造ORM对象），返回写入行数"""
+        # updated_seq 不放进参数，由列默认值逐行生成
+        columns = [column.name for column in PvGeneration.__table__.columns if column.name != 'updated_seq']
+        rows = [{name: data.get(name) for name in columns} for data in data_list]
+        for row in rows:
+            row['data_id'] = row['data_id'] or next_id()
+        with db_manager.get_session() as session:
+            session.execute(PvGeneration.__table__.insert(), rows)
+        return len(rows)
+
     def update(self, data_id, new_data):
         with db_manager.get_session() as session:
             record = session.query(PvGeneration).filter(PvGeneration.data_id == data_id).first()
@@ -61,6 +157,10 @@ class PvGenerationDao:
             record = session.query(PvGeneration).filter(PvGeneration.data_id == data_id).first()
             if record:
                 session.delete(record)
+                # 预测表对发电数据的关联没有外键，由这里置空（原 ON DELETE SET NULL）
+                session.query(PvForecast).filter(PvForecast.actual_data_id == data_id).update(
+                    {PvForecast.actual_data_id: None}, synchronize_session=False
+                )
                 return True
             return False
 
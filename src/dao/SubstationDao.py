@@ -35,6 +35,17 @@ class SubstationDao:
                 }
             return None
     
+    def selectVoltageLevels(self, substation_ids):
+        """批量查询电压等级，返回 {substation_id: voltage_level}"""
+        substation_ids = [substation_id for substation_id in substation_ids if substation_id]
+        if not substation_ids:
+            return {}
+        with db_manager.get_session() as session:
+            rows = session.query(Substation.substation_id, Substation.voltage_level).filter(
+                Substation.substation_id.in_(substation_ids)
+            ).all()
+            return {row[0]: row[1] for row in rows}
+    
     def selectByPlantAreaId(self, plant_area_id):
         """根据厂区ID查询变电站"""
         with db_manager.get_session() as session:
@@ -0,0 +1,141 @@
+# dao/substation_status_dao.py
+from models.substation_status import SubstationStatusSnapshot
+from models.substation import Substation
+from models.plant_area import PlantArea
+from models.user import User
+from base import db_manager
+from datetime import datetime, timedelta
+from sqlalchemy import text, bindparam
+
+# 与 substation_realtime_status_view 一致的统计窗口
+STATUS_WINDOW = timedelta(minutes=5)
+
+_REFRESH_CIRCUIT_SQL = text("""
+    INSERT INTO substation_status_snapshot
+        (substation_id, online_circuit_count, avg_voltage, total_active_power, last_data_time, circuit_updated_at)
+    SELECT s.substation_id,
+           COUNT(DISTINCT c.circuit_id),
+           AVG(c.voltage),
+           SUM(c.active_power),
+           (SELECT MAX(c2.collection_time) FROM circuit_monitoring_data c2 WHERE c2.substation_id = s.substation_id),
+           :now
+    FROM substation s
+    LEFT JOIN circuit_monitoring_data c
+        ON c.substation_id = s.substation_id AND c.collection_time >= :window_start
+    WHERE s.substation_id IN :substation_ids
+    GROUP BY s.substation_id
+    ON DUPLICATE KEY UPDATE
+        online_circuit_count = VALUES(online_circuit_count),
+        avg_voltage = VALUES(avg_voltage),
+        total_active_power = VALUES(total_active_power),
+        last_data_time = VALUES(last_data_time),
+        circuit_updated_at = VALUES(circuit_updated_at)
+""").bindparams(bindparam('substation_ids', expanding=True))
+
+_REFRESH_TRANSFORMER_SQL = text("""
+    INSERT INTO substation_status_snapshot
+        (substation_id, abnormal_transformer_count, avg_load_rate, running_status, transformer_updated_at)
+    SELECT s.substation_id,
+           COUNT(DISTINCT CASE WHEN t.running_status = '异常' THEN t.transformer_id END) AS abnormal_count,
+           AVG(t.load_rate) AS avg_load,
+           CASE
+               WHEN COUNT(DISTINCT CASE WHEN t.running_status = '异常' THEN t.transformer_id END) > 0 THEN '异常'
+               WHEN AVG(t.load_rate) > 90 THEN '重载'
+               WHEN AVG(t.load_rate) < 30 THEN '轻载'
+               ELSE '正常'
+           END,
+           :now
+    FROM substation s
+    LEFT JOIN transformer_monitoring_data t
+        ON t.substation_id = s.substation_id AND t.collection_time >= :window_start
+    WHERE s.substation_id IN :substation_ids
+    GROUP BY s.substation_id
+    ON DUPLICATE KEY UPDATE
+        abnormal_transformer_count = VALUES(abnormal_transformer_count),
+        avg_load_rate = VALUES(avg_load_rate),
+        running_status = VALUES(running_status),
+        transformer_updated_at = VALUES(transformer_updated_at)
+""").bindparams(bindparam('substation_ids', expanding=True))
+
+
+class SubstationStatusDao:
+    """
+    配电房实时状态快照
+    回路/变压器数据写入后只重算受影响配电房的近5分钟指标（走 substation_id+collection_time 索引），
+    读取时按配电房数线性返回，不再对每个配电房执行相关子查询
+    """
+
+    def refreshCircuitStatus(self, substation_ids):
+        """重算指定配电房的回路指标"""
+        self._refresh(_REFRESH_CIRCUIT_SQL, substation_ids)
+
+    def refreshTransformerStatus(self, substation_ids):
+        """重算指定配电房的变压器指标"""
+        self._refresh(_REFRESH_TRANSFORMER_SQL, substation_ids)
+
+    def refreshAll(self):
+        """全量重建快照（首次上线或快照表被清空后使用）"""
+        with db_manager.get_session() as session:
+            substation_ids = [row[0] for row in session.query(Substation.substation_id).all()]
+        self.refreshCircuitStatus(substation_ids)
+        self.refreshTransformerStatus(substation_ids)
+        return len(substation_ids)
+
+    def selectAll(self, plant_area_id=None):
+        """读取全部配电房的实时状态（字段与 substation_realtime_status_view 对应）"""
+        with db_manager.get_session() as session:
+            query = session.query(Substation, PlantArea.plant_area_name, User.full_name, SubstationStatusSnapshot).join(
+                PlantArea, Substation.plant_area_id == PlantArea.plant_area_id
+            ).outerjoin(
+                User, Substation.responsible_user_id == User.user_id
+            ).outerjoin(
+                SubstationStatusSnapshot, Substation.substation_id == SubstationStatusSnapshot.substation_id
+            )
+            if plant_area_id:
+                query = query.filter(Substation.plant_area_id == plant_area_id)
+            rows = query.order_by(PlantArea.plant_area_name, Substation.substation_name).all()
+            window_start = datetime.now() - STATUS_WINDOW
+            return [self._row_to_dict(*row, window_start=window_start) for row in rows]
+
+    def _refresh(self, statement, substation_ids):
+        substation_ids = sorted({substation_id for substation_id in substation_ids if substation_id})
+        if not substation_ids:
+            return
+        now = datetime.now()
+        with db_manager.get_session() as session:
+            session.execute(statement, {
+                'substation_ids': substation_ids,
+                'window_start': now - STATUS_WINDOW,
+                'now': now
+            })
+
+    def _row_to_dict(self, station, plant_area_name, full_name, snapshot, window_start):
+        """组装状态字典；超过统计窗口没有新数据的指标视为过期，按视图语义返回空值"""
+        result = {
+            'substation_id': station.substation_id,
+            'substation_name': station.substation_name,
+            'plant_area_name': plant_area_name,
+            'voltage_level': station.voltage_level,
+            'transformer_count': station.transformer_count,
+            'commissioning_date': station.commissioning_date.isoformat() if station.commissioning_date else None,
+            'responsible_user': full_name,
+            'online_circuit_count': 0,
+            'avg_voltage': None,
+            'total_active_power': None,
+            'abnormal_transformer_count': 0,
+            'avg_load_rate': None,
+            'running_status': '正常',
+            'last_data_time': None
+        }
+        if snapshot is None:
+            return result
+        result['last_data_time'] = snapshot.last_data_time.isoformat() if snapshot.last_data_time else None
+        if snapshot.circuit_updated_at and snapshot.circuit_updated_at >= window_start:
+            result['online_circuit_count'] = snapshot.online_circuit_count or 0
+            result['avg_voltage'] = float(snapshot.avg_voltage) if snapshot.avg_voltage is not None else None
+            result['total_active_power'] = float(snapshot.total_active_power) if snapshot.total_active_power is not None else None
+        if snapshot.transformer_updated_at and snapshot.transformer_updated_at >= window_start:
+            result['abnormal_transformer_count'] = snapshot.abnormal_transformer_count or 0
+            result['avg_load_rate'] = float(snapshot.avg_load_rate) if snapshot.avg_load_rate is not None else None
+            result['running_status'] = snapshot.running_status or '正常'
+        return result
@@ -0,0 +1,281 @@
+# dao/telemetry_rollup_dao.py
+from models.telemetry_rollup import (
+    CircuitMonitoringRollup, TransformerMonitoringRollup, TelemetryRollupState, TelemetryDirtyRange, ROLLUP_GRAINS
+)
+from base import db_manager
+from datetime import datetime, timedelta
+from sqlalchemy import text, select, delete
+
+# 各粒度的桶宽（秒）及MySQL取整表达式，{col} 为被取整的时间列
+GRAIN_SECONDS = {'1m': 60, '15m': 900, '1h': 3600, '1d': 86400}
+GRAIN_BUCKET_SQL = {
+    '1m': "TIMESTAMP(DATE_FORMAT({col}, '%Y-%m-%d %H:%i:00'))",
+    '15m': "TIMESTAMP(DATE_FORMAT({col}, '%Y-%m-%d %H:00:00')) + INTERVAL (MINUTE({col}) DIV 15 * 15) MINUTE",
+    '1h': "TIMESTAMP(DATE_FORMAT({col}, '%Y-%m-%d %H:00:00'))",
+    '1d': "TIMESTAMP(DATE({col}))",
+}
+
+# 各原始表的汇总配置：汇总表、设备ID列、测量列
+ROLLUP_SOURCES = {
+    'circuit_monitoring_data': {
+        'rollup_table': 'circuit_monitoring_rollup',
+        'device_column': 'circuit_id',
+        'metrics': ('voltage', 'current', 'active_power', 'reactive_power', 'cable_temp', 'capacitor_temp'),
+    },
+    'transformer_monitoring_data': {
+        'rollup_table': 'transformer_monitoring_rollup',
+        'device_column': 'transformer_id',
+        'metrics': ('load_rate', 'winding_temp', 'core_temp', 'ambient_temp'),
+    },
+}
+
+
+# 原始表写入时登记的待重算时间窗由哪些汇总消费（键为各汇总在水位表中的 source_table）
+DIRTY_CONSUMERS = {
+    'circuit_monitoring_data': ('circuit_monitoring_data', 'circuit_energy_interval'),
+    'transformer_monitoring_data': ('transformer_monitoring_data',),
+    'energy_monitoring_data': ('peak_valley_energy_data',),
+}
+
+# 间隔不超过该值的待重算时间窗合并成一次重算；同一批写入中相隔更远的时间点分开登记
+DIRTY_MERGE_GAP = timedelta(hours=1)
+
+
+def to_local_naive(value):
+    """把ISO字符串或带时区的时间统一成不带时区的本地时间（与库中存储的时间一致）"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def mark_dirty(session, source_table, times):
+    """
+    在写入原始数据的同一事务中登记受影响的时间窗（times 为写入/修改/删除行的采集时间）
+    时间点按 DIRTY_MERGE_GAP 切分成多个窗口，一条迟到的补录数据不会把整批扩成跨数周的重算
+    登记随数据一起提交才可见，刷新时不会因覆盖写或事务晚提交而漏算
+    """
+    times = sorted(to_local_naive(value) for value in times if value)
+    windows = []
+    for value in times:
+        if windows and value - windows[-1][1] <= DIRTY_MERGE_GAP:
+            windows[-1][1] = value
+        else:
+            windows.append([value, value])
+    _insert_dirty(session, source_table, windows)
+
+
+def mark_dirty_range(session, source_table, lower, upper):
+    """登记一段连续的待重算时间窗（用于按范围删除等无法逐行列出时间的写入）"""
+    if lower is None or upper is None:
+        return
+    _insert_dirty(session, source_table, [(to_local_naive(lower), to_local_naive(upper))])
+
+
+def _insert_dirty(session, source_table, windows):
+    if not windows:
+        return
+    now = datetime.now()
+    session.execute(TelemetryDirtyRange.__table__.insert(), [
+        {'consumer': consumer, 'min_time': lower, 'max_time': upper, 'created_at': now}
+        for lower, upper in windows
+        for consumer in DIRTY_CONSUMERS[source_table]
+    ])
+
+
+def take_dirty(session, consumer, batch_size):
+    """
+    取出一批待重算时间窗并在当前事务中删除登记，返回 (最大登记ID, 合并后的 [(起, 止)])；没有时返回 (None, [])
+    调用方须持有该汇总的水位行锁，重算与删除登记同一事务提交，失败回滚后登记仍在
+    """
+    table = TelemetryDirtyRange.__table__
+    rows = session.execute(
+        select(table.c.range_id, table.c.min_time, table.c.max_time)
+        .where(table.c.consumer == consumer).order_by(table.c.range_id).limit(batch_size)
+    ).all()
+    if not rows:
+        return None, []
+    range_ids = [row.range_id for row in rows]
+    session.execute(delete(table).where(table.c.range_id.in_(range_ids)))
+    windows = []
+    for row in sorted(rows, key=lambda row: row.min_time):
+        if windows and row.min_time <= windows[-1][1] + DIRTY_MERGE_GAP:
+            windows[-1][1] = max(windows[-1][1], row.max_time)
+        else:
+            windows.append([row.min_time, row.max_time])
+    return max(range_ids), windows
+
+
+def lock_state(session, consumer):
+    """锁定（不存在则创建）汇总的水位行，保证同一汇总同时只有一个刷新在进行"""
+    state = session.query(TelemetryRollupState).filter(
+        TelemetryRollupState.source_table == consumer
+    ).with_for_update().first()
+    if not state:
+        state = TelemetryRollupState(source_table=consumer, last_data_id=0)
+        session.add(state)
+        session.flush()
+    return state
+
+
+def floor_to_grain(value, grain):
+    """把时间向下取整到桶起点（与 GRAIN_BUCKET_SQL 一致）"""
+    if grain == '1d':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if grain == '1h':
+        return value.replace(minute=0, second=0, microsecond=0)
+    if grain == '15m':
+        return value.replace(minute=value.minute // 15 * 15, second=0, microsecond=0)
+    return value.replace(second=0, microsecond=0)
+
+
+def choose_grain(start_time, end_time, max_points=500):
+    """选择桶数不超过 max_points 的最细粒度；范围越长粒度越粗，都超出时用日汇总"""
+    span = (end_time - start_time).total_seconds()
+    for grain in ROLLUP_GRAINS:
+        if span / GRAIN_SECONDS[grain] <= max_points:
+            return grain
+    return ROLLUP_GRAINS[-1]
+
+
+class TelemetryRollupDao:
+    """
+    回路/变压器监测数据的时间桶汇总（1分钟/15分钟/1小时/1天）
+    1分钟桶由原始数据聚合，更粗的桶由上一级桶按采样数加权合并，
+    增量刷新只重算写入路径登记的待重算时间窗（见 mark_dirty）
+    """
+
+    def refresh(self, source_table, batch_size=1000):
+        """增量刷新一张原始表的汇总直到没有待重算时间窗，每批最多取 batch_size 条登记，返回已处理的最大登记ID"""
+        with db_manager.get_session() as session:
+            state = lock_state(session, source_table)
+            while True:
+                range_id, windows = take_dirty(session, source_table, batch_size)
+                if range_id is None:
+                    return state.last_data_id
+                for min_time, max_time in windows:
+                    self._rebuild_window(session, source_table, min_time, max_time)
+                state.last_data_id = max(state.last_data_id, range_id)
+
+    def refreshAll(self, batch_size=1000):
+        """刷新回路和变压器两张原始表的汇总"""
+        return {source_table: self.refresh(source_table, batch_size) for source_table in ROLLUP_SOURCES}
+
+    def rebuild(self, source_table, start_time, end_time):
+        """按时间范围全量重算汇总（用于历史补录或修正数据后）"""
+        with db_manager.get_session() as session:
+            self._rebuild_window(session, source_table, start_time, end_time)
+
+    def selectCircuitSeries(self, substation_id, start_time, end_time, circuit_id=None, grain=None, max_points=500):
+        """查询回路汇总曲线，未指定粒度时按时间范围自动选择"""
+        return self._select_series(
+            CircuitMonitoringRollup, 'circuit_monitoring_data', substation_id, circuit_id,
+            start_time, end_time, grain, max_points
+        )
+
+    def selectTransformerSeries(self, substation_id, start_time, end_time, transformer_id=None, grain=None, max_points=500):
+        """查询变压器汇总曲线，未指定粒度时按时间范围自动选择"""
+        return self._select_series(
+            TransformerMonitoringRollup, 'transformer_monitoring_data', substation_id, transformer_id,
+            start_time, end_time, grain, max_points
+        )
+
+    def _select_series(self, model, source_table, substation_id, device_id, start_time, end_time, grain, max_points):
+        config = ROLLUP_SOURCES[source_table]
+        grain = grain or choose_grain(start_time, end_time, max_points)
+        device_column = getattr(model, config['device_column'])
+        with db_manager.get_session() as session:
+            query = session.query(model).filter(
+                model.substation_id == substation_id,
+                model.grain == grain,
+                model.bucket_start >= floor_to_grain(start_time, grain),
+                model.bucket_start < end_time
+            )
+            if device_id:
+                query = query.filter(device_column == device_id)
+            records = query.order_by(device_column, model.bucket_start).all()
+            return {
+                'grain': grain,
+                'data': [self._record_to_dict(record, config) for record in records]
+            }
+
+    def _rebuild_window(self, session, source_table, min_time, max_time):
+        """
+        逐级重算覆盖 [min_time, max_time] 的所有桶：原始数据 -> 1m -> 15m -> 1h -> 1d
+        每一级先删除窗口内的旧桶再重新聚合，原始数据被删除或移走后对应的桶也随之清除
+        """
+        config = ROLLUP_SOURCES[source_table]
+        finer = None
+        for grain in ROLLUP_GRAINS:
+            lower = floor_to_grain(min_time, grain)
+            upper = floor_to_grain(max_time, grain) + timedelta(seconds=GRAIN_SECONDS[grain])
+            if finer is None:
+                sql = self._raw_rollup_sql(source_table, config, grain)
+            else:
+                sql = self._merge_rollup_sql(config, grain)
+            params = {'grain': grain, 'finer': finer, 'lower': lower, 'upper': upper}
+            session.execute(text(
+                f"DELETE FROM {config['rollup_table']} "
+                f"WHERE grain = :grain AND bucket_start >= :lower AND bucket_start < :upper"
+            ), params)
+            session.execute(text(sql), params)
+            finer = grain
+
+    def _upsert_prefix(self, config):
+        columns = ['grain', 'bucket_start', 'substation_id', config['device_column'], 'sample_count']
+        for metric in config['metrics']:
+            columns += [f'avg_{metric}', f'min_{metric}', f'max_{metric}']
+        update = ', '.join(f'{column} = VALUES({column})' for column in columns[4:])
+        return f"INSERT INTO {config['rollup_table']} ({', '.join(columns)}) ", f" ON DUPLICATE KEY UPDATE {update}"
+
+    def _raw_rollup_sql(self, source_table, config, grain):
+        """最细粒度：直接聚合原始数据"""
+        insert, update = self._upsert_prefix(config)
+        device = config['device_column']
+        aggregates = ', '.join(
+            f'AVG({metric}), MIN({metric}), MAX({metric})' for metric in config['metrics']
+        )
+        return (
+            insert
+            + f"SELECT :grain, {GRAIN_BUCKET_SQL[grain].format(col='collection_time')} AS bucket, "
+            f"substation_id, {device}, COUNT(*), {aggregates} "
+            f"FROM {source_table} "
+            f"WHERE collection_time >= :lower AND collection_time < :upper "
+            f"GROUP BY bucket, substation_id, {device}"
+            + update
+        )
+
+    def _merge_rollup_sql(self, config, grain):
+        """较粗粒度：由上一级桶合并，平均值按采样数加权"""
+        insert, update = self._upsert_prefix(config)
+        device = config['device_column']
+        aggregates = ', '.join(
+            f'SUM(avg_{metric} * sample_count) / NULLIF(SUM(CASE WHEN avg_{metric} IS NOT NULL THEN sample_count END), 0), '
+            f'MIN(min_{metric}), MAX(max_{metric})'
+            for metric in config['metrics']
+        )
+        return (
+            insert
+            + f"SELECT :grain, {GRAIN_BUCKET_SQL[grain].format(col='bucket_start')} AS bucket, "
+            f"substation_id, {device}, SUM(sample_count), {aggregates} "
+            f"FROM {config['rollup_table']} "
+            f"WHERE grain = :finer AND bucket_start >= :lower AND bucket_start < :upper "
+            f"GROUP BY bucket, substation_id, {device}"
+            + update
+        )
+
+    def _record_to_dict(self, record, config):
+        """将汇总记录转换为字典（内部辅助方法）"""
+        result = {
+            'substation_id': record.substation_id,
+            config['device_column']: getattr(record, config['device_column']),
+            'grain': record.grain,
+            'bucket_start': record.bucket_start.isoformat() if record.bucket_start else None,
+            'sample_count': record.sample_count,
+        }
+        for metric in config['metrics']:
+            for prefix in ('avg', 'min', 'max'):
+                value = getattr(record, f'{prefix}_{metric}')
+                result[f'{prefix}_{metric}'] = float(value) if value is not None else None
+        return result
@@ -1,6 +1,13 @@
 # dao/transformer_monitoring_dao.py
 from models.transformer_monitoring import TransformerMonitoringData
 from base import db_manager
+from dao.SubstationStatusDao import SubstationStatusDao
+from dao.TelemetryRollupDao import mark_dirty
+from utils.pagination import apply_keyset, build_page
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+# 写入监测数据后增量刷新配电房状态快照
+status_dao = SubstationStatusDao()
 
 class TransformerMonitoringDao:
     def selectAll(self):
@@ -57,10 +64,77 @@ class TransformerMonitoringDao:
             
             return [self._record_to_dict(record) for record in records]
     
+    def selectPage(self, after=None, limit=100, substation_id=None, transformer_id=None, abnormal_only=False):
+        """游标分页查询，after 为上一页最后一行的 (collection_time, transformer_data_id)"""
+        with db_manager.get_session() as session:
+            query = session.query(TransformerMonitoringData)
+            if substation_id:
+                query = query.filter(TransformerMonitoringData.substation_id == substation_id)
+            if transformer_id:
+                query = query.filter(TransformerMonitoringData.transformer_id == transformer_id)
+            if abnormal_only:
+                query = query.filter(TransformerMonitoringData.running_status == '异常')
+            records = apply_keyset(
+                query, TransformerMonitoringData.collection_time, TransformerMonitoringData.transformer_data_id,
+                after, limit
+            ).all()
+            records, next_cursor = build_page(records, limit, 'collection_time', 'transformer_data_id')
+            return {
+                'data': [self._record_to_dict(record) for record in records],
+                'next_cursor': next_cursor
+            }
+    
+    def iterExport(self, substation_id=None, transformer_id=None, start_time=None, end_time=None, batch_size=1000):
+        """流式导出：服务端游标分批读取，逐行产出字典（不构造ORM对象）"""
+        with db_manager.get_stream_session() as session:
+            query = session.query(*TransformerMonitoringData.__table__.columns)
+            if substation_id:
+                query = query.filter(TransformerMonitoringData.substation_id == substation_id)
+            if transformer_id:
+                query = query.filter(TransformerMonitoringData.transformer_id == transformer_id)
+            if start_time and end_time:
+                query = query.filter(TransformerMonitoringData.collection_time.between(start_time, end_time))
+            for record in query.order_by(TransformerMonitoringData.collection_time).yield_per(batch_size):
+                yield self._record_to_dict(record)
+    
     def insert(self, data):
         with db_manager.get_session() as session:
             record = TransformerMonitoringData(**data)
             session.add(record)
+            mark_dirty(session, 'transformer_monitoring_data', [data.get('collection_time')])
+        status_dao.refreshTransformerStatus([data.get('substation_id')])
+    
+    def bulkUpsert(self, data_list, chunk_size=2000, after_write=True):
+        """
+        批量写入监测数据（Core层多行 INSERT ... ON DUPLICATE KEY UPDATE）
+        按 uk_transformer_time（变电站+变压器+采集时间）去重，重复采样只覆盖本次提供的测量值，
+        返回MySQL报告的受影响行数
+        after_write=False 时只在一个事务内写数据，由调用方在数据写入后调用一次 afterWrite
+        """
+        table = TransformerMonitoringData.__table__
+        columns = [column.name for column in table.columns if column.name != 'transformer_data_id']
+        key_columns = ('substation_id', 'transformer_id', 'collection_time')
+        affected = 0
+        with db_manager.get_session() as session:
+            for start in range(0, len(data_list), chunk_size):
+                # 按提供的字段分组，未提供的字段不写入也不覆盖
+                groups = {}
+                for data in data_list[start:start + chunk_size]:
+                    present = tuple(name for name in columns if name in data)
+                    groups.setdefault(present, []).append({name: data[name] for name in present})
+                for present, rows in groups.items():
+                    stmt = mysql_insert(table).values(rows)
+                    updates = {name: stmt.inserted[name] for name in present if name not in key_columns}
+                    stmt = stmt.on_duplicate_key_update(updates) if updates else stmt.prefix_with('IGNORE')
+                    affected += session.execute(stmt).rowcount
+            mark_dirty(session, 'transformer_monitoring_data', [data.get('collection_time') for data in data_list])
+        if after_write:
+            self.afterWrite(data_list)
+        return affected
+    
+    def afterWrite(self, data_list):
+        """数据写入后刷新配电房状态"""
+        status_dao.refreshTransformerStatus([data.get('substation_id') for data in data_list])
     
     def update(self, transformer_data_id, new_data):
         with db_manager.get_session() as session:
@@ -72,9 +146,11 @@ class TransformerMonitoringDao:
                 print(f"变压器监测数据ID {transformer_data_id} 不存在")
                 return None
             
+            old_time = record.collection_time
             for key, value in new_data.items():
                 if hasattr(record, key):
                     setattr(record, key, value)
+            mark_dirty(session, 'transformer_monitoring_data', [old_time, record.collection_time])
     
     def deleteById(self, transformer_data_id):
         with db_manager.get_session() as session:
@@ -84,7 +160,7 @@ class TransformerMonitoringDao:
             
             if record:
                 session.delete(record)
-                session.commit()
+                mark_dirty(session, 'transformer_monitoring_data', [record.collection_time])
                 return True
             return False
     
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, DECIMAL
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, ForeignKey, DECIMAL
 from base import db_manager
 from models.plant_area import PlantArea
+from utils.id_generator import next_seq
 
 Base = db_manager.Base
 
@@ -8,6 +9,7 @@ class Device(Base):
     __tablename__ = 'device'
     device_id = Column(String(20), primary_key=True)
     device_name = Column(String(100), nullable=False)
+    device_category = Column(String(50), comment='大类: 光伏/能耗/配电')
     device_type = Column(String(50), nullable=False)
     plant_area_id = Column(String(20), ForeignKey('plant_area.plant_area_id'))
     manufacturer = Column(String(100))
@@ -26,6 +28,7 @@ class Alarm(Base):
     alarm_content = Column(String(255), nullable=False)
     status = Column(String(20), default='未处理')
     threshold_value = Column(DECIMAL(10, 2))
+    updated_seq = Column(BigInteger, default=next_seq, onupdate=next_seq, index=True)  # 变更序号，增量同步（变更流）使用
 
 class MaintenanceOrder(Base):
     __tablename__ = 'maintenance_order'
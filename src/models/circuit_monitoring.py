@@ -1,5 +1,5 @@
 # models/circuit_monitoring.py
-from sqlalchemy import Column, String, Integer, DateTime, Numeric, ForeignKey, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, String, Integer, DateTime, Numeric, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from base import db_manager
 from datetime import datetime
@@ -12,13 +12,14 @@ class CircuitMonitoringData(Base):
     __table_args__ = (
         CheckConstraint('power_factor < 1 AND power_factor > -1', name='ck_power_factor_range'),
         CheckConstraint("switch_status IN ('分闸', '合闸')", name='ck_switch_status'),
-        UniqueConstraint('substation_id', 'circuit_id', 'collection_time', name='uk_circuit_time')
+        UniqueConstraint('substation_id', 'circuit_id', 'collection_time', name='uk_circuit_time'),
+        Index('idx_circuit_substation_time', 'substation_id', 'collection_time')
     )
     
     circuit_data_id = Column(Integer, primary_key=True, autoincrement=True)  # BIGINT 在SQLAlchemy中通常用Integer
-    substation_id = Column(String(20), ForeignKey('substation.substation_id'), nullable=False)
+    substation_id = Column(String(20), nullable=False)  # 逻辑外键 substation.substation_id（分区表不支持外键）
     circuit_id = Column(String(20), nullable=False)
-    collection_time = Column(DateTime, nullable=False, default=datetime.now)
+    collection_time = Column(DateTime, primary_key=True, nullable=False, default=datetime.now)  # 分区列，须包含在主键中
     voltage = Column(Numeric(10, 2), comment='单位: kV')  # DECIMAL在SQLAlchemy中用Numeric
     current = Column(Numeric(10, 2), comment='单位: A')
     active_power = Column(Numeric(10, 2), comment='单位: kW')
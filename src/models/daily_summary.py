@@ -0,0 +1,29 @@
+# models/daily_summary.py
+from sqlalchemy import Column, String, Integer, Date, DateTime, Numeric
+from base import db_manager
+from datetime import datetime
+
+Base = db_manager.Base
+
+# 日报统计范围：单个配电房 / 厂区 / 全部
+SUMMARY_SCOPES = ('substation', 'plant_area', 'all')
+
+
+class SubstationDailySummary(Base):
+    """配电房日报表：每个历史日期计算一次后保存，之后按主键直接读取"""
+    __tablename__ = 'substation_daily_summary'
+
+    summary_date = Column(Date, primary_key=True)
+    scope = Column(String(12), primary_key=True, comment='统计范围: substation/plant_area/all')
+    scope_id = Column(String(20), primary_key=True, comment='配电房编号/厂区编号，全部时为空串')
+    plant_area_id = Column(String(20))
+    substation_count = Column(Integer, nullable=False, default=0)
+    operating_substations = Column(Integer, nullable=False, default=0, comment='当日有监测数据的配电房数')
+    maintenance_substations = Column(Integer, nullable=False, default=0, comment='当日有运维工单的配电房数')
+    energy_consumption = Column(Numeric(15, 2), comment='正向有功电能增量，单位：kWh')
+    peak_load = Column(Numeric(12, 2), comment='15分钟平均有功功率最大值，单位：kW')
+    peak_time = Column(DateTime, comment='峰值负荷所在15分钟时段起点')
+    avg_power_factor = Column(Numeric(4, 3))
+    power_factor_samples = Column(Integer, nullable=False, default=0, comment='功率因数采样数，用于加权合并')
+    abnormal_events = Column(Integer, nullable=False, default=0, comment='当日告警数')
+    computed_at = Column(DateTime, default=datetime.now)
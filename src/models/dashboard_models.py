@@ -2,6 +2,9 @@ from sqlalchemy import Column, BigInteger, String, Integer, DateTime, Date, DECI
 from datetime import datetime
 from base import db_manager
 
+# 大屏展示模块
+DISPLAY_MODULES = ('能源总览', '光伏总览', '配电网运行状态', '告警统计')
+
 
 class DashboardConfig(db_manager.Base):
     """大屏展示配置表模型"""
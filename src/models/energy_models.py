@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, DECIMAL, Date, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, DECIMAL, Date, Time, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from base import db_manager
@@ -31,8 +31,8 @@ class EnergyMonitoringData(db_manager.Base):
     __tablename__ = 'energy_monitoring_data'
 
     data_id = Column(Integer, primary_key=True, autoincrement=True, comment='数据编号')
-    equipment_id = Column(String(20), ForeignKey('energy_metering_equipment.equipment_id'), nullable=False)
-    collection_time = Column(DateTime, nullable=False, comment='采集时间')
+    equipment_id = Column(String(20), nullable=False)  # 逻辑外键 energy_metering_equipment.equipment_id（分区表不支持外键）
+    collection_time = Column(DateTime, primary_key=True, nullable=False, comment='采集时间')  # 分区列，须包含在主键中
     energy_consumption = Column(DECIMAL(15, 2), nullable=False, comment='能耗值')
     unit = Column(String(10), nullable=False, comment='单位')
     data_quality = Column(String(4), nullable=False, comment='数据质量')
@@ -49,6 +49,10 @@ class EnergyMonitoringData(db_manager.Base):
 class PeakValleyEnergyData(db_manager.Base):
     __tablename__ = 'peak_valley_energy_data'
 
+    __table_args__ = (
+        UniqueConstraint('statistics_date', 'plant_area_id', 'energy_type', name='uk_peak_valley_date_area_type'),
+    )
+
     record_id = Column(Integer, primary_key=True, autoincrement=True)
     energy_type = Column(String(10), nullable=False)
     plant_area_id = Column(String(20), nullable=False)
@@ -65,3 +69,27 @@ class PeakValleyEnergyData(db_manager.Base):
 
     def __repr__(self):
         return f"<PeakValley(date='{self.statistics_date}', area='{self.plant_area_id}', cost={self.energy_cost})>"
+
+
+# 4. 分时电价（峰谷平）时段模型
+# 对应表: tou_tariff_period
+class TouTariffPeriod(db_manager.Base):
+    __tablename__ = 'tou_tariff_period'
+
+    __table_args__ = (
+        Index('idx_tariff_type_effective', 'energy_type', 'effective_from'),
+    )
+
+    tariff_id = Column(Integer, primary_key=True, autoincrement=True)
+    energy_type = Column(String(10), nullable=False, comment='能源类型')
+    period_type = Column(String(4), nullable=False, comment='时段类型: 尖峰/高峰/平段/低谷')
+    start_month = Column(Integer, nullable=False, default=1, comment='适用起始月')
+    end_month = Column(Integer, nullable=False, default=12, comment='适用结束月')
+    start_time = Column(Time, nullable=False, comment='时段开始（含）')
+    end_time = Column(Time, nullable=False, comment='时段结束（不含），小于开始时间表示跨零点')
+    unit_price = Column(DECIMAL(10, 4), nullable=False, comment='单价')
+    effective_from = Column(Date, nullable=False, comment='生效日期')
+    effective_to = Column(Date, comment='失效日期（含），为空表示长期有效')
+
+    def __repr__(self):
+        return f"<Tariff(type='{self.energy_type}', period='{self.period_type}', price={self.unit_price})>"
@@ -0,0 +1,14 @@
+# models/id_worker.py
+from sqlalchemy import Column, String, Integer, DateTime
+from base import db_manager
+
+Base = db_manager.Base
+
+
+class IdWorkerLease(Base):
+    """ID生成器节点号租约：每个进程领取一个节点号并定期续约"""
+    __tablename__ = 'id_worker_lease'
+
+    worker_id = Column(Integer, primary_key=True, autoincrement=False, comment='节点号 0-1023')
+    owner = Column(String(64), nullable=False, comment='主机名:进程号:随机串')
+    heartbeat_at = Column(DateTime, nullable=False, comment='最后续约时间')
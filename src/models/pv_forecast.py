@@ -1,12 +1,21 @@
-from sqlalchemy import Column, String, Numeric, Date, ForeignKey
+from sqlalchemy import Column, String, Integer, Numeric, Date, DateTime, ForeignKey, Index
 from base import db_manager
+from datetime import datetime
 
 Base = db_manager.Base
 
+# 精度统计范围：全部 / 单台设备 / 安装位置
+ACCURACY_SCOPES = ('all', 'device', 'location')
+
 
 class PvForecast(Base):
     __tablename__ = 'pv_forecast'
 
+    __table_args__ = (
+        Index('idx_device_forecast_date', 'device_id', 'forecast_date'),
+        Index('idx_deviation_rate_date', 'deviation_rate', 'forecast_date'),
+    )
+
     forecast_id = Column(String(20), primary_key=True)
     device_id = Column(String(20), ForeignKey('pv_device.device_id', ondelete='CASCADE'), nullable=False)
     grid_point_id = Column(String(20), nullable=False)
@@ -16,4 +25,25 @@ class PvForecast(Base):
     actual_data_id = Column(String(20))
     actual_generation = Column(Numeric(10, 2))
     deviation_rate = Column(Numeric(5, 2))
-    model_version = Column(String(10), nullable=False)
\ No newline at end of file
+    model_version = Column(String(10), nullable=False)
+
+
+class PvForecastAccuracy(Base):
+    """光伏预测精度指标表：按截止日期和滚动窗口，分模型版本、范围和预测提前量保存误差指标"""
+    __tablename__ = 'pv_forecast_accuracy'
+
+    window_end = Column(Date, primary_key=True, comment='窗口截止日期（含）')
+    window_days = Column(Integer, primary_key=True, comment='滚动窗口天数')
+    model_version = Column(String(10), primary_key=True)
+    scope = Column(String(10), primary_key=True, comment='统计范围: all/device/location')
+    scope_id = Column(String(50), primary_key=True, comment='设备编号/安装位置，全部时为空串')
+    horizon = Column(String(10), primary_key=True, comment='预测提前量分段，all 为不分段')
+    sample_count = Column(Integer, nullable=False, default=0)
+    mape = Column(Numeric(8, 2), comment='平均绝对百分比误差（%），实际发电量为0的样本不计入')
+    rmse = Column(Numeric(12, 3), comment='均方根误差，单位：kWh')
+    mae = Column(Numeric(12, 3), comment='平均绝对误差，单位：kWh')
+    bias = Column(Numeric(12, 3), comment='平均偏差（预测-实际），正值表示偏高，单位：kWh')
+    p50_ape = Column(Numeric(8, 2), comment='绝对百分比误差中位数（%）')
+    p90_ape = Column(Numeric(8, 2), comment='绝对百分比误差90分位（%）')
+    p95_ape = Column(Numeric(8, 2), comment='绝对百分比误差95分位（%）')
+    computed_at = Column(DateTime, default=datetime.now)
\ No newline at end of file
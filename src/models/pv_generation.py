@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey
+from sqlalchemy import Column, String, Numeric, DateTime, BigInteger, Index
 from base import db_manager
+from utils.id_generator import next_seq
 
 Base = db_manager.Base
 
@@ -7,13 +8,20 @@ Base = db_manager.Base
 class PvGeneration(Base):
     __tablename__ = 'pv_generation'
 
+    __table_args__ = (
+        Index('idx_device_collect_time', 'device_id', 'collect_time'),
+        Index('idx_inverter_efficiency', 'inverter_efficiency', 'device_id'),
+        Index('idx_pv_generation_updated_seq', 'updated_seq'),
+    )
+
     data_id = Column(String(20), primary_key=True)
-    device_id = Column(String(20), ForeignKey('pv_device.device_id', ondelete='CASCADE'), nullable=False)
+    device_id = Column(String(20), nullable=False)  # 逻辑外键 pv_device.device_id，删除设备时由DAO级联删除
     grid_point_id = Column(String(20), nullable=False)
-    collect_time = Column(DateTime, nullable=False)
+    collect_time = Column(DateTime, primary_key=True, nullable=False)  # 分区列，须包含在主键中
     generation = Column(Numeric(10, 2), nullable=False)
     feed_in = Column(Numeric(10, 2), nullable=False)
     self_use = Column(Numeric(10, 2), nullable=False)
     inverter_efficiency = Column(Numeric(5, 2))
     string_voltage = Column(Numeric(8, 2))
-    string_current = Column(Numeric(8, 2))
\ No newline at end of file
+    string_current = Column(Numeric(8, 2))
+    updated_seq = Column(BigInteger, default=next_seq, onupdate=next_seq)  # 变更序号，增量同步（变更流）使用
\ No newline at end of file
@@ -0,0 +1,21 @@
+# models/substation_status.py
+from sqlalchemy import Column, String, Integer, DateTime, Numeric, ForeignKey
+from base import db_manager
+
+Base = db_manager.Base
+
+
+class SubstationStatusSnapshot(Base):
+    """配电房实时状态快照（替代 substation_realtime_status_view，由监测数据写入时增量维护）"""
+    __tablename__ = 'substation_status_snapshot'
+
+    substation_id = Column(String(20), ForeignKey('substation.substation_id'), primary_key=True)
+    online_circuit_count = Column(Integer, default=0, comment='近5分钟在线回路数')
+    avg_voltage = Column(Numeric(10, 2), comment='近5分钟平均电压，单位：kV')
+    total_active_power = Column(Numeric(12, 2), comment='近5分钟总有功功率，单位：kW')
+    abnormal_transformer_count = Column(Integer, default=0, comment='近5分钟异常变压器数')
+    avg_load_rate = Column(Numeric(5, 2), comment='近5分钟平均负载率，单位：%')
+    running_status = Column(String(10), default='正常')
+    last_data_time = Column(DateTime, comment='最后回路数据时间')
+    circuit_updated_at = Column(DateTime, comment='回路指标计算时间')
+    transformer_updated_at = Column(DateTime, comment='变压器指标计算时间')
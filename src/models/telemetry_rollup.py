@@ -0,0 +1,119 @@
+# models/telemetry_rollup.py
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Numeric, Index
+from base import db_manager
+from datetime import datetime
+
+Base = db_manager.Base
+
+# 汇总粒度：1分钟 / 15分钟 / 1小时 / 1天
+ROLLUP_GRAINS = ('1m', '15m', '1h', '1d')
+
+# 电能区间用量粒度：15分钟 / 1小时 / 1天
+ENERGY_GRAINS = ('15m', '1h', '1d')
+
+
+class CircuitMonitoringRollup(Base):
+    """回路监测数据时间桶汇总表"""
+    __tablename__ = 'circuit_monitoring_rollup'
+
+    __table_args__ = (
+        Index('idx_circuit_rollup_grain_bucket', 'grain', 'bucket_start'),
+    )
+
+    substation_id = Column(String(20), primary_key=True)
+    circuit_id = Column(String(20), primary_key=True)
+    grain = Column(String(4), primary_key=True, comment='汇总粒度: 1m/15m/1h/1d')
+    bucket_start = Column(DateTime, primary_key=True, comment='时间桶起点')
+    sample_count = Column(Integer, nullable=False, comment='原始采样条数')
+    avg_voltage = Column(Numeric(10, 2))
+    min_voltage = Column(Numeric(10, 2))
+    max_voltage = Column(Numeric(10, 2))
+    avg_current = Column(Numeric(10, 2))
+    min_current = Column(Numeric(10, 2))
+    max_current = Column(Numeric(10, 2))
+    avg_active_power = Column(Numeric(10, 2))
+    min_active_power = Column(Numeric(10, 2))
+    max_active_power = Column(Numeric(10, 2))
+    avg_reactive_power = Column(Numeric(10, 2))
+    min_reactive_power = Column(Numeric(10, 2))
+    max_reactive_power = Column(Numeric(10, 2))
+    avg_cable_temp = Column(Numeric(5, 2))
+    min_cable_temp = Column(Numeric(5, 2))
+    max_cable_temp = Column(Numeric(5, 2))
+    avg_capacitor_temp = Column(Numeric(5, 2))
+    min_capacitor_temp = Column(Numeric(5, 2))
+    max_capacitor_temp = Column(Numeric(5, 2))
+
+
+class TransformerMonitoringRollup(Base):
+    """变压器监测数据时间桶汇总表"""
+    __tablename__ = 'transformer_monitoring_rollup'
+
+    __table_args__ = (
+        Index('idx_transformer_rollup_grain_bucket', 'grain', 'bucket_start'),
+    )
+
+    substation_id = Column(String(20), primary_key=True)
+    transformer_id = Column(String(20), primary_key=True)
+    grain = Column(String(4), primary_key=True, comment='汇总粒度: 1m/15m/1h/1d')
+    bucket_start = Column(DateTime, primary_key=True, comment='时间桶起点')
+    sample_count = Column(Integer, nullable=False, comment='原始采样条数')
+    avg_load_rate = Column(Numeric(5, 2))
+    min_load_rate = Column(Numeric(5, 2))
+    max_load_rate = Column(Numeric(5, 2))
+    avg_winding_temp = Column(Numeric(5, 2))
+    min_winding_temp = Column(Numeric(5, 2))
+    max_winding_temp = Column(Numeric(5, 2))
+    avg_core_temp = Column(Numeric(5, 2))
+    min_core_temp = Column(Numeric(5, 2))
+    max_core_temp = Column(Numeric(5, 2))
+    avg_ambient_temp = Column(Numeric(5, 2))
+    min_ambient_temp = Column(Numeric(5, 2))
+    max_ambient_temp = Column(Numeric(5, 2))
+
+
+class CircuitEnergyInterval(Base):
+    """回路电能区间用量表：由累计电能表读数差分得到，按时间桶预先汇总"""
+    __tablename__ = 'circuit_energy_interval'
+
+    __table_args__ = (
+        Index('idx_energy_interval_grain_bucket', 'grain', 'bucket_start'),
+    )
+
+    substation_id = Column(String(20), primary_key=True)
+    circuit_id = Column(String(20), primary_key=True)
+    grain = Column(String(4), primary_key=True, comment='汇总粒度: 15m/1h/1d')
+    bucket_start = Column(DateTime, primary_key=True, comment='时间桶起点')
+    forward_energy = Column(Numeric(15, 3), nullable=False, default=0, comment='正向有功用量，单位：kWh')
+    reverse_energy = Column(Numeric(15, 3), nullable=False, default=0, comment='反向有功用量，单位：kWh')
+    covered_seconds = Column(Integer, nullable=False, default=0, comment='有读数覆盖的秒数')
+    reset_count = Column(Integer, nullable=False, default=0, comment='表计复位次数')
+    rollover_count = Column(Integer, nullable=False, default=0, comment='表计翻转次数')
+    gap_count = Column(Integer, nullable=False, default=0, comment='超长间隔（不插值）次数')
+
+
+class TelemetryRollupState(Base):
+    """汇总水位表：每个汇总一行，刷新时加行锁串行化，记录已处理到的最大脏时间窗ID"""
+    __tablename__ = 'telemetry_rollup_state'
+
+    source_table = Column(String(64), primary_key=True)
+    last_data_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class TelemetryDirtyRange(Base):
+    """
+    待重算时间窗：原始数据写入（新增、覆盖、修改、删除）时在同一事务中登记，
+    随数据一起提交才可见，汇总刷新取出重算后删除，覆盖写和晚提交的数据都不会漏算
+    """
+    __tablename__ = 'telemetry_dirty_range'
+
+    __table_args__ = (
+        Index('idx_consumer_id', 'consumer', 'range_id'),
+    )
+
+    range_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    consumer = Column(String(64), nullable=False, comment='汇总名（与水位表 source_table 一致）')
+    min_time = Column(DateTime, nullable=False, comment='受影响的最早采集时间')
+    max_time = Column(DateTime, nullable=False, comment='受影响的最晚采集时间')
+    created_at = Column(DateTime, default=datetime.now)
@@ -1,5 +1,5 @@
 # models/transformer_monitoring.py
-from sqlalchemy import Column, String, Integer, DateTime, Numeric, ForeignKey, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, String, Integer, DateTime, Numeric, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from base import db_manager
 from datetime import datetime
@@ -12,13 +12,14 @@ class TransformerMonitoringData(Base):
     __table_args__ = (
         CheckConstraint('load_rate >= 0', name='ck_load_rate'),
         CheckConstraint("running_status IN('正常', '异常')", name='ck_running_status'),
-        UniqueConstraint('substation_id', 'transformer_id', 'collection_time', name='uk_transformer_time')
+        UniqueConstraint('substation_id', 'transformer_id', 'collection_time', name='uk_transformer_time'),
+        Index('idx_transformer_substation_time', 'substation_id', 'collection_time')
     )
     
     transformer_data_id = Column(Integer, primary_key=True, autoincrement=True)  # BIGINT
-    substation_id = Column(String(20), ForeignKey('substation.substation_id'), nullable=False)
+    substation_id = Column(String(20), nullable=False)  # 逻辑外键 substation.substation_id（分区表不支持外键）
     transformer_id = Column(String(20), nullable=False)
-    collection_time = Column(DateTime, nullable=False, default=datetime.now)
+    collection_time = Column(DateTime, primary_key=True, nullable=False, default=datetime.now)  # 分区列，须包含在主键中
     load_rate = Column(Numeric(5, 2))
     winding_temp = Column(Numeric(5, 2), comment='单位：℃')
     core_temp = Column(Numeric(5, 2), comment='单位：℃')
@@ -1,7 +1,8 @@
-from flask import Blueprint, request
+from flask import Blueprint, request, Response
 from dao.AlarmMaintenanceDao import AlarmMaintenanceDao
 from utils.middleware import token_required, roles_required
 from utils.response import success_response, error_response
+from utils.alarm_feed import alarm_feed
 from datetime import datetime
 
 # 创建蓝图
@@ -31,7 +32,7 @@ def create_alarm():
             return error_response("请求数据不能为空", 400)
         
         # 验证必要字段
-        required_fields = ['alarm_id', 'device_id', 'alarm_type', 'occur_time', 'alarm_level', 'alarm_content', 'threshold_value']
+        required_fields = ['device_id', 'alarm_type', 'occur_time', 'alarm_level', 'alarm_content', 'threshold_value']
         for field in required_fields:
             if field not in data:
                 return error_response(f"缺少必要字段: {field}", 400)
@@ -40,9 +41,9 @@ def create_alarm():
         if isinstance(data['occur_time'], str):
             data['occur_time'] = datetime.fromisoformat(data['occur_time'].replace('Z', '+00:00'))
         
-        success = alarm_dao.insert_alarm(data)
-        if success:
-            return success_response(message="告警信息录入成功", code=201)
+        alarm_id = alarm_dao.insert_alarm(data)
+        if alarm_id:
+            return success_response(data={'alarm_id': alarm_id}, message="告警信息录入成功", code=201)
         else:
             return error_response("告警信息录入失败", 500)
             
@@ -59,6 +60,35 @@ def get_pending_alarms():
     except Exception as e:
         return error_response(str(e), 500)
 
+@alarm_bp.route('/stream', methods=['GET'])
+@token_required
+def stream_alarms():
+    """
+    告警实时推送（text/event-stream），替代轮询 /api/alarm/pending
+    levels / plant_area_ids: 逗号分隔的告警等级、厂区编号过滤，缺省不过滤
+    首次连接先收到 snapshot 事件（当前未处理告警），之后只推送新增和状态变化的 alarm 事件；
+    断线重连时浏览器自动携带 Last-Event-ID（也可用 last_event_id 参数），从该序号之后续传
+    """
+    def split_param(name):
+        value = request.args.get(name)
+        items = [item.strip() for item in value.split(',') if item.strip()] if value else []
+        return set(items) or None
+    
+    levels = split_param('levels')
+    plant_area_ids = split_param('plant_area_ids')
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    subscriber, sequence, send_snapshot = alarm_feed.subscribe(levels, plant_area_ids, last_event_id)
+    return Response(
+        alarm_feed.stream(
+            subscriber, sequence,
+            lambda: alarm_dao.query_pending_alarms_detailed(levels, plant_area_ids),
+            send_snapshot=send_snapshot
+        ),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # ============ 运维工单管理 ============
 @alarm_bp.route('/orders', methods=['POST'])
 @roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE')
@@ -70,14 +100,14 @@ def create_maintenance_order():
             return error_response("请求数据不能为空", 400)
         
         # 验证必要字段
-        required_fields = ['order_id', 'alarm_id', 'maintainer_id']
+        required_fields = ['alarm_id', 'maintainer_id']
         for field in required_fields:
             if field not in data:
                 return error_response(f"缺少必要字段: {field}", 400)
         
-        success = alarm_dao.create_maintenance_order(data)
-        if success:
-            return success_response(message="运维工单生成成功", code=201)
+        order_id = alarm_dao.create_maintenance_order(data)
+        if order_id:
+            return success_response(data={'order_id': order_id}, message="运维工单生成成功", code=201)
         else:
             return error_response("运维工单生成失败", 500)
             
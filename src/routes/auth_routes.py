@@ -2,7 +2,8 @@ from flask import Blueprint, request, g, make_response
 from datetime import datetime, timedelta
 from dao.UserDao import UserDao
 from utils.security import SecurityUtils
-from utils.middleware import token_required, roles_required, rate_limit
+from utils.middleware import token_required, roles_required, rate_limit, get_request_token
+from utils.token_cache import token_cache
 import uuid
 import re
 from base import db_manager
@@ -192,6 +193,11 @@ def logout():
     try:
         response = make_response(success_response(message="登出成功"))
         
+        # 吊销当前token，登出后即使仍在有效期内也不能再使用；
+        # 多进程部署须设置 TOKEN_REVOCATION_SQLITE（或 RATE_LIMIT_SQLITE）共享吊销表，否则只在本进程生效，
+        # 共享范围限于同一主机，跨主机部署时其他主机上的旧token仍可用到过期
+        token_cache.revoke(get_request_token())
+        
         # 清除token cookie
         response.set_cookie('access_token', '', expires=0)
         
@@ -309,8 +315,8 @@ def refresh_token():
         if not old_token:
             return error_response("token不存在", status_code=401)
         
-        # 验证旧token
-        payload = SecurityUtils.verify_jwt_token(old_token)
+        # 验证旧token（已吊销的token不能用来刷新）
+        payload = token_cache.verify(old_token)
         if not payload:
             return error_response("token无效或已过期", status_code=401)
         
@@ -320,6 +326,8 @@ def refresh_token():
             username=payload['username'],
             roles=payload.get('roles', [])
         )
+        # 旧token作废
+        token_cache.revoke(old_token)
         
         response_data = {
             'token': new_token,
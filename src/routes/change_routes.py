@@ -0,0 +1,54 @@
+from flask import Blueprint, request
+from dao.ChangeFeedDao import ChangeFeedDao, CHANGE_FEEDS, DEFAULT_PAGE_SIZE, SETTLE_SECONDS
+from utils.middleware import roles_required
+from utils.response import success_response, error_response
+
+# 创建蓝图
+change_bp = Blueprint('change', __name__, url_prefix='/api/changes')
+
+# 初始化DAO
+change_feed_dao = ChangeFeedDao()
+
+# ============ 增量变更流 ============
+@change_bp.route('/', methods=['GET'])
+@roles_required('ADMIN', 'DATA_ANALYST')
+def get_change_feeds():
+    """支持增量同步的表"""
+    return success_response(data=list(CHANGE_FEEDS))
+
+@change_bp.route('/<table>', methods=['GET'])
+@roles_required('ADMIN', 'DATA_ANALYST')
+def get_changes(table):
+    """
+    拉取 token 之后的变更（按序号升序，limit 最大5000）
+    首次同步不传 token 从头开始；之后每次传入上次返回的 next_token，has_more 为真时继续拉取
+    变更在提交 CHANGE_FEED_SETTLE_SECONDS 秒后才会返回（见 ChangeFeedDao.SETTLE_SECONDS）
+    """
+    if table not in CHANGE_FEEDS:
+        return error_response(f"变更流仅支持: {', '.join(CHANGE_FEEDS)}", 404)
+    try:
+        try:
+            page = change_feed_dao.changes_since(
+                table,
+                token=request.args.get('token'),
+                limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+            )
+        except ValueError as e:
+            return error_response(str(e), 400)
+        return success_response(data=page)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@change_bp.route('/<table>/latest', methods=['GET'])
+@roles_required('ADMIN', 'DATA_ANALYST')
+def get_latest_token(table):
+    """当前变更位置的令牌：全量导出后从这里开始增量同步"""
+    if table not in CHANGE_FEEDS:
+        return error_response(f"变更流仅支持: {', '.join(CHANGE_FEEDS)}", 404)
+    try:
+        token = change_feed_dao.latest_token(table)
+        if token is None:
+            return error_response(f"变更位置尚未确定，请 {SETTLE_SECONDS:g} 秒后重试", 503)
+        return success_response(data={'table': table, 'token': token})
+    except Exception as e:
+        return error_response(str(e), 500)
@@ -1,8 +1,13 @@
-from flask import Blueprint, request
+from flask import Blueprint, request, Response
 from dao.DashboardDAO import DashboardConfigDAO, RealtimeSummaryDAO, HistoricalTrendDAO
+from dao.PvDeviceDao import PvDeviceDao
+from dao.PvGenerationDao import PvGenerationDao
+from dao.SubstationStatusDao import SubstationStatusDao
+from models.dashboard_models import DISPLAY_MODULES
 from utils.middleware import token_required, roles_required
 from utils.response import success_response, error_response
-from datetime import date, datetime
+from utils.push_hub import dashboard_push
+from datetime import date, datetime, timedelta
 
 # 创建蓝图
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
@@ -11,6 +16,9 @@ dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
 dashboard_config_dao = DashboardConfigDAO()
 realtime_summary_dao = RealtimeSummaryDAO()
 historical_trend_dao = HistoricalTrendDAO()
+pv_device_dao = PvDeviceDao()
+pv_generation_dao = PvGenerationDao()
+substation_status_dao = SubstationStatusDao()
 
 # ============ 大屏配置管理 ============
 @dashboard_bp.route('/configs', methods=['POST'])
@@ -201,6 +209,15 @@ def get_latest_summary():
     except Exception as e:
         return error_response(str(e), 500)
 
+@dashboard_bp.route('/summary/cache-stats', methods=['GET'])
+@roles_required('ADMIN')
+def get_summary_cache_stats():
+    """获取最新汇总缓存的命中统计"""
+    try:
+        return success_response(data=realtime_summary_dao.get_cache_stats())
+    except Exception as e:
+        return error_response(str(e), 500)
+
 @dashboard_bp.route('/summary/alarm-statistics', methods=['GET'])
 @token_required
 def get_alarm_statistics():
@@ -257,4 +274,83 @@ def get_energy_comparison():
         return success_response(data=comparison)
         
     except Exception as e:
-        return error_response(str(e), 500)
\ No newline at end of file
+        return error_response(str(e), 500)
+
+# ============ 大屏推送（SSE） ============
+def _number(value):
+    return float(value) if value is not None else None
+
+def _produce_energy_overview():
+    """能源总览：最新实时汇总"""
+    summary = realtime_summary_dao.get_latest_summary()
+    if not summary:
+        return None
+    return {
+        "statistics_time": summary.statistics_time.isoformat() if summary.statistics_time else None,
+        "total_electricity": _number(summary.total_electricity),
+        "total_water": _number(summary.total_water),
+        "total_steam": _number(summary.total_steam),
+        "total_gas": _number(summary.total_gas),
+        "pv_total_generation": _number(summary.pv_total_generation),
+        "pv_self_use": _number(summary.pv_self_use)
+    }
+
+def _produce_pv_overview():
+    """光伏总览：设备状态分布和今日发电量"""
+    today = datetime.combine(date.today(), datetime.min.time())
+    status_counts = pv_device_dao.count_group_by_status()
+    return {
+        "devices": {
+            "total": sum(status_counts.values()),
+            "normal": status_counts.get('正常', 0),
+            "fault": status_counts.get('故障', 0),
+            "offline": status_counts.get('离线', 0)
+        },
+        "today": pv_generation_dao.sum_generation(today, today + timedelta(days=1))
+    }
+
+def _produce_grid_status():
+    """配电网运行状态：各配电房实时状态快照"""
+    stations = substation_status_dao.selectAll()
+    status_counts = {}
+    for station in stations:
+        status_counts[station['running_status']] = status_counts.get(station['running_status'], 0) + 1
+    return {"status_counts": status_counts, "substations": stations}
+
+def _produce_alarm_statistics():
+    """告警统计：最新汇总中的告警数和近7天趋势"""
+    summary = realtime_summary_dao.get_latest_summary()
+    return {
+        "total_alarms": summary.total_alarms if summary else 0,
+        "high_level_alarms": summary.high_level_alarms if summary else 0,
+        "medium_level_alarms": summary.medium_level_alarms if summary else 0,
+        "low_level_alarms": summary.low_level_alarms if summary else 0,
+        "daily": realtime_summary_dao.get_alarm_statistics(7)
+    }
+
+dashboard_push.register('能源总览', _produce_energy_overview)
+dashboard_push.register('光伏总览', _produce_pv_overview)
+dashboard_push.register('配电网运行状态', _produce_grid_status)
+dashboard_push.register('告警统计', _produce_alarm_statistics)
+# 推送间隔取各模块大屏配置中最短的刷新频率
+dashboard_push.set_interval_loader(dashboard_config_dao.get_refresh_frequencies)
+
+@dashboard_bp.route('/stream', methods=['GET'])
+@token_required
+def stream_dashboard():
+    """
+    大屏数据推送（text/event-stream），替代按 refresh_frequency 轮询 /api/dashboard/*
+    modules: 逗号分隔的展示模块，缺省订阅全部；事件名为模块名，数据未变化时不推送
+    """
+    modules = request.args.get('modules')
+    modules = [module.strip() for module in modules.split(',') if module.strip()] if modules else list(DISPLAY_MODULES)
+    unknown = [module for module in modules if module not in DISPLAY_MODULES]
+    if unknown or not modules:
+        return error_response(f"展示模块仅支持: {', '.join(DISPLAY_MODULES)}", 400)
+    
+    subscriber = dashboard_push.subscribe(list(dict.fromkeys(modules)))
+    return Response(
+        dashboard_push.stream(subscriber),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
\ No newline at end of file
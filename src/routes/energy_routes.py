@@ -1,7 +1,11 @@
 from flask import Blueprint, request
 from dao.EnergyManagementDAO import EnergyManagementDAO
+from dao.PeakValleyDAO import PeakValleyDAO
 from utils.middleware import token_required, roles_required
-from utils.response import success_response, error_response
+from utils.response import success_response, error_response, throttled_response
+from utils.pagination import decode_cursor
+from utils.export import export_response, EXPORT_FORMATS
+from utils.ingest_buffer import ingest_buffer, prepare_rows
 from datetime import datetime
 
 # 创建蓝图
@@ -9,6 +13,10 @@ energy_bp = Blueprint('energy', __name__, url_prefix='/api/energy')
 
 # 初始化DAO
 energy_dao = EnergyManagementDAO()
+peak_valley_dao = PeakValleyDAO()
+
+# 监测数据写缓冲：接口只入队，后台线程批量写入
+ingest_buffer.register('energy_monitoring_data', energy_dao.add_monitoring_data_batch)
 
 # ============ 能耗设备管理 ============
 @energy_bp.route('/devices', methods=['POST'])
@@ -67,28 +75,103 @@ def get_all_energy_devices():
 @energy_bp.route('/monitoring', methods=['POST'])
 @roles_required('ADMIN', 'ENERGY_MANAGER')
 def add_monitoring_data():
-    """录入能耗监测数据"""
+    """录入能耗监测数据（支持批量；入队后由后台批量写入）"""
     try:
-        data = request.get_json()
-        if not data:
-            return error_response("请求数据不能为空", 400)
-        
-        # 验证必要字段
+        # 验证必要字段并转换日期格式
         required_fields = ['equipment_id', 'collection_time', 'energy_consumption', 'unit', 'data_quality', 'plant_area_id']
-        for field in required_fields:
-            if field not in data:
-                return error_response(f"缺少必要字段: {field}", 400)
+        rows, error = prepare_rows(request.get_json(), required_fields, 'collection_time')
+        if error:
+            return error_response(error, 400)
         
-        # 转换日期格式
-        if isinstance(data['collection_time'], str):
-            data['collection_time'] = datetime.fromisoformat(data['collection_time'].replace('Z', '+00:00'))
+        if not ingest_buffer.submit('energy_monitoring_data', rows):
+            return throttled_response("写入队列已满，请稍后重试", error_code='INGEST_QUEUE_FULL')
+        return success_response(data={"queued_count": len(rows)}, message="监测数据已接收，后台批量写入", status_code=202)
+        
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@energy_bp.route('/monitoring', methods=['GET'])
+@token_required
+def get_monitoring_data_page():
+    """分页获取能耗监测数据（游标分页：cursor 为上一页返回的 next_cursor）"""
+    try:
+        equipment_id = request.args.get('equipment_id')
+        plant_area_id = request.args.get('plant_area_id')
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
         
-        data_id = energy_dao.add_monitoring_data(data)
-        return success_response(data={"data_id": data_id}, message="监测数据录入成功", code=201)
+        try:
+            after = decode_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        if start_time and end_time:
+            start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+            end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+        
+        page = energy_dao.get_monitoring_data_page(
+            after=after,
+            limit=limit,
+            equipment_id=equipment_id,
+            plant_area_id=plant_area_id,
+            start_time=start_time,
+            end_time=end_time
+        )
+        
+        # 转换为字典列表
+        data_list = [{
+            "data_id": d.data_id,
+            "equipment_id": d.equipment_id,
+            "collection_time": d.collection_time.isoformat(),
+            "energy_consumption": d.energy_consumption,
+            "unit": d.unit,
+            "data_quality": d.data_quality,
+            "plant_area_id": d.plant_area_id,
+            "verification_status": d.verification_status
+        } for d in page['data']]
+        
+        return success_response(data={
+            'data': data_list,
+            'pagination': {
+                'limit': limit,
+                'next_cursor': page['next_cursor'],
+                'has_more': page['next_cursor'] is not None
+            }
+        })
         
     except Exception as e:
         return error_response(str(e), 500)
 
+@energy_bp.route('/monitoring/export', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST')
+def export_monitoring_data():
+    """导出能耗监测数据（format=ndjson|csv，服务端游标流式输出）"""
+    try:
+        fmt = request.args.get('format', 'ndjson').lower()
+        if fmt not in EXPORT_FORMATS:
+            return error_response("导出格式仅支持ndjson或csv", 400)
+        
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        start = end = None
+        if start_time and end_time:
+            try:
+                start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+                end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            except ValueError:
+                return error_response("时间格式错误，请使用ISO格式", 400)
+        
+        rows = energy_dao.iter_monitoring_data(
+            equipment_id=request.args.get('equipment_id'),
+            plant_area_id=request.args.get('plant_area_id'),
+            start_time=start,
+            end_time=end
+        )
+        return export_response(rows, fmt, 'energy_monitoring_data')
+    except Exception as e:
+        return error_response(str(e), 500)
+
 @energy_bp.route('/monitoring/device/<equipment_id>', methods=['GET'])
 @token_required
 def get_monitoring_data_by_device(equipment_id):
@@ -220,25 +303,101 @@ def verify_monitoring_data(data_id):
 def get_daily_cost_report():
     """获取日成本报告"""
     try:
-        date_str = request.args.get('date', required=True)
+        date_str = request.args.get('date')
+        if not date_str:
+            return error_response("缺少必要参数: date", 400)
         report = energy_dao.get_daily_cost_report(date_str)
         
-        # 转换为字典列表
+        # 转换为字典列表（峰谷平数据由 /peak-valley/compute 或 /peak-valley/refresh 计算）
         report_list = [{
-            "report_id": r.report_id,
+            "record_id": r.record_id,
             "plant_area_id": r.plant_area_id,
-            "statistics_date": r.statistics_date,
+            "statistics_date": r.statistics_date.isoformat() if r.statistics_date else None,
             "energy_type": r.energy_type,
-            "peak_energy": r.peak_energy,
-            "valley_energy": r.valley_energy,
-            "flat_energy": r.flat_energy,
-            "peak_price": r.peak_price,
-            "valley_price": r.valley_price,
-            "flat_price": r.flat_price,
-            "energy_cost": r.energy_cost
+            "high_peak_energy": float(r.high_peak_energy or 0),
+            "peak_energy": float(r.peak_energy or 0),
+            "flat_energy": float(r.flat_energy or 0),
+            "valley_energy": float(r.valley_energy or 0),
+            "total_energy": float(r.total_energy or 0),
+            "peak_valley_price": float(r.peak_valley_price) if r.peak_valley_price is not None else None,
+            "energy_cost": float(r.energy_cost or 0)
         } for r in report]
         
         return success_response(data=report_list)
         
+    except Exception as e:
+        return error_response(str(e), 500)
+
+# ============ 峰谷平计算 ============
+@energy_bp.route('/peak-valley/compute', methods=['POST'])
+@roles_required('ADMIN', 'ENERGY_MANAGER')
+def compute_peak_valley():
+    """按分时电价计算指定日期范围（date 或 start_date+end_date）或整月（month=YYYY-MM）的峰谷平数据"""
+    try:
+        data = request.get_json() or {}
+        plant_area_ids = [data['plant_area_id']] if data.get('plant_area_id') else None
+        try:
+            if data.get('month'):
+                month = datetime.strptime(data['month'], '%Y-%m')
+                rows = peak_valley_dao.compute_month(month.year, month.month, plant_area_ids)
+            else:
+                start_date = datetime.strptime(data.get('start_date') or data['date'], '%Y-%m-%d').date()
+                end_date = datetime.strptime(data.get('end_date') or data['date'], '%Y-%m-%d').date()
+                if end_date < start_date:
+                    return error_response("结束日期不能早于开始日期", 400)
+                rows = peak_valley_dao.compute(start_date, end_date, plant_area_ids)
+        except (KeyError, ValueError):
+            return error_response("请提供 date、start_date+end_date（YYYY-MM-DD）或 month（YYYY-MM）", 400)
+        
+        return success_response(data={'rows': rows}, message="峰谷平数据计算完成")
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@energy_bp.route('/peak-valley/refresh', methods=['POST'])
+@roles_required('ADMIN', 'ENERGY_MANAGER')
+def refresh_peak_valley():
+    """增量重算：只重算上次计算后写入、修改（含迟到补录）的数据所登记的日期"""
+    try:
+        result = peak_valley_dao.refresh()
+        return success_response(data=result, message="峰谷平数据增量重算完成")
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@energy_bp.route('/tariffs', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST')
+def get_tariffs():
+    """查询分时电价时段"""
+    try:
+        tariffs = peak_valley_dao.get_tariffs(request.args.get('energy_type'))
+        return success_response(data=tariffs)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@energy_bp.route('/tariffs', methods=['POST'])
+@roles_required('ADMIN', 'ENERGY_MANAGER')
+def add_tariff():
+    """新增分时电价时段（修改电价后需重新计算受影响日期）"""
+    try:
+        data = request.get_json()
+        if not data:
+            return error_response("请求数据不能为空", 400)
+        
+        required_fields = ['energy_type', 'period_type', 'start_time', 'end_time', 'unit_price', 'effective_from']
+        for field in required_fields:
+            if field not in data:
+                return error_response(f"缺少必要字段: {field}", 400)
+        try:
+            data['start_time'] = datetime.strptime(data['start_time'], '%H:%M').time()
+            data['end_time'] = datetime.strptime(data['end_time'], '%H:%M').time()
+            data['effective_from'] = datetime.strptime(data['effective_from'], '%Y-%m-%d').date()
+            if data.get('effective_to'):
+                data['effective_to'] = datetime.strptime(data['effective_to'], '%Y-%m-%d').date()
+        except ValueError:
+            return error_response("时间格式错误，时段使用HH:MM，日期使用YYYY-MM-DD", 400)
+        
+        tariff_id = peak_valley_dao.add_tariff(data)
+        return success_response(data={'tariff_id': tariff_id}, message="电价时段添加成功", status_code=201)
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(str(e), 500)
\ No newline at end of file
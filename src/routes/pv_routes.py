@@ -3,8 +3,13 @@ from flask import Blueprint, request, jsonify
 from dao.PvDeviceDao import PvDeviceDao
 from dao.PvGenerationDao import PvGenerationDao
 from dao.PvForecastDao import PvForecastDao
+from dao.ForecastAccuracyDao import ForecastAccuracyDao, ACCURACY_WINDOWS
 from utils.middleware import token_required, roles_required
-from utils.response import success_response, error_response
+from utils.response import success_response, error_response, throttled_response
+from utils.pagination import decode_cursor
+from utils.export import export_response, EXPORT_FORMATS
+from utils.ingest_buffer import ingest_buffer, prepare_rows
+from utils.id_generator import next_id
 from datetime import datetime, timedelta
 import decimal
 
@@ -14,6 +19,10 @@ pv_bp = Blueprint('pv', __name__, url_prefix='/api/pv')
 device_dao = PvDeviceDao()
 generation_dao = PvGenerationDao()
 forecast_dao = PvForecastDao()
+accuracy_dao = ForecastAccuracyDao()
+
+# 发电数据写缓冲：接口只入队，后台线程批量写入
+ingest_buffer.register('pv_generation', generation_dao.bulk_insert)
 
 # ==================== 光伏设备管理 ====================
 @pv_bp.route('/devices', methods=['GET'])
@@ -84,8 +93,8 @@ def get_device_detail(device_id):
         result = device
         
         if include_generation:
-            generation_data = generation_dao.select_by_device(device_id)
-            result['generation_data'] = generation_data[:50]  # 限制数量
+            generation_data = generation_dao.select_page(limit=50, device_id=device_id)  # 限制数量
+            result['generation_data'] = generation_data['data']
         
         if include_forecast:
             forecast_data = forecast_dao.select_by_device(device_id)
@@ -160,47 +169,43 @@ def get_device_status_stats():
 @pv_bp.route('/generation', methods=['GET'])
 @roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST', 'MANAGER')
 def get_generation_data():
-    """获取发电数据"""
+    """获取发电数据（游标分页：cursor 为上一页返回的 next_cursor）"""
     try:
         device_id = request.args.get('device_id')
         start_time = request.args.get('start_time')
         end_time = request.args.get('end_time')
         abnormal_only = request.args.get('abnormal', 'false').lower() == 'true'
+        limit = min(max(request.args.get('limit', request.args.get('per_page', 100, type=int), type=int), 1), 1000)
         
-        if abnormal_only:
-            # 获取逆变器效率低于85%的异常数据
-            data = generation_dao.select_abnormal_efficiency(85.0)
-        elif device_id and start_time and end_time:
-            # 按设备和时间范围查询
+        try:
+            after = decode_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        start_dt = end_dt = None
+        if start_time and end_time:
             try:
                 start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
                 end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                data = generation_dao.select_by_time_range(start_dt, end_dt)
-                # 按设备ID过滤
-                data = [record for record in data if record.get('device_id') == device_id]
             except ValueError:
                 return error_response('时间格式错误，请使用ISO格式', 400)
-        elif device_id:
-            # 按设备查询
-            data = generation_dao.select_by_device(device_id)
-        else:
-            data = generation_dao.select_all()
         
-        # 分页处理
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 100, type=int)
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        
-        paginated_data = data[start_idx:end_idx]
+        page = generation_dao.select_page(
+            after=after,
+            limit=limit,
+            device_id=device_id,
+            start_time=start_dt,
+            end_time=end_dt,
+            # 获取逆变器效率低于85%的异常数据
+            max_efficiency=85.0 if abnormal_only else None
+        )
         
         return success_response(data={
-            'data': paginated_data,
+            'data': page['data'],
             'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': len(data),
-                'total_pages': (len(data) + per_page - 1) // per_page
+                'limit': limit,
+                'next_cursor': page['next_cursor'],
+                'has_more': page['next_cursor'] is not None
             }
         })
     except Exception as e:
@@ -209,38 +214,52 @@ def get_generation_data():
 @pv_bp.route('/generation', methods=['POST'])
 @roles_required('ADMIN', 'ENERGY_MANAGER')
 def create_generation_data():
-    """创建发电数据（支持批量）"""
+    """创建发电数据（支持批量；入队后由后台批量写入）"""
     try:
-        data = request.get_json()
-        if not data:
-            return error_response('请求数据为空', 400)
+        required_fields = ['device_id', 'grid_point_id', 
+                         'collect_time', 'generation', 'feed_in', 'self_use']
+        rows, error = prepare_rows(request.get_json(), required_fields, 'collect_time')
+        if error:
+            return error_response(error, 400)
+        # 未提供编号时入队前生成，便于立即返回给调用方
+        for row in rows:
+            row['data_id'] = row.get('data_id') or next_id()
+        
+        if not ingest_buffer.submit('pv_generation', rows):
+            return throttled_response('写入队列已满，请稍后重试', error_code='INGEST_QUEUE_FULL')
+        return success_response(
+            data={'queued_count': len(rows), 'data_ids': [row['data_id'] for row in rows]},
+            message='数据已接收，后台批量写入',
+            status_code=202
+        )
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@pv_bp.route('/generation/export', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST')
+def export_generation_data():
+    """导出光伏发电数据（format=ndjson|csv，服务端游标流式输出）"""
+    try:
+        fmt = request.args.get('format', 'ndjson').lower()
+        if fmt not in EXPORT_FORMATS:
+            return error_response('导出格式仅支持ndjson或csv', 400)
         
-        if isinstance(data, list):
-            # 批量插入
-            ids = generation_dao.batch_insert(data)
-            return success_response(
-                data={'inserted_count': len(ids)},
-                message='批量插入成功',
-                code=201
-            )
-        else:
-            # 单条插入
-            required_fields = ['data_id', 'device_id', 'grid_point_id', 
-                             'collect_time', 'generation', 'feed_in', 'self_use']
-            for field in required_fields:
-                if field not in data:
-                    return error_response(f'缺少必要字段: {field}', 400)
-            
-            # 转换时间格式
-            if 'collect_time' in data and isinstance(data['collect_time'], str):
-                data['collect_time'] = datetime.fromisoformat(data['collect_time'].replace('Z', '+00:00'))
-            
-            data_id = generation_dao.insert(data)
-            return success_response(
-                data={'data_id': data_id},
-                message='数据创建成功',
-                code=201
-            )
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        start = end = None
+        if start_time and end_time:
+            try:
+                start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+                end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            except ValueError:
+                return error_response('时间格式错误，请使用ISO格式', 400)
+        
+        rows = generation_dao.iter_export(
+            device_id=request.args.get('device_id'),
+            start_time=start,
+            end_time=end
+        )
+        return export_response(rows, fmt, 'pv_generation')
     except Exception as e:
         return error_response(str(e), 500)
 
@@ -295,6 +314,8 @@ def get_forecast_data():
     try:
         device_id = request.args.get('device_id')
         forecast_date = request.args.get('date')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
         high_deviation = request.args.get('high_deviation', 'false').lower() == 'true'
         
         if high_deviation:
@@ -304,8 +325,15 @@ def get_forecast_data():
             # 按设备和日期查询
             try:
                 date_obj = datetime.fromisoformat(forecast_date.replace('Z', '+00:00')).date()
-                all_data = forecast_dao.select_by_date(date_obj)
-                data = [record for record in all_data if record.get('device_id') == device_id]
+                data = forecast_dao.select_by_device_and_date(device_id, date_obj)
+            except ValueError:
+                return error_response('日期格式错误，请使用ISO格式', 400)
+        elif device_id and start_date and end_date:
+            # 按设备和日期范围查询
+            try:
+                start_obj = datetime.fromisoformat(start_date.replace('Z', '+00:00')).date()
+                end_obj = datetime.fromisoformat(end_date.replace('Z', '+00:00')).date()
+                data = forecast_dao.select_by_device_and_date_range(device_id, start_obj, end_obj)
             except ValueError:
                 return error_response('日期格式错误，请使用ISO格式', 400)
         elif device_id:
@@ -334,7 +362,7 @@ def create_forecast():
         if not data:
             return error_response('请求数据为空', 400)
         
-        required_fields = ['forecast_id', 'device_id', 'grid_point_id', 
+        required_fields = ['device_id', 'grid_point_id', 
                           'forecast_date', 'time_slot', 'forecast_generation', 'model_version']
         for field in required_fields:
             if field not in data:
@@ -350,6 +378,8 @@ def create_forecast():
             message='预测数据创建成功',
             code=201
         )
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(str(e), 500)
 
@@ -384,6 +414,8 @@ def update_forecast(forecast_id):
             return success_response(data=updated, message='预测数据更新成功')
         else:
             return error_response('预测数据不存在', 404)
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(str(e), 500)
 
@@ -406,6 +438,71 @@ def update_deviation_rate(forecast_id):
     except Exception as e:
         return error_response(str(e), 500)
 
+@pv_bp.route('/forecasts/reconcile', methods=['POST'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST')
+def reconcile_forecasts():
+    """批量对账：按设备和时间槽匹配发电数据，回写实际发电量和偏差率（date 或 start_date+end_date，默认昨天）"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            if data.get('start_date') and data.get('end_date'):
+                start_date = datetime.fromisoformat(data['start_date']).date()
+                end_date = datetime.fromisoformat(data['end_date']).date()
+            elif data.get('date'):
+                start_date = end_date = datetime.fromisoformat(data['date']).date()
+            else:
+                start_date = end_date = datetime.now().date() - timedelta(days=1)
+        except ValueError:
+            return error_response('日期格式错误，请使用YYYY-MM-DD格式', 400)
+        if start_date > end_date:
+            return error_response('开始日期不能晚于结束日期', 400)
+        
+        result = forecast_dao.reconcile_actuals(start_date, end_date, device_ids=data.get('device_ids'))
+        return success_response(data=result, message='预测对账完成')
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@pv_bp.route('/forecasts/accuracy', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST', 'MANAGER')
+def get_forecast_accuracy():
+    """模型版本精度对比（读预先计算的指标表）"""
+    try:
+        window_end = request.args.get('window_end')
+        try:
+            window_end = datetime.fromisoformat(window_end).date() if window_end else None
+        except ValueError:
+            return error_response('日期格式错误，请使用YYYY-MM-DD格式', 400)
+        result = accuracy_dao.compare(
+            window_days=request.args.get('window_days', 30, type=int),
+            scope=request.args.get('scope', 'all'),
+            scope_id=request.args.get('scope_id'),
+            horizon=request.args.get('horizon', 'all'),
+            window_end=window_end
+        )
+        return success_response(data=result)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@pv_bp.route('/forecasts/accuracy/refresh', methods=['POST'])
+@roles_required('ADMIN', 'ENERGY_MANAGER')
+def refresh_forecast_accuracy():
+    """重新计算截止 window_end（默认昨天）的各滚动窗口精度指标"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            window_end = datetime.fromisoformat(data['window_end']).date() if data.get('window_end') else None
+        except ValueError:
+            return error_response('日期格式错误，请使用YYYY-MM-DD格式', 400)
+        windows = data.get('windows') or ACCURACY_WINDOWS
+        if not all(isinstance(days, int) and days > 0 for days in windows):
+            return error_response('窗口天数必须为正整数', 400)
+        count = accuracy_dao.compute(window_end=window_end, windows=tuple(windows))
+        return success_response(data={'rows': count}, message='预测精度指标计算完成')
+    except Exception as e:
+        return error_response(str(e), 500)
+
 @pv_bp.route('/forecasts/<forecast_id>', methods=['DELETE'])
 @roles_required('ADMIN')
 def delete_forecast(forecast_id):
@@ -465,21 +562,20 @@ def get_daily_generation_view():
 @pv_bp.route('/views/forecast_deviation', methods=['GET'])
 @roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST')
 def get_forecast_deviation_view():
-    """光伏预测偏差视图（课程设计要求）"""
+    """光伏预测偏差视图（课程设计要求，统计在数据库内聚合完成）"""
     try:
-        # 获取高偏差率的数据
-        high_deviation_data = forecast_dao.select_high_deviation(15.0)
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        if start_date and end_date:
+            try:
+                start_date = datetime.fromisoformat(start_date).date()
+                end_date = datetime.fromisoformat(end_date).date()
+            except ValueError:
+                return error_response('日期格式错误，请使用ISO格式', 400)
         
-        view_data = {
-            'high_deviation_count': len(high_deviation_data),
-            'threshold': 15.0,
-            'data': high_deviation_data[:20],  # 限制返回数量
-            'summary': {
-                'max_deviation': max([d.get('deviation_rate', 0) for d in high_deviation_data]) if high_deviation_data else 0,
-                'avg_deviation': sum([d.get('deviation_rate', 0) for d in high_deviation_data]) / len(high_deviation_data) if high_deviation_data else 0,
-                'needs_optimization': len([d for d in high_deviation_data if d.get('deviation_rate', 0) > 20.0])
-            }
-        }
+        # 只返回偏差最大的20条明细
+        view_data = forecast_dao.aggregate_high_deviation(15.0, top_n=20, start_date=start_date, end_date=end_date)
+        view_data['threshold'] = 15.0
         
         return success_response(data=view_data)
     except Exception as e:
@@ -488,34 +584,11 @@ def get_forecast_deviation_view():
 @pv_bp.route('/views/abnormal_efficiency', methods=['GET'])
 @roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE')
 def get_abnormal_efficiency_view():
-    """逆变器异常效率视图（课程设计要求）"""
+    """逆变器异常效率视图（课程设计要求，按设备分组在数据库内完成）"""
     try:
-        # 获取逆变器效率低于85%的数据
-        abnormal_data = generation_dao.select_abnormal_efficiency(85.0)
-        
-        # 按设备分组
-        device_abnormal = {}
-        for data in abnormal_data:
-            device_id = data.get('device_id')
-            if device_id not in device_abnormal:
-                device_abnormal[device_id] = []
-            device_abnormal[device_id].append(data)
-        
-        view_data = {
-            'threshold': 85.0,
-            'total_abnormal_records': len(abnormal_data),
-            'affected_devices': len(device_abnormal),
-            'device_details': [
-                {
-                    'device_id': device_id,
-                    'abnormal_count': len(records),
-                    'min_efficiency': min([r.get('inverter_efficiency', 0) for r in records]),
-                    'avg_efficiency': sum([r.get('inverter_efficiency', 0) for r in records]) / len(records),
-                    'latest_abnormal_time': records[0].get('collect_time') if records else None
-                }
-                for device_id, records in list(device_abnormal.items())[:10]  # 限制设备数量
-            ]
-        }
+        # 逆变器效率低于85%的数据，只返回异常次数最多的10台设备
+        view_data = generation_dao.aggregate_abnormal_efficiency(85.0, top_n=10)
+        view_data['threshold'] = 85.0
         
         return success_response(data=view_data)
     except Exception as e:
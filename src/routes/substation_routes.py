@@ -4,8 +4,17 @@ from dao.SubstationDao import SubstationDao
 from dao.CircuitMonitoringDao import CircuitMonitoringDao
 from dao.TransformerMonitoringDao import TransformerMonitoringDao
 from dao.PlantAreaDao import PlantAreaDao
+from dao.SubstationStatusDao import SubstationStatusDao
+from dao.TelemetryRollupDao import TelemetryRollupDao, ROLLUP_SOURCES
+from dao.DailySummaryDao import DailySummaryDao
+from dao.EnergyIntervalDao import EnergyIntervalDao
+from models.telemetry_rollup import ROLLUP_GRAINS, ENERGY_GRAINS
 from utils.middleware import token_required, roles_required
-from utils.response import success_response, error_response
+from utils.response import success_response, error_response, throttled_response
+from utils.pagination import decode_cursor
+from utils.export import export_response, EXPORT_FORMATS
+from utils.ingest_buffer import ingest_buffer, prepare_rows
+from utils.circuit_anomaly import circuit_anomaly_detector
 from datetime import datetime, timedelta
 
 substation_bp = Blueprint('substation', __name__, url_prefix='/api/substation')
@@ -15,6 +24,36 @@ substation_dao = SubstationDao()
 circuit_dao = CircuitMonitoringDao()
 transformer_dao = TransformerMonitoringDao()
 plant_area_dao = PlantAreaDao()
+rollup_dao = TelemetryRollupDao()
+status_dao = SubstationStatusDao()
+daily_summary_dao = DailySummaryDao()
+energy_interval_dao = EnergyIntervalDao()
+
+
+# 监测数据写缓冲：接口只入队，后台线程在一个事务内批量写入（失败可重试），
+# 写入成功后再执行一次状态刷新和告警检测（不随写入重试重复执行）；
+# 汇总和区间用量由刷新线程定期合并重算，不占用写入线程
+def _write_circuit_rows(rows):
+    circuit_dao.bulkUpsert(rows, after_write=False)
+
+def _after_circuit_rows(rows):
+    circuit_dao.afterWrite(rows)
+
+def _refresh_circuit_rollups():
+    rollup_dao.refresh('circuit_monitoring_data')
+    energy_interval_dao.refresh()
+
+def _write_transformer_rows(rows):
+    transformer_dao.bulkUpsert(rows, after_write=False)
+
+def _after_transformer_rows(rows):
+    transformer_dao.afterWrite(rows)
+
+def _refresh_transformer_rollups():
+    rollup_dao.refresh('transformer_monitoring_data')
+
+ingest_buffer.register('circuit_monitoring_data', _write_circuit_rows, _after_circuit_rows, _refresh_circuit_rollups)
+ingest_buffer.register('transformer_monitoring_data', _write_transformer_rows, _after_transformer_rows, _refresh_transformer_rollups)
 
 # ============ 配电房管理 ============
 @substation_bp.route('/rooms', methods=['GET'])
@@ -151,53 +190,88 @@ def get_substations_by_responsible(user_id):
 @substation_bp.route('/circuits', methods=['GET'])
 @roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE', 'DATA_ANALYST')
 def get_circuit_data():
-    """获取回路监测数据"""
+    """获取回路监测数据（游标分页：cursor 为上一页返回的 next_cursor）"""
     try:
         substation_id = request.args.get('substation_id')
         circuit_id = request.args.get('circuit_id')
         start_time = request.args.get('start_time')
         end_time = request.args.get('end_time')
-        limit = request.args.get('limit', 100, type=int)
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
         
-        if substation_id and circuit_id:
-            data = circuit_dao.selectBySubstationAndCircuit(substation_id, circuit_id)
-        elif substation_id:
-            data = circuit_dao.selectLatestBySubstation(substation_id, limit)
-        else:
-            data = circuit_dao.selectAll()
+        try:
+            after = decode_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return error_response(str(e), 400)
         
         # 时间过滤（如果提供时间范围）
+        start = end = None
         if start_time and end_time:
             try:
                 start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
                 end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                data = [record for record in data 
-                       if start <= datetime.fromisoformat(record['collection_time']) <= end]
             except ValueError:
-                pass  # 如果时间格式错误，返回所有数据
+                return error_response("时间格式错误，请使用ISO格式", 400)
         
-        return success_response(data=data)
+        page = circuit_dao.selectPage(
+            after=after,
+            limit=limit,
+            substation_id=substation_id,
+            circuit_id=circuit_id,
+            start_time=start,
+            end_time=end
+        )
+        
+        return success_response(data={
+            'data': page['data'],
+            'pagination': {
+                'limit': limit,
+                'next_cursor': page['next_cursor'],
+                'has_more': page['next_cursor'] is not None
+            }
+        })
     except Exception as e:
         return error_response(str(e), 500)
 
 @substation_bp.route('/circuits', methods=['POST'])
 @roles_required('ADMIN', 'ENERGY_MANAGER')
 def create_circuit_data():
-    """创建回路监测数据（支持批量）"""
+    """创建回路监测数据（支持批量；入队后由后台批量写入，重复采样按唯一键覆盖）"""
     try:
-        data = request.get_json()
+        rows, error = prepare_rows(request.get_json(), ['substation_id', 'circuit_id', 'collection_time'], 'collection_time')
+        if error:
+            return error_response(error, 400)
+        if not ingest_buffer.submit('circuit_monitoring_data', rows):
+            return throttled_response("写入队列已满，请稍后重试", error_code='INGEST_QUEUE_FULL')
+        return success_response(data={'queued_count': len(rows)}, message="已接收，后台批量写入", status_code=202)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@substation_bp.route('/circuits/export', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST')
+def export_circuit_data():
+    """导出回路监测数据（format=ndjson|csv，服务端游标流式输出）"""
+    try:
+        fmt = request.args.get('format', 'ndjson').lower()
+        if fmt not in EXPORT_FORMATS:
+            return error_response("导出格式仅支持ndjson或csv", 400)
         
-        if isinstance(data, list):  # 批量插入
-            ids = circuit_dao.batchInsert(data)
-            return success_response(data={'inserted_count': len(ids)}, message="批量插入成功", code=201)
-        else:  # 单条插入
-            required_fields = ['substation_id', 'circuit_id', 'collection_time']
-            for field in required_fields:
-                if field not in data:
-                    return error_response(f"缺少必要字段: {field}", 400)
-            
-            circuit_dao.insert(data)
-            return success_response(message="创建成功", code=201)
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        start = end = None
+        if start_time and end_time:
+            try:
+                start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+                end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            except ValueError:
+                return error_response("时间格式错误，请使用ISO格式", 400)
+        
+        rows = circuit_dao.iterExport(
+            substation_id=request.args.get('substation_id'),
+            circuit_id=request.args.get('circuit_id'),
+            start_time=start,
+            end_time=end
+        )
+        return export_response(rows, fmt, 'circuit_monitoring_data')
     except Exception as e:
         return error_response(str(e), 500)
 
@@ -248,41 +322,77 @@ def delete_circuit_data(circuit_data_id):
 @substation_bp.route('/transformers', methods=['GET'])
 @roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE', 'DATA_ANALYST')
 def get_transformer_data():
-    """获取变压器监测数据"""
+    """获取变压器监测数据（游标分页：cursor 为上一页返回的 next_cursor）"""
     try:
         substation_id = request.args.get('substation_id')
         transformer_id = request.args.get('transformer_id')
         status = request.args.get('status')
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
         
-        if status == 'abnormal':
-            data = transformer_dao.selectAbnormalRecords()
-        elif substation_id:
-            data = transformer_dao.selectBySubstation(substation_id)
-        else:
-            data = transformer_dao.selectAll()
+        try:
+            after = decode_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return error_response(str(e), 400)
         
-        # 如果指定了变压器ID，进行过滤
-        if transformer_id:
-            data = [record for record in data if record.get('transformer_id') == transformer_id]
+        page = transformer_dao.selectPage(
+            after=after,
+            limit=limit,
+            substation_id=substation_id,
+            transformer_id=transformer_id,
+            abnormal_only=(status == 'abnormal')
+        )
         
-        return success_response(data=data)
+        return success_response(data={
+            'data': page['data'],
+            'pagination': {
+                'limit': limit,
+                'next_cursor': page['next_cursor'],
+                'has_more': page['next_cursor'] is not None
+            }
+        })
     except Exception as e:
         return error_response(str(e), 500)
 
 @substation_bp.route('/transformers', methods=['POST'])
 @roles_required('ADMIN', 'ENERGY_MANAGER')
 def create_transformer_data():
-    """创建变压器监测数据"""
+    """创建变压器监测数据（支持批量；入队后由后台批量写入，重复采样按唯一键覆盖）"""
     try:
-        data = request.get_json()
+        rows, error = prepare_rows(request.get_json(), ['substation_id', 'transformer_id', 'collection_time'], 'collection_time')
+        if error:
+            return error_response(error, 400)
+        if not ingest_buffer.submit('transformer_monitoring_data', rows):
+            return throttled_response("写入队列已满，请稍后重试", error_code='INGEST_QUEUE_FULL')
+        return success_response(data={'queued_count': len(rows)}, message="已接收，后台批量写入", status_code=202)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@substation_bp.route('/transformers/export', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'DATA_ANALYST')
+def export_transformer_data():
+    """导出变压器监测数据（format=ndjson|csv，服务端游标流式输出）"""
+    try:
+        fmt = request.args.get('format', 'ndjson').lower()
+        if fmt not in EXPORT_FORMATS:
+            return error_response("导出格式仅支持ndjson或csv", 400)
         
-        required_fields = ['substation_id', 'transformer_id', 'collection_time']
-        for field in required_fields:
-            if field not in data:
-                return error_response(f"缺少必要字段: {field}", 400)
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        start = end = None
+        if start_time and end_time:
+            try:
+                start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+                end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            except ValueError:
+                return error_response("时间格式错误，请使用ISO格式", 400)
         
-        transformer_dao.insert(data)
-        return success_response(message="创建成功", code=201)
+        rows = transformer_dao.iterExport(
+            substation_id=request.args.get('substation_id'),
+            transformer_id=request.args.get('transformer_id'),
+            start_time=start,
+            end_time=end
+        )
+        return export_response(rows, fmt, 'transformer_monitoring_data')
     except Exception as e:
         return error_response(str(e), 500)
 
@@ -330,55 +440,232 @@ def delete_transformer_data(transformer_data_id):
         return error_response(str(e), 500)
 
 
+# ============ 汇总曲线 ============
+def _parse_series_args():
+    """解析汇总曲线的公共参数，返回 (参数字典, 错误响应)"""
+    substation_id = request.args.get('substation_id')
+    start_time = request.args.get('start_time')
+    end_time = request.args.get('end_time')
+    if not substation_id or not start_time or not end_time:
+        return None, error_response("缺少必要参数: substation_id, start_time, end_time", 400)
+    try:
+        start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+        end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+    except ValueError:
+        return None, error_response("时间格式错误，请使用ISO格式", 400)
+    grain = request.args.get('grain')
+    if grain and grain not in ROLLUP_GRAINS:
+        return None, error_response(f"粒度仅支持: {', '.join(ROLLUP_GRAINS)}", 400)
+    return {
+        'substation_id': substation_id,
+        'start_time': start,
+        'end_time': end,
+        'grain': grain,
+        'max_points': min(max(request.args.get('max_points', 500, type=int), 1), 5000)
+    }, None
+
+@substation_bp.route('/circuits/series', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE', 'DATA_ANALYST')
+def get_circuit_series():
+    """回路汇总曲线（读汇总表，不扫描原始数据；grain 缺省时按时间范围自动选择）"""
+    try:
+        args, error = _parse_series_args()
+        if error:
+            return error
+        series = rollup_dao.selectCircuitSeries(circuit_id=request.args.get('circuit_id'), **args)
+        return success_response(data=series)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@substation_bp.route('/transformers/series', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE', 'DATA_ANALYST')
+def get_transformer_series():
+    """变压器汇总曲线（读汇总表，不扫描原始数据；grain 缺省时按时间范围自动选择）"""
+    try:
+        args, error = _parse_series_args()
+        if error:
+            return error
+        series = rollup_dao.selectTransformerSeries(transformer_id=request.args.get('transformer_id'), **args)
+        return success_response(data=series)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@substation_bp.route('/rollups/refresh', methods=['POST'])
+@roles_required('ADMIN')
+def refresh_rollups():
+    """手动刷新汇总：不带时间范围时增量追平，带 start_time/end_time 时按范围重算"""
+    try:
+        data = request.get_json(silent=True) or {}
+        source_table = data.get('source_table')
+        if source_table and source_table not in ROLLUP_SOURCES:
+            return error_response(f"不支持的数据表: {source_table}", 400)
+        sources = [source_table] if source_table else list(ROLLUP_SOURCES)
+        
+        if data.get('start_time') and data.get('end_time'):
+            try:
+                start = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
+                end = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
+            except ValueError:
+                return error_response("时间格式错误，请使用ISO格式", 400)
+            for source in sources:
+                rollup_dao.rebuild(source, start, end)
+            return success_response(message="汇总重算完成")
+        
+        watermarks = {source: rollup_dao.refresh(source) for source in sources}
+        return success_response(data={'last_data_id': watermarks}, message="汇总刷新完成")
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+# ============ 电能区间用量 ============
+def _parse_time_range(args):
+    """解析 start_time/end_time，返回 (起点, 终点, 错误响应)"""
+    if not args.get('start_time') or not args.get('end_time'):
+        return None, None, error_response("缺少必要参数: start_time, end_time", 400)
+    try:
+        start = datetime.fromisoformat(args['start_time'].replace('Z', '+00:00'))
+        end = datetime.fromisoformat(args['end_time'].replace('Z', '+00:00'))
+    except ValueError:
+        return None, None, error_response("时间格式错误，请使用ISO格式", 400)
+    return start, end, None
+
+@substation_bp.route('/circuits/energy', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE', 'DATA_ANALYST')
+def get_circuit_energy():
+    """时段用电量（对预先差分的区间用量求和，已处理表计复位/翻转）"""
+    try:
+        start, end, error = _parse_time_range(request.args)
+        if error:
+            return error
+        data = energy_interval_dao.selectEnergy(
+            start, end,
+            substation_id=request.args.get('substation_id'),
+            circuit_id=request.args.get('circuit_id')
+        )
+        return success_response(data=data)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@substation_bp.route('/circuits/energy/series', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE', 'DATA_ANALYST')
+def get_circuit_energy_series():
+    """回路区间用量曲线（grain: 15m/1h/1d，默认15m）"""
+    try:
+        substation_id = request.args.get('substation_id')
+        if not substation_id:
+            return error_response("缺少必要参数: substation_id", 400)
+        start, end, error = _parse_time_range(request.args)
+        if error:
+            return error
+        grain = request.args.get('grain', ENERGY_GRAINS[0])
+        if grain not in ENERGY_GRAINS:
+            return error_response(f"粒度仅支持: {', '.join(ENERGY_GRAINS)}", 400)
+        series = energy_interval_dao.selectIntervals(
+            substation_id, start, end, circuit_id=request.args.get('circuit_id'), grain=grain
+        )
+        return success_response(data=series)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@substation_bp.route('/circuits/energy/refresh', methods=['POST'])
+@roles_required('ADMIN')
+def refresh_circuit_energy():
+    """手动刷新区间用量：不带时间范围时增量追平，带 start_time/end_time 时按范围重算"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if data.get('start_time') and data.get('end_time'):
+            start, end, error = _parse_time_range(data)
+            if error:
+                return error
+            energy_interval_dao.rebuild(start, end)
+            return success_response(message="区间用量重算完成")
+        return success_response(data={'last_data_id': energy_interval_dao.refresh()}, message="区间用量刷新完成")
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
 # ============ 视图相关接口============
 @substation_bp.route('/views/abnormal_data', methods=['GET'])
 @roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE')
 def get_abnormal_data_view():
-    """回路异常数据视图（课程设计要求）"""
+    """
+    回路异常数据视图（与 circuit_abnormal_view 判定规则一致）
+    默认检测最近24小时，可用 start_time/end_time 指定窗口；
+    传 since_id（上次返回的 last_id）时为增量模式，只检测更新的数据
+    """
     try:
-        # 实际项目中这里应该调用数据库视图，这里模拟实现
-        all_circuits = circuit_dao.selectAll()
+        substation_id = request.args.get('substation_id')
+        since_id = request.args.get('since_id', type=int)
+        if since_id is not None:
+            result = circuit_anomaly_detector.detect_since(since_id, substation_id=substation_id)
+            return success_response(data=result)
         
-        # 过滤异常数据：电压超过37kV或电流超过500A
-        abnormal_data = []
-        for circuit in all_circuits:
-            voltage = circuit.get('voltage')
-            current = circuit.get('current')
-            
-            if (voltage and voltage > 37.0) or (current and current > 500.0):
-                # 标记异常原因
-                if voltage and voltage > 37.0:
-                    circuit['abnormal_reason'] = f'电压超限: {voltage}kV > 37kV'
-                elif current and current > 500.0:
-                    circuit['abnormal_reason'] = f'电流超限: {current}A > 500A'
-                else:
-                    circuit['abnormal_reason'] = '数据异常'
-                
-                abnormal_data.append(circuit)
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        try:
+            start = datetime.fromisoformat(start_time.replace('Z', '+00:00')) if start_time else None
+            end = datetime.fromisoformat(end_time.replace('Z', '+00:00')) if end_time else None
+        except ValueError:
+            return error_response("时间格式错误，请使用ISO格式", 400)
         
+        abnormal_data = circuit_anomaly_detector.detect(start, end, substation_id=substation_id)
         return success_response(data=abnormal_data)
     except Exception as e:
         return error_response(str(e), 500)
 
+@substation_bp.route('/views/realtime_status', methods=['GET'])
+@roles_required('ADMIN', 'ENERGY_MANAGER', 'MAINTENANCE', 'MANAGER', 'DATA_ANALYST')
+def get_realtime_status_view():
+    """配电房实时状态（读状态快照表，替代 substation_realtime_status_view）"""
+    try:
+        data = status_dao.selectAll(plant_area_id=request.args.get('plant_area_id'))
+        return success_response(data=data)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@substation_bp.route('/views/realtime_status/refresh', methods=['POST'])
+@roles_required('ADMIN')
+def refresh_realtime_status_view():
+    """全量重建配电房状态快照"""
+    try:
+        count = status_dao.refreshAll()
+        return success_response(data={'substation_count': count}, message="状态快照已重建")
+    except Exception as e:
+        return error_response(str(e), 500)
+
 @substation_bp.route('/views/daily_summary', methods=['GET'])
 @roles_required('ADMIN', 'ENERGY_MANAGER', 'MANAGER', 'DATA_ANALYST')
 def get_daily_summary_view():
-    """配电房日报表视图"""
+    """配电房日报表视图（历史日期读已保存的日报，当天实时计算）"""
     try:
         date_str = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+        try:
+            summary_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return error_response("日期格式错误，请使用YYYY-MM-DD", 400)
         
-        # 这里应该是从数据库视图查询，这里模拟数据
-        summary = {
-            'date': date_str,
-            'total_substations': len(substation_dao.selectAll()),
-            'operating_substations': 25,  # 示例数据
-            'maintenance_substations': 2,  # 示例数据
-            'total_energy_consumption': 12500.5,  # kWh
-            'peak_load': 850.2,  # kW
-            'abnormal_events': 3,
-            'avg_power_factor': 0.92
-        }
-        
+        summary = daily_summary_dao.selectDailySummary(summary_date)
         return success_response(data=summary)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@substation_bp.route('/views/daily_summary/refresh', methods=['POST'])
+@roles_required('ADMIN')
+def refresh_daily_summary_view():
+    """重新计算并保存历史日期的日报（补录数据后使用）"""
+    try:
+        data = request.get_json() or {}
+        try:
+            summary_date = datetime.strptime(data.get('date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return error_response("日期格式错误，请使用YYYY-MM-DD", 400)
+        if summary_date >= datetime.now().date():
+            return error_response("只能重算已结束日期的日报", 400)
+        
+        # 峰值负荷和电能读汇总表，先把补录数据登记的待重算时间窗处理完
+        rollup_dao.refresh('circuit_monitoring_data')
+        energy_interval_dao.refresh()
+        rows = daily_summary_dao.refreshDailySummary(summary_date)
+        return success_response(data={'date': summary_date.isoformat(), 'rows': len(rows)}, message="日报已重新计算")
     except Exception as e:
         return error_response(str(e), 500)
\ No newline at end of file
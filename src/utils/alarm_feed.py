@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import deque
+
+from utils.push_hub import encode_event, HEARTBEAT_INTERVAL, MAX_STREAM_SECONDS, RETRY_MS
+
+# 告警实时推送：AlarmMaintenanceDao 在告警新增/状态流转提交后发布变更事件，
+# 每条事件分配进程内递增序号、编码一次后放入环形缓冲并分发给过滤条件匹配的连接；
+# 断线重连携带 Last-Event-ID 时从缓冲补发，序号已滚出缓冲（或服务重启）时改发未处理告警快照
+
+RING_SIZE = 5000            # 环形缓冲保留的最近事件数，决定可断点续传的范围
+SUBSCRIBER_BACKLOG = 1000   # 单个连接最多积压的事件数，超过后改发快照（慢连接不拖累发布方）
+
+
+class _Subscriber:
+    """一个SSE连接及其过滤条件（告警等级、厂区），None 表示不过滤"""
+
+    def __init__(self, levels, plant_area_ids):
+        self.levels = levels
+        self.plant_area_ids = plant_area_ids
+        self.pending = deque()
+        self.overflowed = False
+        self.cond = threading.Condition()
+
+    def matches(self, alarm):
+        return (self.levels is None or str(alarm.get('alarm_level')) in self.levels) \
+            and (self.plant_area_ids is None or alarm.get('plant_area_id') in self.plant_area_ids)
+
+    def offer(self, payload):
+        with self.cond:
+            if len(self.pending) >= SUBSCRIBER_BACKLOG:
+                self.pending.clear()
+                self.overflowed = True
+            else:
+                self.pending.append(payload)
+            self.cond.notify()
+
+    def take(self, timeout):
+        """等待待发送消息，返回 (消息列表, 是否积压溢出)"""
+        with self.cond:
+            if not self.pending and not self.overflowed:
+                self.cond.wait(timeout)
+            payloads = list(self.pending)
+            overflowed = self.overflowed
+            self.pending.clear()
+            self.overflowed = False
+            return payloads, overflowed
+
+
+class AlarmFeed:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 序号只在本进程内递增，事件编号带上进程启动纪元，重启后旧编号一律视为无法续传
+        self._epoch = format(int(time.time() * 1000), 'x')
+        self._sequence = 0
+        self._ring = deque(maxlen=RING_SIZE)   # (序号, 告警, 编码后的SSE消息)
+        self._subscribers = set()
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+        self.resumed = 0
+        self.snapshots = 0
+        self.overflows = 0
+
+    def init_app(self, app):
+        """注册告警推送状态接口"""
+        from utils.middleware import roles_required
+        from utils.response import success_response
+
+        @roles_required('ADMIN')
+        def alarm_feed_metrics():
+            return success_response(data=self.stats())
+
+        app.add_url_rule('/api/metrics/alarm-feed', 'alarm_feed_metrics', alarm_feed_metrics, methods=['GET'])
+
+    def event_id(self, sequence):
+        return f"{self._epoch}-{sequence}"
+
+    def publish(self, change, alarms):
+        """发布一批告警变更（change: created / updated），alarms 为告警字典列表"""
+        if not alarms:
+            return
+        with self._lock:
+            events = []
+            for alarm in alarms:
+                self._sequence += 1
+                payload = encode_event('alarm', {'change': change, 'alarm': alarm}, self.event_id(self._sequence))
+                self._ring.append((self._sequence, alarm, payload))
+                events.append((alarm, payload))
+            subscribers = list(self._subscribers)
+            self.published += len(events)
+        delivered = 0
+        for subscriber in subscribers:
+            for alarm, payload in events:
+                if subscriber.matches(alarm):
+                    subscriber.offer(payload)
+                    delivered += 1
+        with self._lock:
+            self.delivered += delivered
+
+    def subscribe(self, levels=None, plant_area_ids=None, last_event_id=None):
+        """
+        登记连接，返回 (subscriber, 当前序号, 是否需要快照)
+        last_event_id 在缓冲范围内时，先把其后匹配的事件放入待发送队列，无需快照
+        """
+        subscriber = _Subscriber(levels, plant_area_ids)
+        since = self._parse_event_id(last_event_id)
+        with self._lock:
+            oldest = self._ring[0][0] if self._ring else self._sequence + 1
+            resumable = since is not None and oldest - 1 <= since <= self._sequence
+            if resumable:
+                for sequence, alarm, payload in self._ring:
+                    if sequence > since and subscriber.matches(alarm):
+                        subscriber.offer(payload)
+                self.resumed += 1
+            else:
+                self.snapshots += 1
+            self._subscribers.add(subscriber)
+            self.connections += 1
+            return subscriber, self._sequence, not resumable
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.discard(subscriber)
+                self.connections -= 1
+
+    def stream(self, subscriber, sequence, snapshot_loader, send_snapshot=True, max_seconds=MAX_STREAM_SECONDS):
+        """
+        SSE响应体生成器：需要快照时先发送 snapshot 事件（编号为登记时的序号，其后的变更随后发送），
+        连接积压溢出时丢弃积压并重新发送快照；连接断开或到达最长时长时退订
+        snapshot_loader() 返回该连接过滤条件下的未处理告警列表
+        """
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode('utf-8')
+            if send_snapshot:
+                yield encode_event('snapshot', snapshot_loader(), self.event_id(sequence))
+            while time.monotonic() < deadline:
+                payloads, overflowed = subscriber.take(HEARTBEAT_INTERVAL)
+                if overflowed:
+                    with self._lock:
+                        self.overflows += 1
+                        sequence = self._sequence
+                    yield encode_event('snapshot', snapshot_loader(), self.event_id(sequence))
+                    continue
+                if not payloads:
+                    yield b": ping\n\n"
+                    continue
+                for payload in payloads:
+                    yield payload
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'epoch': self._epoch,
+                'sequence': self._sequence,
+                'buffered': len(self._ring),
+                'oldest_sequence': self._ring[0][0] if self._ring else None,
+                'connections': self.connections,
+                'published': self.published,
+                'delivered': self.delivered,
+                'resumed': self.resumed,
+                'snapshots': self.snapshots,
+                'overflows': self.overflows
+            }
+
+    def _parse_event_id(self, event_id):
+        """解析 '纪元-序号' 形式的事件编号，纪元不符（服务已重启）或格式错误返回 None"""
+        if not event_id:
+            return None
+        epoch, _, sequence = str(event_id).strip().rpartition('-')
+        if epoch != self._epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+
+alarm_feed = AlarmFeed()
@@ -0,0 +1,162 @@
+from datetime import datetime
+
+import numpy as np
+
+from base import db_manager
+from dao.AlarmMaintenanceDao import AlarmMaintenanceDao
+from dao.SubstationDao import SubstationDao
+from utils.id_generator import next_id
+
+# 告警规则引擎：替代 tr_circuit_abnormal_alert 和光伏预测偏差触发器，
+# 每批写入后对整批数据做一次向量化判断，再批量插入 alarm 表
+
+# 各电压等级的回路越限阈值（电压单位kV，电流单位A），None 表示不判断
+CIRCUIT_LIMITS = {
+    '35KV': {'voltage': 37.0, 'current': 2000.0},
+    '0.4KV': {'voltage': None, 'current': 3000.0},
+}
+
+# 光伏预测偏差率阈值（%）
+DEVIATION_THRESHOLD = 15.0
+
+
+def to_float_array(values):
+    """Decimal/字符串/None 统一转成 float 数组，缺失值为 NaN"""
+    return np.fromiter(
+        (np.nan if value is None or value == '' else float(value) for value in values),
+        dtype=float, count=len(values)
+    )
+
+
+def circuit_limit_arrays(levels):
+    """按每行的电压等级展开成 (电压上限, 电流上限) 数组，未配置的等级为 NaN"""
+    limits = [CIRCUIT_LIMITS.get(level) or {} for level in levels]
+    return (
+        to_float_array([limit.get('voltage') for limit in limits]),
+        to_float_array([limit.get('current') for limit in limits])
+    )
+
+
+def _format_number(value):
+    return f"{value:.2f}"
+
+
+def _or_null(value):
+    return 'NULL' if value is None else value
+
+
+class AlarmRuleEngine:
+    def __init__(self):
+        self.alarm_dao = AlarmMaintenanceDao()
+        self.substation_dao = SubstationDao()
+
+    def evaluate_circuit_rows(self, rows, voltage_levels):
+        """
+        回路监测数据判定，与原触发器相同，每行最多产生一条告警，优先级：
+        数据不完整（低） > 电压越限（中） > 电流越限（中）
+        voltage_levels: {substation_id: voltage_level}
+        """
+        if not rows:
+            return []
+        voltage = to_float_array([row.get('voltage') for row in rows])
+        current = to_float_array([row.get('current') for row in rows])
+        levels = [voltage_levels.get(row.get('substation_id')) for row in rows]
+        voltage_limit, current_limit = circuit_limit_arrays(levels)
+
+        # 与NaN比较结果为False，未配置阈值的电压等级自然不触发
+        missing = np.isnan(voltage) | np.isnan(current)
+        over_voltage = ~missing & (voltage > voltage_limit)
+        over_current = ~missing & ~over_voltage & (current > current_limit)
+
+        alarms = []
+        for i in np.flatnonzero(missing | over_voltage | over_current):
+            row = rows[i]
+            circuit = f"配电房{row.get('substation_id')}回路{row.get('circuit_id')}"
+            if missing[i]:
+                alarm = ('数据异常', '低', f"{circuit}监测数据不完整", None)
+            elif over_voltage[i]:
+                alarm = ('电压越限', '中', f"{levels[i]}{circuit}电压超限: {_format_number(voltage[i])}KV > "
+                         f"{voltage_limit[i]:g}KV", voltage_limit[i])
+            else:
+                alarm = ('电流越限', '中', f"{circuit}电流超限: {_format_number(current[i])}A > "
+                         f"{current_limit[i]:g}A", current_limit[i])
+            alarms.append(self._alarm(row.get('substation_id'), row.get('collection_time'), *alarm))
+        return alarms
+
+    def evaluate_forecast_rows(self, rows, previous_rates=None):
+        """
+        光伏预测偏差判定：偏差率超过15%时生成“预测模型优化提醒”
+        previous_rates 与 rows 一一对应时为更新场景，只有从 <=15%（或空）变为 >15% 才告警
+        """
+        if not rows:
+            return []
+        deviation = to_float_array([row.get('deviation_rate') for row in rows])
+        triggered = deviation > DEVIATION_THRESHOLD
+        if previous_rates is not None:
+            previous = to_float_array(previous_rates)
+            triggered &= np.isnan(previous) | (previous <= DEVIATION_THRESHOLD)
+
+        now = datetime.now()
+        alarms = []
+        for i in np.flatnonzero(triggered):
+            row = rows[i]
+            if previous_rates is None:
+                content = (
+                    f"光伏预测偏差率超过15%：预测编号{row.get('forecast_id')}，设备编号{row.get('device_id')}，"
+                    f"预测日期{row.get('forecast_date')}，时间槽{row.get('time_slot')}，"
+                    f"预测发电量{row.get('forecast_generation')}kWh，实际发电量{_or_null(row.get('actual_generation'))}kWh，"
+                    f"偏差率{_format_number(deviation[i])}%，模型版本{row.get('model_version')}。请检查预测模型并进行优化。"
+                )
+            else:
+                content = (
+                    f"光伏预测偏差率更新后超过15%：预测编号{row.get('forecast_id')}，设备编号{row.get('device_id')}，"
+                    f"原偏差率{_or_null(previous_rates[i])}%，新偏差率{_format_number(deviation[i])}%，"
+                    f"超出阈值。请检查预测模型并进行优化。"
+                )
+            alarms.append(self._alarm(row.get('device_id'), now, '预测模型优化提醒', '中', content, DEVIATION_THRESHOLD))
+        return alarms
+
+    def check_circuit_rows(self, rows):
+        """
+        回路数据写入后调用：查电压等级 -> 判定 -> 批量写告警，返回写入条数
+        回路告警的设备为所属配电房，写告警前为未登记的配电房补登设备台账
+        """
+        voltage_levels = self.substation_dao.selectVoltageLevels({row.get('substation_id') for row in rows})
+        alarms = self.evaluate_circuit_rows(rows, voltage_levels)
+        if alarms:
+            try:
+                with db_manager.savepoint():
+                    self.alarm_dao.register_substation_devices({alarm['device_id'] for alarm in alarms})
+            except Exception as e:
+                print(f"[失败] 配电房设备登记失败: {e}")
+        return self._save(alarms)
+
+    def check_forecast_rows(self, rows, previous_rates=None):
+        """光伏预测写入/更新后调用，返回写入条数"""
+        return self._save(self.evaluate_forecast_rows(rows, previous_rates))
+
+    def _save(self, alarms):
+        if not alarms:
+            return 0
+        try:
+            # 请求内在保存点中写入，失败只回滚告警，不影响同一事务中的监测/预测数据
+            with db_manager.savepoint():
+                return self.alarm_dao.insert_alarms_batch(alarms)
+        except Exception as e:
+            print(f"[失败] 批量写入告警失败: {e}")
+            return 0
+
+    def _alarm(self, device_id, occur_time, alarm_type, alarm_level, content, threshold):
+        return {
+            'alarm_id': next_id(),
+            'device_id': device_id,
+            'alarm_type': alarm_type,
+            'occur_time': occur_time or datetime.now(),
+            'alarm_level': alarm_level,
+            'alarm_content': content,
+            'status': '未处理',
+            'threshold_value': None if threshold is None else float(threshold)
+        }
+
+
+alarm_rules = AlarmRuleEngine()
@@ -0,0 +1,80 @@
+import threading
+import time
+
+# 进程内TTL缓存（single-flight：同一个键并发未命中时只有一个线程回源，其余线程等待结果）
+
+
+class _Flight:
+    """一次正在进行的回源"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}    # key -> (过期时间, 值)
+        self._inflight = {}   # key -> _Flight
+        self._versions = {}   # key -> 失效次数，回源期间被失效的结果不写回
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_load(self, key, loader, ttl):
+        """命中直接返回；未命中时由第一个线程调用 loader 回源，结果缓存 ttl 秒"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                version = self._versions.get(key, 0)
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and self._versions.get(key, 0) == version:
+                    self._entries[key] = (time.monotonic() + ttl, flight.value)
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.event.set()
+        return flight.value
+
+    def invalidate(self, key):
+        """删除缓存项；正在进行的回源结果不再写回"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def stats(self):
+        """命中统计（coalesced 为等待同一次回源而未访问数据库的请求数）"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                'size': len(self._entries)
+            }
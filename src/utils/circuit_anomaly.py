@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dao.CircuitMonitoringDao import CircuitMonitoringDao
+from utils.alarm_rules import circuit_limit_arrays, to_float_array
+
+# 回路异常检测：按列读取时间窗口内的数据，用NumPy掩码按电压等级一次判定整批数据
+# 判定规则与 circuit_abnormal_view 一致：数据不完整为低等级，电压/电流越限为中等级，电压电流同时越限为高等级
+
+DEFAULT_WINDOW = timedelta(hours=24)
+INCREMENTAL_LIMIT = 50000
+DETECT_CHUNK_SIZE = 10000    # 时间窗口检测每次读取的行数，内存占用与窗口内数据量无关
+
+SEVERITY_NAMES = np.array(['正常', '低', '中', '高'])
+
+
+class CircuitAnomalyDetector:
+    def __init__(self):
+        self.circuit_dao = CircuitMonitoringDao()
+
+    def detect(self, start_time=None, end_time=None, substation_id=None, chunk_size=DETECT_CHUNK_SIZE):
+        """
+        检测时间窗口内的异常数据（默认最近24小时），按采集时间倒序返回
+        按自增ID分块扫描窗口（after_id + limit），只保留异常行，不一次加载整个窗口
+        """
+        end_time = end_time or datetime.now()
+        start_time = start_time or end_time - DEFAULT_WINDOW
+        abnormal = []
+        after_id = 0
+        while True:
+            columns = self.circuit_dao.selectColumns(
+                start_time, end_time, substation_id=substation_id, after_id=after_id, limit=chunk_size
+            )
+            rows, scanned = self.classify(columns)
+            abnormal.extend(rows)
+            if scanned < chunk_size:
+                break
+            after_id = columns['circuit_data_id'][-1]
+        abnormal.sort(key=lambda row: row['collection_time'] or '', reverse=True)
+        return abnormal
+
+    def detect_since(self, after_id, substation_id=None, limit=INCREMENTAL_LIMIT):
+        """
+        增量检测：只扫描自增ID大于 after_id 的数据（上次返回的 last_id），
+        返回 {'data': 异常数据, 'last_id': 本次扫描到的最大ID, 'scanned': 扫描行数, 'has_more': 是否还有未扫描数据}
+        """
+        columns = self.circuit_dao.selectColumns(substation_id=substation_id, after_id=after_id, limit=limit)
+        abnormal, scanned = self.classify(columns)
+        return {
+            'data': abnormal,
+            'last_id': columns['circuit_data_id'][-1] if scanned else after_id,
+            'scanned': scanned,
+            'has_more': scanned >= limit
+        }
+
+    def classify(self, columns):
+        """对列数据计算异常掩码，只为异常行组装字典，返回 (异常数据列表, 扫描行数)"""
+        count = len(columns['circuit_data_id'])
+        if not count:
+            return [], 0
+        voltage = to_float_array(columns['voltage'])
+        current = to_float_array(columns['current'])
+        voltage_limit, current_limit = circuit_limit_arrays(columns['voltage_level'])
+
+        # 与NaN比较结果为False，未配置阈值的电压等级不判断越限
+        missing = np.isnan(voltage) | np.isnan(current)
+        over_voltage = ~missing & (voltage > voltage_limit)
+        over_current = ~missing & (current > current_limit)
+        severity = np.where(missing, 1, over_voltage.astype(int) + over_current.astype(int) + 1)
+        severity[~(missing | over_voltage | over_current)] = 0
+
+        abnormal = []
+        for i in np.flatnonzero(severity):
+            reasons = []
+            if missing[i]:
+                reasons.append('数据不完整')
+            if over_voltage[i]:
+                reasons.append(f'电压超限: {voltage[i]:.2f}kV > {voltage_limit[i]:g}kV')
+            if over_current[i]:
+                reasons.append(f'电流超限: {current[i]:.2f}A > {current_limit[i]:g}A')
+            abnormal.append(self._row_to_dict(columns, i, voltage, current, reasons, SEVERITY_NAMES[severity[i]]))
+        return abnormal, count
+
+    def _row_to_dict(self, columns, i, voltage, current, reasons, severity):
+        def number(name):
+            value = columns[name][i]
+            return float(value) if value is not None else None
+
+        collection_time = columns['collection_time'][i]
+        return {
+            'circuit_data_id': columns['circuit_data_id'][i],
+            'substation_id': columns['substation_id'][i],
+            'substation_name': columns['substation_name'][i],
+            'plant_area_name': columns['plant_area_name'][i],
+            'voltage_level': columns['voltage_level'][i],
+            'circuit_id': columns['circuit_id'][i],
+            'collection_time': collection_time.isoformat() if collection_time else None,
+            'voltage': None if np.isnan(voltage[i]) else float(voltage[i]),
+            'current': None if np.isnan(current[i]) else float(current[i]),
+            'active_power': number('active_power'),
+            'reactive_power': number('reactive_power'),
+            'power_factor': number('power_factor'),
+            'switch_status': columns['switch_status'][i],
+            'abnormal_reasons': reasons,
+            'abnormal_reason': '；'.join(reasons),
+            'severity': str(severity)
+        }
+
+
+circuit_anomaly_detector = CircuitAnomalyDetector()
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from flask import Response
+
+# 流式导出工具：边查边写，内存占用与导出行数无关
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+
+def _ndjson_chunks(rows, chunk_rows):
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(row, ensure_ascii=False, default=str))
+        if len(buffer) >= chunk_rows:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def _csv_chunks(rows, chunk_rows):
+    output = io.StringIO()
+    writer = None
+    count = 0
+    for row in rows:
+        if writer is None:
+            # 表头取第一行的字段顺序
+            writer = csv.DictWriter(output, fieldnames=list(row.keys()))
+            writer.writeheader()
+        writer.writerow(row)
+        count += 1
+        if count >= chunk_rows:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+            count = 0
+    if output.tell():
+        yield output.getvalue()
+
+
+def _with_prefix(prefix, chunks):
+    yield prefix
+    yield from chunks
+
+
+def export_response(rows, fmt, filename, chunk_rows=500):
+    """
+    把行迭代器包装为分块传输的下载响应
+    :param rows: 逐行产出字典的迭代器（通常来自DAO的服务端游标查询）
+    :param fmt: 'ndjson' 或 'csv'
+    """
+    if fmt == 'csv':
+        # 带BOM，Excel直接打开中文不乱码
+        body = _csv_chunks(rows, chunk_rows)
+        return Response(
+            _with_prefix('\ufeff', body),
+            mimetype='text/csv; charset=utf-8',
+            headers={'Content-Disposition': f'attachment; filename={filename}.csv'}
+        )
+    return Response(
+        _ndjson_chunks(rows, chunk_rows),
+        mimetype='application/x-ndjson; charset=utf-8',
+        headers={'Content-Disposition': f'attachment; filename={filename}.ndjson'}
+    )
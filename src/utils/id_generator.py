@@ -0,0 +1,147 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from base import db_manager
+
+# 雪花算法ID：41位毫秒时间戳 | 10位工作节点号 | 12位毫秒内序号
+# 十进制补零到19位，按字符串排序即按生成时间排序，新行总是追加在B+树末尾
+
+EPOCH_MS = 1704067200000  # 2024-01-01 00:00:00 UTC
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+ID_WIDTH = 19
+
+# 工作节点号租约：进程首次生成ID时从 id_worker_lease 表领取，
+# 超过 LEASE_TTL 未续约的节点号可被其他进程接管，续约间隔为 LEASE_TTL 的三分之一
+LEASE_TTL = timedelta(minutes=10)
+LEASE_RENEW_INTERVAL = LEASE_TTL.total_seconds() / 3
+
+
+class IdGenerator:
+    """
+    线程安全；fork 出的子进程会重新领取节点号，不同进程/主机的节点号由租约表保证唯一
+    也可通过环境变量 ID_WORKER_ID 固定节点号（此时不访问数据库）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._worker_id = None
+        self._owner = None
+        self._renewed_at = 0.0
+        self._last_ms = 0
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            worker_id = self._ensure_worker()
+            now_ms = int(time.time() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # 同一毫秒内或时钟回拨：沿用上次的时间戳递增序号，序号用完时借用下一毫秒
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+            value = ((self._last_ms - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)) \
+                | (worker_id << SEQUENCE_BITS) | self._sequence
+        return f"{value:0{ID_WIDTH}d}"
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._worker_id = None
+        configured = os.environ.get('ID_WORKER_ID')
+        if configured is not None:
+            self._worker_id = int(configured) & MAX_WORKER_ID
+            return self._worker_id
+        if self._worker_id is None:
+            self._owner = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"[:64]
+            self._worker_id = self._acquire_lease()
+        elif time.monotonic() - self._renewed_at >= LEASE_RENEW_INTERVAL and not self._renew_lease():
+            print(f"[失败] 节点号 {self._worker_id} 租约已被接管，重新领取")
+            self._worker_id = self._acquire_lease()
+        return self._worker_id
+
+    def _acquire_lease(self):
+        """先尝试未使用的节点号，再尝试接管过期租约；全部用尽时报错"""
+        now = datetime.now()
+        with db_manager.engine.connect() as conn:
+            leases = dict(conn.execute(text("SELECT worker_id, heartbeat_at FROM id_worker_lease")).all())
+        free = [worker_id for worker_id in range(MAX_WORKER_ID + 1) if worker_id not in leases]
+        expired = [worker_id for worker_id, heartbeat_at in leases.items() if heartbeat_at < now - LEASE_TTL]
+
+        for worker_id in free:
+            with db_manager.engine.begin() as conn:
+                inserted = conn.execute(text(
+                    "INSERT IGNORE INTO id_worker_lease (worker_id, owner, heartbeat_at) "
+                    "VALUES (:worker_id, :owner, :now)"
+                ), {'worker_id': worker_id, 'owner': self._owner, 'now': now}).rowcount
+            if inserted:
+                return self._leased(worker_id)
+        for worker_id in expired:
+            with db_manager.engine.begin() as conn:
+                taken = conn.execute(text(
+                    "UPDATE id_worker_lease SET owner = :owner, heartbeat_at = :now "
+                    "WHERE worker_id = :worker_id AND heartbeat_at < :expired_before"
+                ), {'worker_id': worker_id, 'owner': self._owner, 'now': now,
+                    'expired_before': now - LEASE_TTL}).rowcount
+            if taken:
+                return self._leased(worker_id)
+        raise RuntimeError("没有可用的ID节点号")
+
+    def _renew_lease(self):
+        with db_manager.engine.begin() as conn:
+            renewed = conn.execute(text(
+                "UPDATE id_worker_lease SET heartbeat_at = :now WHERE worker_id = :worker_id AND owner = :owner"
+            ), {'worker_id': self._worker_id, 'owner': self._owner, 'now': datetime.now()}).rowcount
+        if renewed:
+            self._renewed_at = time.monotonic()
+        return bool(renewed)
+
+    def _leased(self, worker_id):
+        self._renewed_at = time.monotonic()
+        print(f"[成功] 领取ID节点号 {worker_id}")
+        return worker_id
+
+    def _after_fork(self):
+        # 子进程里父进程其他线程持有的锁不会被释放，重新创建；节点号在下次生成时按新pid重新领取
+        self._lock = threading.Lock()
+
+
+id_generator = IdGenerator()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=id_generator._after_fork)
+
+
+def next_id():
+    """生成一个19位、按时间递增的字符串主键"""
+    return id_generator.next_id()
+
+
+def id_timestamp(value):
+    """从本生成器生成的ID中取出生成时间（本地时间）；其他格式的ID返回 None"""
+    if not isinstance(value, str) or len(value) != ID_WIDTH or not value.isdigit():
+        return None
+    return datetime.fromtimestamp(((int(value) >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000)
+
+
+def next_seq():
+    """生成一个整型变更序号（与 next_id 同源，跨进程按生成时间递增），用于 updated_seq 列"""
+    return int(id_generator.next_id())
+
+
+def seq_floor(moment):
+    """moment 之前生成的变更序号都小于该值"""
+    return max(int(moment.timestamp() * 1000) - EPOCH_MS, 0) << (WORKER_BITS + SEQUENCE_BITS)
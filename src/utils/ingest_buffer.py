@@ -0,0 +1,243 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# 监测数据写缓冲（write-behind）：接口把数据放入有界队列后立即返回，
+# 后台线程按表攒批，每 FLUSH_INTERVAL_MS 毫秒或满 BATCH_ROWS 行做一次批量写入+提交；
+# 汇总刷新等耗时处理由独立线程合并执行，每张表每 REFRESH_INTERVAL_MS 毫秒最多一次，不拖慢写入
+
+MAX_QUEUED_ROWS = int(os.environ.get('INGEST_MAX_QUEUED_ROWS', 50000))
+BATCH_ROWS = int(os.environ.get('INGEST_BATCH_ROWS', 2000))
+FLUSH_INTERVAL_MS = int(os.environ.get('INGEST_FLUSH_INTERVAL_MS', 200))
+REFRESH_INTERVAL_MS = int(os.environ.get('INGEST_REFRESH_INTERVAL_MS', 5000))
+
+
+def prepare_rows(data, required_fields, time_field):
+    """把单条或批量JSON整理成待入队的行列表并解析时间字段，返回 (行列表, 错误信息)"""
+    if not data:
+        return None, "请求数据不能为空"
+    rows = data if isinstance(data, list) else [data]
+    for row in rows:
+        if not isinstance(row, dict):
+            return None, "数据格式错误"
+        for field in required_fields:
+            if field not in row:
+                return None, f"缺少必要字段: {field}"
+        if isinstance(row[time_field], str):
+            try:
+                row[time_field] = datetime.fromisoformat(row[time_field].replace('Z', '+00:00'))
+            except ValueError:
+                return None, "时间格式错误，请使用ISO格式"
+        if isinstance(row[time_field], datetime) and row[time_field].tzinfo is not None:
+            # 带时区的时间转为本地时间存储，与其他写入路径及待重算时间窗一致
+            row[time_field] = row[time_field].astimezone().replace(tzinfo=None)
+    return rows, None
+
+
+class IngestBuffer:
+    def __init__(self, max_rows=MAX_QUEUED_ROWS, batch_rows=BATCH_ROWS, flush_interval_ms=FLUSH_INTERVAL_MS,
+                 refresh_interval_ms=REFRESH_INTERVAL_MS):
+        self.max_rows = max_rows
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.refresh_interval = refresh_interval_ms / 1000.0
+        self._cond = threading.Condition()
+        self._writers = {}      # 表名 -> writer(rows)，在一个事务内写入一批，不带其他副作用
+        self._after_writes = {} # 表名 -> after_write(rows)，数据写入后对已写入的行执行一次（轻量处理）
+        self._refreshers = {}   # 表名 -> refresh()，有新数据写入时由刷新线程定期执行一次
+        self._queues = {}       # 表名 -> deque(rows)
+        self._oldest = {}       # 表名 -> 队首数据入队时间
+        self._pending_refresh = set()
+        self._size = 0
+        self._thread = None
+        self._refresh_thread = None
+        self._refresh_stop = threading.Event()
+        self._stopping = False
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.after_write_failed = 0
+        self.refreshes = 0
+        self.refresh_failed = 0
+
+    def init_app(self, app):
+        """注册队列状态接口，应用退出时由 atexit 写完剩余数据"""
+        from utils.middleware import roles_required
+        from utils.response import success_response
+
+        @roles_required('ADMIN')
+        def ingest_metrics():
+            return success_response(data=self.stats())
+
+        app.add_url_rule('/api/metrics/ingest', 'ingest_metrics', ingest_metrics, methods=['GET'])
+
+    def register(self, table, writer, after_write=None, refresh=None):
+        """
+        注册表的批量写入函数；writer 失败时会逐条重试，须是单个事务且不产生其他副作用，
+        状态刷新、告警检测等轻量处理放在 after_write 中，只对最终写入成功的行执行一次；
+        汇总重算等耗时处理放在 refresh 中，由刷新线程合并执行，不占用写入线程
+        """
+        self._writers[table] = writer
+        if after_write:
+            self._after_writes[table] = after_write
+        if refresh:
+            self._refreshers[table] = refresh
+
+    def submit(self, table, rows):
+        """
+        数据入队，队列已满时整批拒绝并返回 False（调用方应返回429）
+        同一批数据要么全部入队，要么全部拒绝
+        """
+        if table not in self._writers:
+            raise KeyError(f"未注册的写入表: {table}")
+        with self._cond:
+            if self._stopping or self._size + len(rows) > self.max_rows:
+                self.rejected += len(rows)
+                return False
+            queue = self._queues.setdefault(table, deque())
+            if not queue:
+                self._oldest[table] = time.monotonic()
+            queue.extend(rows)
+            self._size += len(rows)
+            self.accepted += len(rows)
+            if len(queue) >= self.batch_rows:
+                self._cond.notify()
+        self._ensure_started()
+        return True
+
+    def stop(self, timeout=30):
+        """停止后台线程，退出前把队列中剩余数据全部写入并做最后一次刷新"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._refresh_stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queued': self._size,
+                'queued_by_table': {table: len(queue) for table, queue in self._queues.items()},
+                'max_rows': self.max_rows,
+                'batch_rows': self.batch_rows,
+                'flush_interval_ms': int(self.flush_interval * 1000),
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'written': self.written,
+                'failed': self.failed,
+                'batches': self.batches,
+                'after_write_failed': self.after_write_failed,
+                'refresh_interval_ms': int(self.refresh_interval * 1000),
+                'pending_refresh': sorted(self._pending_refresh),
+                'refreshes': self.refreshes,
+                'refresh_failed': self.refresh_failed
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+                self._thread.start()
+                self._refresh_thread = threading.Thread(target=self._run_refresh, name='ingest-refresher', daemon=True)
+                self._refresh_thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or self._due_tables(), timeout=self.flush_interval)
+                batches = self._take_batches(force=self._stopping)
+                finished = self._stopping and self._size == 0
+            for table, rows in batches:
+                self._write(table, rows)
+            if finished:
+                return
+
+    def _due_tables(self):
+        now = time.monotonic()
+        return [
+            table for table, queue in self._queues.items()
+            if queue and (len(queue) >= self.batch_rows or now - self._oldest[table] >= self.flush_interval)
+        ]
+
+    def _take_batches(self, force=False):
+        tables = [table for table, queue in self._queues.items() if queue] if force else self._due_tables()
+        batches = []
+        for table in tables:
+            queue = self._queues[table]
+            rows = [queue.popleft() for _ in range(min(self.batch_rows, len(queue)))]
+            self._size -= len(rows)
+            if queue:
+                self._oldest[table] = time.monotonic()
+            batches.append((table, rows))
+        return batches
+
+    def _write(self, table, rows):
+        persisted = self._persist(table, rows)
+        self._after_write(table, persisted)
+        if persisted and table in self._refreshers:
+            with self._cond:
+                self._pending_refresh.add(table)
+
+    def _persist(self, table, rows):
+        """写入一批数据，返回写入成功的行"""
+        writer = self._writers[table]
+        try:
+            writer(rows)
+            self.written += len(rows)
+            self.batches += 1
+            return rows
+        except Exception as e:
+            print(f"[失败] {table} 批量写入{len(rows)}条失败，改为逐条写入: {e}")
+        # 整批失败时逐条重试，只丢弃本身有问题的数据
+        persisted = []
+        for row in rows:
+            try:
+                writer([row])
+                self.written += 1
+                persisted.append(row)
+            except Exception as e:
+                self.failed += 1
+                print(f"[失败] {table} 数据写入失败: {e} 数据: {row}")
+        return persisted
+
+    def _after_write(self, table, rows):
+        """对已写入的行执行一次后续处理；失败只记录，不重写数据（避免重复告警）"""
+        after_write = self._after_writes.get(table)
+        if not after_write or not rows:
+            return
+        try:
+            after_write(rows)
+        except Exception as e:
+            self.after_write_failed += 1
+            print(f"[失败] {table} 写入后处理{len(rows)}条失败: {e}")
+
+    def _run_refresh(self):
+        """刷新线程：每 refresh_interval 秒对期间有新数据写入的表执行一次 refresh，停止时再执行最后一次"""
+        while True:
+            stopping = self._refresh_stop.wait(self.refresh_interval)
+            with self._cond:
+                tables, self._pending_refresh = self._pending_refresh, set()
+            for table in sorted(tables):
+                try:
+                    self._refreshers[table]()
+                    self.refreshes += 1
+                except Exception as e:
+                    # 待重算时间窗仍在库中，下次刷新会继续处理
+                    self.refresh_failed += 1
+                    print(f"[失败] {table} 写入后刷新失败: {e}")
+            if stopping:
+                return
+
+
+ingest_buffer = IngestBuffer()
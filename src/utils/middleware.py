@@ -1,21 +1,26 @@
 from flask import request, jsonify, g
 from functools import wraps
-from utils.security import SecurityUtils
+from utils.token_cache import token_cache
+
+def get_request_token():
+    """取出本次请求携带的token：优先请求头，其次cookie"""
+    token = None
+    
+    # 从请求头获取token
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+    
+    # 从cookie获取token
+    if not token:
+        token = request.cookies.get('access_token')
+    return token
 
 def token_required(f):
     """JWT token验证装饰器"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = None
-        
-        # 从请求头获取token
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-        
-        # 从cookie获取token
-        if not token:
-            token = request.cookies.get('access_token')
+        token = get_request_token()
         
         if not token:
             return jsonify({
@@ -24,21 +29,17 @@ def token_required(f):
                 'error_code': 'TOKEN_MISSING'
             }), 401
         
-        # 验证token
-        payload = SecurityUtils.verify_jwt_token(token)
-        if not payload:
+        # 验证token（已验证过的token直接从缓存取用户信息，不再重复验签）
+        current_user = token_cache.verify(token)
+        if not current_user:
             return jsonify({
                 'success': False,
                 'message': 'token无效或已过期',
                 'error_code': 'TOKEN_INVALID'
             }), 401
         
-        # 将用户信息存入g对象（类似Spring的ThreadLocal）
-        g.current_user = {
-            'user_id': payload['user_id'],
-            'username': payload['username'],
-            'roles': payload.get('roles', [])
-        }
+        # 将用户信息存入g对象（类似Spring的ThreadLocal），复制一份避免请求内修改影响缓存
+        g.current_user = dict(current_user)
         
         return f(*args, **kwargs)
     
@@ -66,39 +67,31 @@ def roles_required(*required_roles):
     return decorator
 
 def rate_limit(max_requests=5, window=60):
-    """简单的限流装饰器（防止暴力破解）"""
-    from collections import defaultdict
-    import time
-    
-    requests = defaultdict(list)
+    """
+    限流装饰器（防止暴力破解）：同一IP在同一接口上最多连续 max_requests 次，
+    之后每 window / max_requests 秒恢复一次额度；状态存放在 utils.rate_limiter 的后端中
+    """
+    import math
+    from utils.rate_limiter import rate_limiter
     
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             # 使用IP地址作为标识
-            ip = request.remote_addr
             endpoint = request.endpoint
+            key = f"{request.remote_addr}:{endpoint}"
             
-            key = f"{ip}:{endpoint}"
-            current_time = time.time()
-            
-            # 清理过期的请求记录
-            requests[key] = [
-                req_time for req_time in requests[key]
-                if current_time - req_time < window
-            ]
-            
-            # 检查是否超过限制
-            if len(requests[key]) >= max_requests:
-                return jsonify({
+            allowed, wait = rate_limiter.hit(key, max_requests, window, endpoint=endpoint)
+            if not allowed:
+                retry_after = max(math.ceil(wait), 1)
+                response = jsonify({
                     'success': False,
                     'message': '请求过于频繁，请稍后再试',
                     'error_code': 'RATE_LIMIT_EXCEEDED',
-                    'retry_after': window
-                }), 429
-            
-            # 记录本次请求
-            requests[key].append(current_time)
+                    'retry_after': retry_after
+                })
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
             
             return f(*args, **kwargs)
         return decorated_function
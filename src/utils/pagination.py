@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+# 游标分页工具（按 (采集时间, 主键) 倒序翻页，不使用OFFSET）
+
+def encode_cursor(sort_time, row_id):
+    """把最后一行的 (采集时间, 主键) 编码为不透明游标字符串"""
+    raw = json.dumps([sort_time.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，返回 (采集时间, 主键)；格式错误时抛出 ValueError"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_time, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(sort_time), row_id
+    except Exception:
+        raise ValueError('无效的分页游标')
+
+
+def apply_keyset(query, time_column, id_column, after, limit):
+    """在查询上追加游标条件和排序，多取一行用于判断是否还有下一页"""
+    if after:
+        after_time, after_id = after
+        query = query.filter(or_(
+            time_column < after_time,
+            and_(time_column == after_time, id_column < after_id)
+        ))
+    return query.order_by(time_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def build_page(records, limit, time_attr, id_attr):
+    """截取一页数据并生成下一页游标，返回 (本页记录, 下一页游标)"""
+    has_more = len(records) > limit
+    records = records[:limit]
+    next_cursor = None
+    if has_more and records:
+        last = records[-1]
+        next_cursor = encode_cursor(getattr(last, time_attr), getattr(last, id_attr))
+    return records, next_cursor
+
+
+def encode_change_token(table, seq):
+    """把变更流读到的最后一个序号编码为不透明令牌（带表名，防止拿到别的表上使用）"""
+    raw = json.dumps([table, seq], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_change_token(token, table):
+    """解析变更令牌，返回序号；未提供令牌时从头开始（0），格式错误或表名不符时抛出 ValueError"""
+    if not token:
+        return 0
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        token_table, seq = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        seq = int(seq)
+    except Exception:
+        raise ValueError('无效的变更令牌')
+    if token_table != table:
+        raise ValueError('变更令牌不属于该表')
+    return seq
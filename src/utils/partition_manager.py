@@ -0,0 +1,204 @@
+import re
+import sys
+from datetime import date
+
+from sqlalchemy import text
+
+from base import db_manager
+
+# 按月RANGE分区的监测表：表名 -> (主键列, 时间列, 保留月数)
+# MySQL要求分区列出现在每个唯一键中，且分区表不能有外键，
+# 所以这些表的主键为 (主键列, 时间列)，与父表的关联由DAO保证
+PARTITIONED_TABLES = {
+    'circuit_monitoring_data': ('circuit_data_id', 'collection_time', 12),
+    'transformer_monitoring_data': ('transformer_data_id', 'collection_time', 12),
+    'pv_generation': ('data_id', 'collect_time', 24),
+    'energy_monitoring_data': ('data_id', 'collection_time', 36),
+}
+
+# 提前创建的未来月份数
+MONTHS_AHEAD = 3
+
+_MONTH_PARTITION = re.compile(r'^p(\d{4})(\d{2})$')
+
+
+def _add_months(month_start, months):
+    """月份加减，month_start 为某月1日"""
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month_start):
+    return f"p{month_start.strftime('%Y%m')}"
+
+
+def _partition_clause(month_start):
+    """分区 pYYYYMM 存放该月数据，上界为下月1日"""
+    upper = _add_months(month_start, 1).isoformat()
+    return f"PARTITION {_partition_name(month_start)} VALUES LESS THAN (TO_DAYS('{upper}'))"
+
+
+class PartitionManager:
+    """
+    监测表的月分区管理：首次分区、预建未来分区、过期分区删除或归档
+    新增/删除分区都只改动 pmax 或单个分区，不扫描其他月份的数据；
+    DAO里对时间列的范围条件（between / >= / <=）会自动触发分区裁剪
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or db_manager.engine
+
+    def list_partitions(self, table):
+        """按顺序返回表的分区 [(分区名, 估算行数)]，未分区的表返回空列表"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT PARTITION_NAME, TABLE_ROWS FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION"
+            ), {'table': table}).all()
+        return [(row[0], row[1]) for row in rows]
+
+    def partition_table(self, table):
+        """
+        把已有的表改造成按月分区（一次性迁移，会重建整张表）：
+        删除外键 -> 主键加上时间列 -> 按 TO_DAYS(时间列) 分区 -> 从最早数据所在月起拆分出月分区
+        """
+        id_column, time_column, _ = PARTITIONED_TABLES[table]
+        if self.list_partitions(table):
+            print(f"[跳过] {table} 已经分区")
+            return
+        with self.engine.begin() as conn:
+            # 本表引用父表的外键和其他表引用本表的外键都要删除，后者在引用方表上删除
+            foreign_keys = conn.execute(text(
+                "SELECT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+                "WHERE CONSTRAINT_SCHEMA = DATABASE() AND (TABLE_NAME = :table OR REFERENCED_TABLE_NAME = :table)"
+            ), {'table': table}).all()
+            for owner, name in foreign_keys:
+                conn.execute(text(f"ALTER TABLE `{owner}` DROP FOREIGN KEY `{name}`"))
+                if owner != table:
+                    print(f"[成功] 已删除 {owner} 引用 {table} 的外键 {name}，关联改由DAO保证")
+            conn.execute(text(
+                f"ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`{id_column}`, `{time_column}`)"
+            ))
+            conn.execute(text(
+                f"ALTER TABLE `{table}` PARTITION BY RANGE (TO_DAYS(`{time_column}`)) "
+                f"(PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            ))
+            earliest = conn.execute(text(f"SELECT MIN(`{time_column}`) FROM `{table}`")).scalar()
+        start = earliest.date().replace(day=1) if earliest else None
+        self.ensure_partitions(table, start_month=start)
+        print(f"[成功] {table} 已按月分区")
+
+    def ensure_partitions(self, table, months_ahead=MONTHS_AHEAD, start_month=None):
+        """预建到当前月之后 months_ahead 个月的分区（从 pmax 拆分，pmax 为空时只改元数据）"""
+        partitions = [name for name, _ in self.list_partitions(table)]
+        if not partitions:
+            print(f"[跳过] {table} 未分区，请先执行 partition_table")
+            return []
+        months = [self._month_of(name) for name in partitions]
+        months = [month for month in months if month]
+        current = date.today().replace(day=1)
+        if months:
+            first = _add_months(max(months), 1)
+        else:
+            first = min(start_month or current, current)
+        last = _add_months(current, months_ahead)
+
+        new_months = []
+        month = first
+        while month <= last:
+            new_months.append(month)
+            month = _add_months(month, 1)
+        if not new_months:
+            return []
+
+        clauses = ', '.join(_partition_clause(month) for month in new_months)
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE `{table}` REORGANIZE PARTITION pmax INTO "
+                f"({clauses}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            ))
+        created = [_partition_name(month) for month in new_months]
+        print(f"[成功] {table} 新增分区: {', '.join(created)}")
+        return created
+
+    def expire_partitions(self, table, retention_months=None, archive=False):
+        """删除（或交换到归档表后删除）超出保留期的月分区，每个分区只是一次元数据操作"""
+        _, _, default_retention = PARTITIONED_TABLES[table]
+        retention_months = retention_months or default_retention
+        cutoff = _add_months(date.today().replace(day=1), -retention_months)
+        expired = [
+            name for name, _ in self.list_partitions(table)
+            if self._month_of(name) and self._month_of(name) < cutoff
+        ]
+        for name in expired:
+            if archive:
+                self._archive_partition(table, name)
+            with self.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE `{table}` DROP PARTITION {name}"))
+        if expired:
+            action = '归档' if archive else '删除'
+            print(f"[成功] {table} {action}过期分区: {', '.join(expired)}")
+        return expired
+
+    def _archive_partition(self, table, name):
+        """
+        把分区交换到归档表 {table}_archive_YYYYMM（交换后该分区为空）
+        DDL不能回滚，上次中途失败后重跑时：归档表已存在则不再去分区，已交换过的分区不再重复交换
+        """
+        archive_table = f"{table}_archive_{name[1:]}"
+        with self.engine.begin() as conn:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS `{archive_table}` LIKE `{table}`"))
+        if self.list_partitions(archive_table):
+            with self.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE `{archive_table}` REMOVE PARTITIONING"))
+        with self.engine.connect() as conn:
+            partition_rows = conn.execute(text(f"SELECT 1 FROM `{table}` PARTITION ({name}) LIMIT 1")).first()
+            archive_rows = conn.execute(text(f"SELECT 1 FROM `{archive_table}` LIMIT 1")).first()
+        if not partition_rows:
+            # 分区已为空（上次已交换完，或本来就没有数据），直接删除分区即可
+            return
+        if archive_rows:
+            raise RuntimeError(f"归档表 {archive_table} 已有数据，无法交换分区 {name}，请人工处理")
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE `{table}` EXCHANGE PARTITION {name} WITH TABLE `{archive_table}`"
+            ))
+
+    def run_maintenance(self, archive=False):
+        """日常维护：所有分区表预建未来分区并清理过期分区"""
+        result = {}
+        for table in PARTITIONED_TABLES:
+            try:
+                result[table] = {
+                    'created': self.ensure_partitions(table),
+                    'expired': self.expire_partitions(table, archive=archive)
+                }
+            except Exception as e:
+                print(f"[失败] {table} 分区维护失败: {e}")
+                result[table] = {'error': str(e)}
+        return result
+
+    @staticmethod
+    def _month_of(partition_name):
+        match = _MONTH_PARTITION.match(partition_name)
+        if not match:
+            return None
+        return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+if __name__ == '__main__':
+    # 用法（在src目录下）：python -m utils.partition_manager [init|maintain|archive|list]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'maintain'
+    manager = PartitionManager()
+    if command == 'init':
+        for table_name in PARTITIONED_TABLES:
+            manager.partition_table(table_name)
+    elif command in ('maintain', 'archive'):
+        manager.run_maintenance(archive=command == 'archive')
+    elif command == 'list':
+        for table_name in PARTITIONED_TABLES:
+            print(table_name, manager.list_partitions(table_name))
+    else:
+        print(f"未知命令: {command}")
+        sys.exit(1)
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# 大屏推送（Server-Sent Events）：每个展示模块由一个后台生产线程按刷新频率计算一次，
+# 编码成同一份SSE字节串后分发给所有订阅该模块的连接；模块无人订阅时不计算，数据未变化时不推送
+
+DEFAULT_INTERVAL = 5        # 未配置刷新频率的模块默认推送间隔（秒）
+MIN_INTERVAL = 1
+INTERVAL_RELOAD = 60        # 重新读取刷新频率配置的间隔（秒）
+HEARTBEAT_INTERVAL = 15     # 无数据时发送注释行保活，防止代理断开空闲连接
+MAX_STREAM_SECONDS = 1800   # 单个连接最长时长，到期后由浏览器自动重连（同时重新校验登录状态）
+RETRY_MS = 3000
+
+
+def encode_event(event, data, event_id):
+    """编码一条SSE消息"""
+    body = json.dumps(data, ensure_ascii=False, default=str, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event}\ndata: {body}\n\n".encode('utf-8')
+
+
+class _Subscriber:
+    """一个SSE连接：每个模块只保留最新一条待发送消息，慢连接不会积压"""
+
+    def __init__(self, modules):
+        self.modules = modules
+        self.pending = OrderedDict()
+        self.cond = threading.Condition()
+
+    def offer(self, module, payload):
+        with self.cond:
+            self.pending.pop(module, None)
+            self.pending[module] = payload
+            self.cond.notify()
+
+    def take(self, timeout):
+        """等待待发送消息，超时返回空列表"""
+        with self.cond:
+            if not self.pending:
+                self.cond.wait(timeout)
+            payloads = list(self.pending.values())
+            self.pending.clear()
+            return payloads
+
+
+class PushHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._producers = {}      # 模块 -> producer()，返回可JSON序列化的数据
+        self._subscribers = {}    # 模块 -> set(_Subscriber)
+        self._latest = {}         # 模块 -> (数据JSON, 编码后的SSE消息)
+        self._intervals = {}      # 模块 -> 推送间隔（秒）
+        self._interval_loader = None
+        self._intervals_loaded_at = 0.0
+        self._next_due = {}
+        self._sequence = 0
+        self._thread = None
+        self.connections = 0
+        self.ticks = 0
+        self.computed = 0
+        self.unchanged = 0
+        self.delivered = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        """注册推送状态接口"""
+        from utils.middleware import roles_required
+        from utils.response import success_response
+
+        @roles_required('ADMIN')
+        def push_metrics():
+            return success_response(data=self.stats())
+
+        app.add_url_rule('/api/metrics/push', 'push_metrics', push_metrics, methods=['GET'])
+
+    def register(self, module, producer):
+        """注册模块的数据生产函数"""
+        self._producers[module] = producer
+
+    def set_interval_loader(self, loader):
+        """loader() 返回 {模块: 刷新频率秒}，生产线程每 INTERVAL_RELOAD 秒重新读取一次"""
+        self._interval_loader = loader
+
+    def subscribe(self, modules):
+        """订阅模块，已有数据的模块立即补发最近一条"""
+        unknown = [module for module in modules if module not in self._producers]
+        if unknown:
+            raise KeyError(f"未注册的展示模块: {', '.join(unknown)}")
+        subscriber = _Subscriber(modules)
+        with self._lock:
+            for module in modules:
+                self._subscribers.setdefault(module, set()).add(subscriber)
+                if module in self._latest:
+                    subscriber.offer(module, self._latest[module][1])
+                else:
+                    # 首个订阅者：让生产线程立即计算
+                    self._next_due[module] = 0.0
+            self.connections += 1
+        self._ensure_started()
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            for module in subscriber.modules:
+                members = self._subscribers.get(module)
+                if members is not None:
+                    members.discard(subscriber)
+            self.connections -= 1
+
+    def stream(self, subscriber, max_seconds=MAX_STREAM_SECONDS):
+        """SSE响应体生成器：连接断开（GeneratorExit）或到达最长时长时退订"""
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode('utf-8')
+            while time.monotonic() < deadline:
+                payloads = subscriber.take(HEARTBEAT_INTERVAL)
+                if not payloads:
+                    yield b": ping\n\n"
+                    continue
+                for payload in payloads:
+                    yield payload
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections': self.connections,
+                'subscribers_by_module': {module: len(members) for module, members in self._subscribers.items()},
+                'intervals': dict(self._intervals),
+                'ticks': self.ticks,
+                'computed': self.computed,
+                'unchanged': self.unchanged,
+                'delivered': self.delivered,
+                'errors': self.errors
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dashboard-push', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._reload_intervals()
+            now = time.monotonic()
+            with self._lock:
+                active = [module for module, members in self._subscribers.items() if members]
+                due = [module for module in active if self._next_due.get(module, 0.0) <= now]
+                for module in due:
+                    self._next_due[module] = now + self._intervals.get(module, DEFAULT_INTERVAL)
+                wait = min((self._next_due[module] - now for module in active), default=INTERVAL_RELOAD)
+                self.ticks += 1
+            for module in due:
+                self._produce(module)
+            self._wake.wait(max(wait, 0.05))
+            self._wake.clear()
+
+    def _produce(self, module):
+        """计算一次模块数据；与上次相同则不推送，否则编码一次后分发给所有订阅者"""
+        try:
+            data = self._producers[module]()
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"[失败] 大屏模块 {module} 数据计算失败: {e}")
+            return
+        body = json.dumps(data, ensure_ascii=False, default=str, sort_keys=True)
+        with self._lock:
+            self.computed += 1
+            previous = self._latest.get(module)
+            if previous is not None and previous[0] == body:
+                self.unchanged += 1
+                return
+            self._sequence += 1
+            payload = encode_event(module, {'module': module, 'data': data}, self._sequence)
+            self._latest[module] = (body, payload)
+            subscribers = list(self._subscribers.get(module, ()))
+            self.delivered += len(subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(module, payload)
+
+    def _reload_intervals(self):
+        if self._interval_loader is None or time.monotonic() - self._intervals_loaded_at < INTERVAL_RELOAD:
+            return
+        self._intervals_loaded_at = time.monotonic()
+        try:
+            intervals = self._interval_loader()
+        except Exception as e:
+            print(f"[失败] 读取大屏刷新频率失败: {e}")
+            return
+        with self._lock:
+            self._intervals = {module: max(int(seconds), MIN_INTERVAL) for module, seconds in intervals.items() if seconds}
+
+
+dashboard_push = PushHub()
@@ -0,0 +1,163 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# SQL执行统计：按Flask端点/蓝图记录语句数、数据库耗时和最慢语句，慢查询写结构化日志
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+SLOWEST_PER_ENDPOINT = 5
+STATEMENT_PREVIEW = 500
+
+slow_query_logger = logging.getLogger('smart_energy.slow_query')
+
+
+def param_shape(parameters):
+    """只保留绑定参数的结构和类型，不记录具体值（避免日志泄露数据）"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany：记录批量大小和第一组参数的结构
+            return {'executemany': len(parameters), 'row': param_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class _EndpointStats:
+    def __init__(self, blueprint):
+        self.blueprint = blueprint
+        self.requests = 0
+        self.statements = 0
+        self.db_time_ms = 0.0
+        self.max_statements = 0
+        self.slowest = []  # 小根堆 (耗时, 序号, 语句信息)
+
+    def to_dict(self):
+        return {
+            'blueprint': self.blueprint,
+            'requests': self.requests,
+            'statements': self.statements,
+            'db_time_ms': round(self.db_time_ms, 2),
+            'avg_statements_per_request': round(self.statements / self.requests, 2) if self.requests else None,
+            'max_statements_per_request': self.max_statements,
+            'slowest': [item for _, _, item in sorted(self.slowest, key=lambda entry: entry[0], reverse=True)]
+        }
+
+
+class QueryMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._sequence = 0
+        self.started_at = datetime.now()
+
+    def init_app(self, app, engine):
+        """挂载引擎事件监听，并注册请求结束统计和指标接口"""
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+        @app.teardown_request
+        def _record_request_queries(exception=None):
+            self._finish_request()
+
+        from utils.middleware import roles_required
+        from utils.response import success_response
+
+        @roles_required('ADMIN')
+        def db_metrics():
+            if request.method == 'DELETE':
+                self.reset()
+                return success_response(message="统计已清空")
+            return success_response(data=self.snapshot())
+
+        app.add_url_rule('/api/metrics/db', 'db_metrics', db_metrics, methods=['GET', 'DELETE'])
+
+    def snapshot(self):
+        """按端点和蓝图汇总的统计（按数据库总耗时倒序）"""
+        with self._lock:
+            endpoints = {name: stats.to_dict() for name, stats in self._endpoints.items()}
+        blueprints = {}
+        for stats in endpoints.values():
+            name = stats['blueprint'] or '-'
+            total = blueprints.setdefault(name, {'requests': 0, 'statements': 0, 'db_time_ms': 0.0})
+            total['requests'] += stats['requests']
+            total['statements'] += stats['statements']
+            total['db_time_ms'] = round(total['db_time_ms'] + stats['db_time_ms'], 2)
+        return {
+            'since': self.started_at.isoformat(),
+            'slow_query_ms': SLOW_QUERY_MS,
+            'endpoints': dict(sorted(endpoints.items(), key=lambda item: item[1]['db_time_ms'], reverse=True)),
+            'blueprints': blueprints
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self.started_at = datetime.now()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+        if has_request_context():
+            endpoint, blueprint = request.endpoint or request.path, request.blueprint
+            g.db_statements = g.get('db_statements', 0) + 1
+            g.db_time_ms = g.get('db_time_ms', 0.0) + elapsed_ms
+        else:
+            # 请求之外（后台任务、流式导出的生成器等）
+            endpoint, blueprint = '<background>', None
+
+        item = {
+            'duration_ms': round(elapsed_ms, 2),
+            'statement': ' '.join(statement.split())[:STATEMENT_PREVIEW],
+            'params': param_shape(parameters),
+            'executemany': executemany,
+            'at': datetime.now().isoformat()
+        }
+        with self._lock:
+            stats = self._stats_for(endpoint, blueprint)
+            if not has_request_context():
+                stats.statements += 1
+                stats.db_time_ms += elapsed_ms
+            self._sequence += 1
+            entry = (elapsed_ms, self._sequence, item)
+            if len(stats.slowest) < SLOWEST_PER_ENDPOINT:
+                heapq.heappush(stats.slowest, entry)
+            elif elapsed_ms > stats.slowest[0][0]:
+                heapq.heapreplace(stats.slowest, entry)
+
+        if elapsed_ms >= SLOW_QUERY_MS:
+            slow_query_logger.warning(json.dumps(
+                dict(item, event='slow_query', endpoint=endpoint, blueprint=blueprint,
+                     rowcount=getattr(cursor, 'rowcount', None)),
+                ensure_ascii=False, default=str
+            ))
+
+    def _finish_request(self):
+        statements = g.pop('db_statements', 0)
+        db_time_ms = g.pop('db_time_ms', 0.0)
+        if not statements:
+            return
+        with self._lock:
+            stats = self._stats_for(request.endpoint or request.path, request.blueprint)
+            stats.requests += 1
+            stats.statements += statements
+            stats.db_time_ms += db_time_ms
+            stats.max_statements = max(stats.max_statements, statements)
+
+    def _stats_for(self, endpoint, blueprint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats(blueprint)
+        return stats
+
+
+query_metrics = QueryMetrics()
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 限流（GCRA，通用信元速率算法，等价于容量为 max_requests 的令牌桶）：
+# 每个键只保存一个"理论到达时间" TAT，按 window / max_requests 的间隔匀速恢复额度，
+# TAT 早于当前时间的键与从未出现的键等价，可以随时淘汰而不影响限流结果
+
+MAX_KEYS = 10000            # 内存后端最多保留的键数，超过后淘汰最久未访问的键
+RATE_LIMIT_SQLITE = os.environ.get('RATE_LIMIT_SQLITE')  # 设置后多个工作进程共用该 SQLite 文件中的限流状态
+SQLITE_PURGE_INTERVAL = 60  # SQLite 后端清理已恢复满额度的键的间隔（秒）
+
+
+def gcra(tat, now, max_requests, window):
+    """
+    计算一次请求：返回 (是否放行, 新的TAT, 需等待秒数)
+    tat 为 None 表示该键没有状态（额度满）
+    """
+    interval = window / max_requests
+    tat = max(tat or now, now)
+    # 允许的突发：TAT 最多领先当前时间 window - interval（即 max_requests 个请求）
+    wait = tat - now - (window - interval)
+    if wait > 0:
+        return False, tat, wait
+    return True, tat + interval, 0.0
+
+
+class MemoryBackend:
+    """进程内后端：OrderedDict 按访问顺序保存 TAT，超出容量淘汰最久未访问的键"""
+
+    def __init__(self, max_keys=MAX_KEYS):
+        self._lock = threading.Lock()
+        self._states = OrderedDict()
+        self.max_keys = max_keys
+        self.evictions = 0
+
+    def hit(self, key, now, max_requests, window):
+        with self._lock:
+            allowed, tat, wait = gcra(self._states.get(key), now, max_requests, window)
+            self._states[key] = tat
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+                self.evictions += 1
+            return allowed, wait
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'keys': len(self._states), 'max_keys': self.max_keys,
+                    'evictions': self.evictions}
+
+
+class SQLiteBackend:
+    """
+    多进程共享后端：同一主机的工作进程共用一个 SQLite 文件，BEGIN IMMEDIATE 保证读改写原子；
+    已恢复满额度（TAT 早于当前时间）的键定期删除
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._purged_at = 0.0
+        self.evictions = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limit_state (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+
+    def hit(self, key, now, max_requests, window):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tat FROM rate_limit_state WHERE key = ?", (key,)).fetchone()
+            allowed, tat, wait = gcra(row[0] if row else None, now, max_requests, window)
+            if allowed:
+                conn.execute("INSERT OR REPLACE INTO rate_limit_state (key, tat) VALUES (?, ?)", (key, tat))
+            if now - self._purged_at >= SQLITE_PURGE_INTERVAL:
+                self._purged_at = now
+                self.evictions += conn.execute("DELETE FROM rate_limit_state WHERE tat < ?", (now,)).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, wait
+
+    def stats(self):
+        keys = self._connect().execute("SELECT COUNT(*) FROM rate_limit_state").fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'keys': keys, 'evictions': self.evictions}
+
+    def _connect(self):
+        # sqlite3 连接不能跨线程使用，每个线程一个连接；isolation_level=None 手动控制事务
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self._lock = threading.Lock()
+        self.backend = backend
+        self.allowed = 0
+        self.throttled = 0
+        self.throttled_by_endpoint = {}
+        self.backend_errors = 0
+
+    def init_app(self, app):
+        """注册限流状态接口"""
+        from utils.middleware import roles_required
+        from utils.response import success_response
+
+        @roles_required('ADMIN')
+        def rate_limit_metrics():
+            return success_response(data=self.stats())
+
+        app.add_url_rule('/api/metrics/rate-limit', 'rate_limit_metrics', rate_limit_metrics, methods=['GET'])
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    def hit(self, key, max_requests, window, endpoint=None):
+        """记录一次请求，返回 (是否放行, 需等待秒数)；后端故障时放行（限流不影响业务可用性）"""
+        try:
+            allowed, wait = self._backend().hit(key, time.time(), max_requests, window)
+        except Exception as e:
+            with self._lock:
+                self.backend_errors += 1
+            print(f"[失败] 限流后端异常，本次放行: {e}")
+            return True, 0.0
+        with self._lock:
+            if allowed:
+                self.allowed += 1
+            else:
+                self.throttled += 1
+                if endpoint:
+                    self.throttled_by_endpoint[endpoint] = self.throttled_by_endpoint.get(endpoint, 0) + 1
+        return allowed, wait
+
+    def stats(self):
+        backend = self._backend()
+        with self._lock:
+            data = {
+                'allowed': self.allowed,
+                'throttled': self.throttled,
+                'throttled_by_endpoint': dict(self.throttled_by_endpoint),
+                'backend_errors': self.backend_errors
+            }
+        data.update(backend.stats())
+        return data
+
+    def _backend(self):
+        """未指定后端时按配置创建：设置了 RATE_LIMIT_SQLITE 用 SQLite 共享，否则用进程内存"""
+        if self.backend is None:
+            with self._lock:
+                if self.backend is None:
+                    self.backend = SQLiteBackend(RATE_LIMIT_SQLITE) if RATE_LIMIT_SQLITE else MemoryBackend()
+        return self.backend
+
+
+rate_limiter = RateLimiter()
@@ -10,6 +10,17 @@ def success_response(data=None, message="操作成功", status_code=200):
         'timestamp': datetime.now().isoformat()
     }), status_code
 
+def throttled_response(message="请求过于频繁，请稍后再试", retry_after=1, error_code='TOO_MANY_REQUESTS'):
+    """限流/背压响应（429），带 Retry-After 头"""
+    response = jsonify({
+        'success': False,
+        'message': message,
+        'error_code': error_code,
+        'timestamp': datetime.now().isoformat()
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
 def error_response(message="操作失败", status_code=400, error_code=None):
     """错误响应"""
     return jsonify({
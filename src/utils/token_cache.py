@@ -0,0 +1,210 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.rate_limiter import RATE_LIMIT_SQLITE
+from utils.security import SecurityUtils
+
+# 已验证token缓存：按token摘要缓存验签后的用户信息，到token的exp自动失效；
+# 登出/刷新时吊销（按 jti 记到过期为止，吊销后即使签名有效也拒绝）。
+# 缓存在进程内；吊销表默认也在进程内，设置 TOKEN_REVOCATION_SQLITE（未设置时沿用 RATE_LIMIT_SQLITE）后
+# 同一主机的工作进程共用 SQLite 吊销表，缓存命中时也会检查，任一进程吊销后其他进程立即拒绝
+
+MAX_ENTRIES = 10000
+TOKEN_REVOCATION_SQLITE = os.environ.get('TOKEN_REVOCATION_SQLITE') or RATE_LIMIT_SQLITE
+REVOCATION_PURGE_INTERVAL = 60  # 清理已过期吊销记录的间隔（秒）
+
+
+def token_digest(token):
+    """缓存键：token的摘要（不在内存中按原文保存token）"""
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+
+class MemoryRevocations:
+    """进程内吊销表：jti -> exp，只对本进程生效"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+
+    def add(self, jti, exp, now):
+        with self._lock:
+            self._revoked = {key: value for key, value in self._revoked.items() if value > now}
+            self._revoked[jti] = exp
+
+    def contains(self, jti, now):
+        with self._lock:
+            exp = self._revoked.get(jti)
+            return exp is not None and exp > now
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'revoked': len(self._revoked)}
+
+
+class SQLiteRevocations:
+    """多进程共享吊销表：同一主机的工作进程共用一个 SQLite 文件，过期记录定期删除"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._purged_at = 0.0
+        self._connect().execute("CREATE TABLE IF NOT EXISTS token_revocation (jti TEXT PRIMARY KEY, exp REAL NOT NULL)")
+
+    def add(self, jti, exp, now):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO token_revocation (jti, exp) VALUES (?, ?)", (jti, exp))
+        if now - self._purged_at >= REVOCATION_PURGE_INTERVAL:
+            self._purged_at = now
+            conn.execute("DELETE FROM token_revocation WHERE exp <= ?", (now,))
+
+    def contains(self, jti, now):
+        row = self._connect().execute("SELECT exp FROM token_revocation WHERE jti = ?", (jti,)).fetchone()
+        return row is not None and row[0] > now
+
+    def stats(self):
+        revoked = self._connect().execute(
+            "SELECT COUNT(*) FROM token_revocation WHERE exp > ?", (time.time(),)
+        ).fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'revoked': revoked}
+
+    def _connect(self):
+        # 与限流的 SQLite 后端相同：每个线程一个连接，自动提交
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+class TokenCache:
+    def __init__(self, max_entries=MAX_ENTRIES, revocations=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # 摘要 -> (exp, jti, 用户信息)，按访问顺序
+        self.revocations = revocations
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.expired = 0
+        self.evictions = 0
+        self.revocation_count = 0
+        self.revocation_errors = 0
+
+    def init_app(self, app):
+        """注册token缓存状态接口"""
+        from utils.middleware import roles_required
+        from utils.response import success_response
+
+        @roles_required('ADMIN')
+        def token_cache_metrics():
+            return success_response(data=self.stats())
+
+        app.add_url_rule('/api/metrics/token-cache', 'token_cache_metrics', token_cache_metrics, methods=['GET'])
+
+    def set_revocations(self, revocations):
+        self.revocations = revocations
+
+    def verify(self, token):
+        """返回 token 对应的用户信息 {user_id, username, roles}；无效、过期或已吊销返回 None"""
+        key = token_digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+        if entry is not None:
+            # 其他进程可能已吊销该token，命中缓存也要查吊销表
+            if self._is_revoked(entry[1], now):
+                with self._lock:
+                    self._entries.pop(key, None)
+                    self.rejected += 1
+                return None
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            return entry[2]
+        with self._lock:
+            self.misses += 1
+
+        payload = SecurityUtils.verify_jwt_token(token)
+        jti = payload.get('jti') if payload else None
+        if not payload or self._is_revoked(jti, now):
+            with self._lock:
+                self.rejected += 1
+            return None
+        with self._lock:
+            user = {
+                'user_id': payload['user_id'],
+                'username': payload['username'],
+                'roles': payload.get('roles', [])
+            }
+            self._entries[key] = (payload['exp'], jti, user)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return user
+
+    def revoke(self, token):
+        """吊销 token（登出、刷新后的旧token）：移出缓存，jti 记入吊销表直到其过期"""
+        if not token:
+            return
+        payload = SecurityUtils.verify_jwt_token(token)
+        with self._lock:
+            self._entries.pop(token_digest(token), None)
+        if not payload or not payload.get('jti'):
+            return
+        self._revocations().add(payload['jti'], payload['exp'], time.time())
+        with self._lock:
+            self.revocation_count += 1
+
+    def stats(self):
+        revocations = self._revocations().stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'revoked': revocations['revoked'],
+                'revocation_backend': revocations['backend'],
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'revocations': self.revocation_count,
+                'revocation_errors': self.revocation_errors
+            }
+
+    def _is_revoked(self, jti, now):
+        """jti 是否已吊销；吊销表读取失败时按已吊销处理（宁可要求重新登录，也不放行已登出的token）"""
+        if not jti:
+            return False
+        try:
+            return self._revocations().contains(jti, now)
+        except Exception as e:
+            with self._lock:
+                self.revocation_errors += 1
+            print(f"[失败] 读取token吊销表失败，本次拒绝: {e}")
+            return True
+
+    def _revocations(self):
+        """未指定吊销表时按配置创建：设置了 TOKEN_REVOCATION_SQLITE 用 SQLite 共享，否则用进程内存"""
+        if self.revocations is None:
+            with self._lock:
+                if self.revocations is None:
+                    self.revocations = (
+                        SQLiteRevocations(TOKEN_REVOCATION_SQLITE) if TOKEN_REVOCATION_SQLITE else MemoryRevocations()
+                    )
+        return self.revocations
+
+
+token_cache = TokenCache()